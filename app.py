@@ -1,12 +1,24 @@
 import streamlit as st
-from streamlit_gsheets import GSheetsConnection
 import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, date, timedelta
+from datetime import datetime, timedelta
+import time
+import uuid
 import pytz
 
+from column_config import SYSTEM_COLUMNS, compile_column_config, decode_user_frame, goal_rules
+from scoring import ScoreCache, calculate_user_score, config_version, data_version, score_timeline
+from trends import FIGURE_CACHE_SIZE, RESOLUTIONS, trend_figure, weekly_summary
+from sheets import CONFIG_ROWS_COUNT, config_rows, get_client_and_url, split_tab
+from storage import DATA_ROWS_ATTR, StorageError, open_storage, parse_users, project_frame
+from snapshots import SnapshotStore, describe_age, snapshot_age
+from data_store import DataStore, VersionedLRU
+from refresher import Refresher
+from save_queue import WRITE_BEHIND, SaveJournal, WriteBehindStorage
+from scheduler import RequestScheduler
+from instrumentation import TIMINGS_LOG, annotate, span, summarize, timed, timings
+from metrics import (CACHE_LOOKUPS, REFRESHER_LAG_SECONDS, RERUN_SECONDS, SAVES, SAVES_PENDING, MetricsExporter,
+                     sessions)
+
 # Page config
 st.set_page_config(
     page_title="Bahaha Dilly Dailies",
@@ -27,15 +39,28 @@ st.set_page_config(
 # Row 10: help_text
 # Row 11+: Data rows
 
+# Main tab labels, in order
+MAIN_TABS = ["📝 Log Today", "📊 My Progress", "😎 Good Looking Week"]
+
+# Days of score history on the leaderboard (its reads start 6 days earlier,
+# for the first day's 7-day window)
+SCORE_HISTORY_DAYS = 90
+
+# Seconds a shared data store entry is used before it's read again, when the
+# background refresher is off (BDD_REFRESH_INTERVAL=0). At least the Sheets
+# read cache TTL, so a reload can't return a read cached before the entry was
+# last published.
+SHARED_DATA_TTL = 60
+
 # Helper function to get current tracking date (deadline is 3am ET)
-def get_tracking_date():
+def get_tracking_date(now=None):
     """
-    Returns the current tracking date.
+    Returns the current tracking date (or the one at `now`, a timezone-aware datetime).
     If it's before 3am ET, returns yesterday's date.
     If it's 3am ET or later, returns today's date.
     """
     et_tz = pytz.timezone('US/Eastern')
-    current_time_et = datetime.now(et_tz)
+    current_time_et = now.astimezone(et_tz) if now is not None else datetime.now(et_tz)
 
     # If it's before 3am ET, use yesterday's date
     if current_time_et.hour < 3:
@@ -54,344 +79,440 @@ def get_yesterday():
     yesterday = get_tracking_date() - timedelta(days=1)
     return yesterday
 
+def leaderboard_since():
+    """First day the leaderboard reads: SCORE_HISTORY_DAYS ending yesterday,
+    plus the 6 days before for the first day's 7-day window"""
+    return get_yesterday() - timedelta(days=SCORE_HISTORY_DAYS - 1 + 6)
+
+@st.cache_resource
+def get_request_scheduler():
+    """Process-wide scheduler all Sheets API requests go through
+    (quota-paced, retried on 429/5xx, identical in-flight reads merged)"""
+    return RequestScheduler()
+
 # Connect to Google Sheets
 @st.cache_resource
 def get_connection():
-    return st.connection("gsheets", type=GSheetsConnection)
+    # Imported here, not at the top, so cold starts don't wait for it (it pulls in gspread and SQL parsers)
+    from streamlit_gsheets import GSheetsConnection
+    conn = st.connection("gsheets", type=GSheetsConnection)
+    client, _ = get_client_and_url(conn)
+    get_request_scheduler().install(client)
+    return conn
+
+@st.cache_resource
+def get_storage():
+    """Process-wide storage backend: Google Sheets, or local SQLite with BDD_STORAGE=sqlite.
+    Saves to Sheets are journaled locally and written in the background (see save_queue.py)."""
+    storage = open_storage(get_connection)
+    if storage.remote and WRITE_BEHIND:
+        storage = WriteBehindStorage(storage, SaveJournal()).start()
+    return storage
+
+@st.cache_resource
+def get_timings():
+    """Process-wide recorder of Sheets calls and render phases, appending them
+    to TIMINGS_LOG if BDD_TIMINGS_LOG is set (see instrumentation.py)"""
+    return timings.log_to(TIMINGS_LOG)
+
+@st.cache_resource
+def get_score_cache():
+    """Process-wide LRU cache of leaderboard scores, shared by all sessions"""
+    return ScoreCache()
+
+@st.cache_resource
+def get_figure_cache():
+    """Process-wide LRU cache of trend chart JSON, shared by all sessions"""
+    return VersionedLRU(FIGURE_CACHE_SIZE)
+
+@st.cache_resource
+def get_data_store():
+    """Process-wide versioned user data shared by all sessions (one copy per user)"""
+    return DataStore()
+
+@st.cache_resource
+def get_snapshot_store():
+    """Process-wide on-disk snapshots of raw tabs, so cold starts don't wait on Sheets"""
+    return SnapshotStore()
+
+@st.cache_resource(on_release=Refresher.stop)
+def get_refresher():
+    """Process-wide background refresher that keeps every tab warm in the
+    shared data store (see refresher.py)"""
+    # Built on the script thread and handed over: the refresher thread never
+    # calls st.* (st.cache_resource getters included)
+    storage, store, snapshots = get_storage(), get_data_store(), get_snapshot_store()
+    return Refresher(lambda: refresh_shared_data(storage, store, snapshots), tracking_date=get_tracking_date).start()
+
+@st.cache_resource(on_release=MetricsExporter.stop)
+def get_metrics_exporter():
+    """Process-wide exporter of the app's Prometheus metrics, to a file and/or
+    an HTTP endpoint if BDD_METRICS_FILE / BDD_METRICS_PORT are set (see metrics.py)"""
+    storage = get_storage()
+    refresher = get_refresher()
+    SAVES_PENDING.set_function(lambda: storage.pending_count() if storage.write_behind else 0)
+    REFRESHER_LAG_SECONDS.set_function(lambda: refresher.lag() if refresher.running else None)
+    return MetricsExporter().start()
+
+def shared_data_max_age():
+    """How old a shared data store entry may be for a render to use it: any
+    age while the background refresher keeps entries current (renders only
+    load what's missing), otherwise SHARED_DATA_TTL"""
+    return None if get_refresher().running else SHARED_DATA_TTL
+
+def serve_snapshots(names):
+    """Last known frames for these tabs from disk while they're revalidated
+    against Sheets in the background, or None if the caller should read live"""
+    storage = get_storage()
+    if not storage.remote:
+        # Local reads are already fast; nothing to serve ahead of them
+        return None
+    return get_snapshot_store().serve(names, fetch=storage.read_tabs)
 
+@timed()
 def load_users():
     """Load list of users from the 'users' tab, column A, starting at row 2"""
+    entry = get_data_store().get(("users",), max_age=shared_data_max_age())
+    if entry is not None:
+        annotate(cache="hit", rows=len(entry.value))
+        CACHE_LOOKUPS.inc(cache="users", result="hit")
+        return entry.value
+    
     try:
-        conn = get_connection()
-        df = conn.read(worksheet="users", ttl="60")  # Cache for 60 seconds
+        snapshots = serve_snapshots(["users"])
+        if snapshots is not None:
+            annotate(cache="snapshot", rows=len(snapshots["users"]))
+            CACHE_LOOKUPS.inc(cache="users", result="snapshot")
+            return parse_users(snapshots["users"])
         
-        if df.empty or len(df.columns) == 0:
-            return []
-        
-        # Get column A (first column), skip row 0 (header), get all non-empty values
-        users = df.iloc[:, 0].dropna().tolist()
-        # Remove header if it exists and convert to lowercase
-        users = [str(u).lower().strip() for u in users if str(u).lower().strip() and str(u).lower().strip() != 'user']
-        return users
+        df = get_storage().read_tab("users")  # Sheets reads are cached for 60 seconds
+        get_snapshot_store().save({"users": df})
+        annotate(cache="miss", rows=len(df))
+        CACHE_LOOKUPS.inc(cache="users", result="miss")
+
+        # Shared with every session, like get_user_data's frames
+        return get_data_store().publish(("users",), parse_users(df)).value
     except Exception as e:
+        annotate(error=f"{type(e).__name__}: {e}")
         st.error(f"Error loading users: {e}")
         return []
 
+def parse_column_config(df):
+    """Column config compiled from a raw tab's config rows, or None if the tab
+    has fewer than 9 rows after the header. Raises if they can't be compiled
+    (load_column_config shows the error instead); nothing here calls st.*, so
+    the background refresher can use it."""
+    # Row 1 is used as headers, and rows are indexed by sheet row - 2, so
+    # config_rows() gives us rows 2-10 of the sheet:
+    #   iloc[0] = row 2 (display_name)
+    #   iloc[1] = row 3 (emoji)
+    #   iloc[2] = row 4 (units)
+    #   etc.
+    if df.empty or df.index.max() < CONFIG_ROWS_COUNT - 2:
+        return None
+    # Compiled once into immutable ColumnSpec / GoalRule objects
+    return compile_column_config(config_rows(df))
+
+@timed()
 def load_column_config(user, df=None):
     """Load column configuration from user's sheet (rows 1-10)
     If df is provided, use it instead of making a new API call"""
     try:
         if df is None:
-            conn = get_connection()
-            # Read first 10 rows to get config
-            # st-gsheets-connection uses row 1 as headers by default
-            config_df = conn.read(worksheet=user, ttl="60", usecols=None, nrows=10)  # Cache for 60 seconds
-        else:
-            # Use provided df, but we need first 10 rows (which are rows 2-11 in the sheet)
-            # Since row 1 is used as headers, iloc[0:9] gives us rows 2-10
-            if len(df) < 9:
-                return None
-            config_df = df.iloc[0:9].copy()  # Get first 9 data rows (rows 2-10 of sheet)
-            config_df.columns = df.columns  # Preserve column names
-        
-        if config_df.empty or len(config_df) < 9:  # Need at least 9 rows after header
-            return None
-        
-        # Column names are in config_df.columns (from row 1 of the sheet)
-        column_names = [str(col) for col in config_df.columns]
-        num_cols = len(column_names)
-        
-        # Build config dictionary
-        # Since row 1 is used as headers:
-        #   config_df.iloc[0] = row 2 (display_name)
-        #   config_df.iloc[1] = row 3 (emoji)
-        #   config_df.iloc[2] = row 4 (units)
-        #   etc.
-        config = {}
-        
-        for col_idx, col_name in enumerate(column_names):
-            if pd.isna(col_name) or str(col_name).strip() == '' or str(col_name).strip().lower() in ['nan', 'none']:
-                continue
-                
-            col_name = str(col_name).strip()
-            
-            if col_idx >= num_cols:
-                continue
-            
-            try:
-                # Access by numeric column index
-                config[col_name] = {
-                    'display_name': str(config_df.iloc[0, col_idx]) if col_idx < num_cols and 0 < len(config_df) and not pd.isna(config_df.iloc[0, col_idx]) else col_name,
-                    'emoji': str(config_df.iloc[1, col_idx]) if col_idx < num_cols and 1 < len(config_df) and not pd.isna(config_df.iloc[1, col_idx]) else '',
-                    'units': str(config_df.iloc[2, col_idx]) if col_idx < num_cols and 2 < len(config_df) and not pd.isna(config_df.iloc[2, col_idx]) else '',
-                    'type': str(config_df.iloc[3, col_idx]).lower() if col_idx < num_cols and 3 < len(config_df) and not pd.isna(config_df.iloc[3, col_idx]) else 'note',
-                    'has_goal': str(config_df.iloc[4, col_idx]).upper() == 'TRUE' if col_idx < num_cols and 4 < len(config_df) and not pd.isna(config_df.iloc[4, col_idx]) else False,
-                    'weekly_or_daily_goal': str(config_df.iloc[5, col_idx]).lower() if col_idx < num_cols and 5 < len(config_df) and not pd.isna(config_df.iloc[5, col_idx]) else '',
-                    'goal_target': config_df.iloc[6, col_idx] if col_idx < num_cols and 6 < len(config_df) and not pd.isna(config_df.iloc[6, col_idx]) else None,
-                    'goal_direction': str(config_df.iloc[7, col_idx]).lower() if col_idx < num_cols and 7 < len(config_df) and not pd.isna(config_df.iloc[7, col_idx]) else '',
-                    'help_text': str(config_df.iloc[8, col_idx]) if col_idx < num_cols and 8 < len(config_df) and not pd.isna(config_df.iloc[8, col_idx]) else ''
-                }
-            except (IndexError, KeyError) as e:
-                # Skip this column if we can't access it
-                continue
-        
-        return config
+            # Tabs are read with row 1 as headers
+            df = get_storage().read_tab(user)
+        return parse_column_config(df)
     except Exception as e:
         error_msg = str(e) if e else "Unknown error"
         error_type = type(e).__name__
+        annotate(error=f"{error_type}: {error_msg}")
         st.error(f"Error loading column config for {user}: {error_type} - {error_msg}")
         st.exception(e)
         return None
 
-@st.cache_data(ttl=60)  # Cache for 60 seconds
-def load_all_users_data(users_list):
-    """Load data for all users at once and cache the result"""
+@timed()
+def split_user_sheet(user, df, raise_errors=False):
+    """Split a raw user tab (as returned by conn.read) into (data_df, config).
+    A config that can't be parsed is shown with st.error, or raised with
+    raise_errors=True (off the script thread, where st.error goes nowhere)."""
+    if df.empty or len(df.columns) == 0:
+        return pd.DataFrame(), None
+    
+    # Get column config from the same dataframe to avoid duplicate API call
+    config = parse_column_config(df) if raise_errors else load_column_config(user, df)
+    if config is None:
+        return pd.DataFrame(), None
+    
+    # Skip the config rows (by sheet row, so blank rows dropped by the read don't shift them)
+    _, data_df = split_tab(df)
+    if data_df.empty:
+        # No data rows yet
+        return decode_user_frame(pd.DataFrame(columns=list(config.keys())), config), config
+    
+    # Reset index
+    data_df = data_df.reset_index(drop=True)
+    
+    # Decode each column once into typed dtypes (driven by the config type row)
+    data_df = decode_user_frame(data_df, config)
+    # Fingerprint the rows now so score cache lookups don't rehash every rerun
+    data_version(data_df)
+    annotate(rows=len(data_df))
+    return data_df, config
+
+def leaderboard_columns(config_df):
+    """Columns scoring needs: the date and every goal column"""
+    config = compile_column_config(config_rows(config_df))
+    return ['date'] + [rule.column for rule in goal_rules(config)]
+
+@timed()
+def load_leaderboard_data(users_list, since):
+    """Date and goal columns of each user's rows dated `since` or later,
+    as {user: (data_df, config, days_logged)}.
+    Only those cells are read (see Storage.read_projected), not whole tabs."""
     all_data = {}
-    conn = get_connection()
+    
+    try:
+        sheets = serve_snapshots(["users"] + list(users_list))
+        if sheets is not None:
+            # Already in memory: cut the snapshots down the same way
+            projected = {user: project_frame(sheets[user], leaderboard_columns, since) for user in users_list}
+        else:
+            projected = get_storage().read_projected(users_list, leaderboard_columns, since)
+        annotate(cache="snapshot" if sheets is not None else "miss",
+                 rows=sum(len(frame) for frame in projected.values()))
+    except Exception as e:
+        error_msg = str(e) if e else "Unknown error"
+        error_type = type(e).__name__
+        annotate(error=f"{error_type}: {error_msg}")
+        st.error(f"Error loading leaderboard data: {error_type} - {error_msg}")
+        st.exception(e)
+        raise
     
     for user in users_list:
-        try:
-            df = conn.read(worksheet=user, ttl="0")  # Use 0 here since we're caching at this level
-            
-            if df.empty or len(df.columns) == 0:
-                all_data[user] = (pd.DataFrame(), None)
-                continue
-            
-            # Get column config from the same dataframe to avoid duplicate API call
-            config = load_column_config(user, df)
-            if config is None:
-                all_data[user] = (pd.DataFrame(), None)
-                continue
-            
-            # Skip first 10 rows (config rows), use row 0 for column names
-            CONFIG_ROWS_COUNT = 10
-            if len(df) <= CONFIG_ROWS_COUNT:
-                # No data rows yet
-                all_data[user] = (pd.DataFrame(columns=list(config.keys())), config)
-                continue
-            
-            # Get data starting from row 10 (index 10)
-            data_df = df.iloc[10:].copy()
-            data_df.columns = df.columns  # Preserve column names from row 0
-            
-            # Reset index
-            data_df = data_df.reset_index(drop=True)
-            
-            all_data[user] = (data_df, config)
-        except Exception as e:
-            error_msg = str(e) if e else "Unknown error"
-            error_type = type(e).__name__
-            st.error(f"Error loading data for user '{user}': {error_type} - {error_msg}")
-            st.exception(e)
-            raise
+        all_data[user] = split_leaderboard_sheet(user, projected[user])
     return all_data
 
-def load_user_data(user):
-    """Load data from user's specific Google Sheet tab, skipping config rows (1-10)"""
-    try:
-        conn = get_connection()
-        df = conn.read(worksheet=user, ttl="60")  # Cache for 60 seconds
+def split_leaderboard_sheet(user, projected, raise_errors=False):
+    """(data_df, config, days_logged) from a projected tab (see project_frame)"""
+    return split_user_sheet(user, projected, raise_errors=raise_errors) + (projected.attrs[DATA_ROWS_ATTR],)
 
-        if df.empty or len(df.columns) == 0:
-            return pd.DataFrame(), None
-        
-        # Get column config from the same dataframe to avoid duplicate API call
-        config = load_column_config(user, df)
-        if config is None:
-            return pd.DataFrame(), None
-        
-        # Skip first 10 rows (config rows), use row 0 for column names
-        CONFIG_ROWS_COUNT = 10
-        if len(df) <= CONFIG_ROWS_COUNT:
-            # No data rows yet
-            return pd.DataFrame(columns=list(config.keys())), config
-        
-        # Get data starting from row 10 (index 10)
-        data_df = df.iloc[10:].copy()
-        data_df.columns = df.columns  # Preserve column names from row 0
-        
-        # Reset index
-        data_df = data_df.reset_index(drop=True)
+@timed()
+def get_leaderboard_data(users_list, since):
+    """{user: (data_df, config, days_logged)} for the leaderboard, from the
+    shared data store. Only users whose entry is missing, expired or for an
+    older window are read (together, in one load_leaderboard_data call)."""
+    store = get_data_store()
+    all_data = {}
+    missing = []
+    for user in users_list:
+        entry = store.get(("leaderboard", user), max_age=shared_data_max_age())
+        if entry is None or entry.value[0] != since:
+            missing.append(user)
+        else:
+            all_data[user] = entry.value[1]
+    annotate(cache="miss" if len(missing) == len(users_list) else "partial" if missing else "hit",
+             hits=len(users_list) - len(missing), misses=len(missing))
+    CACHE_LOOKUPS.inc(len(users_list) - len(missing), cache="leaderboard", result="hit")
+    CACHE_LOOKUPS.inc(len(missing), cache="leaderboard", result="miss")
+    
+    if missing:
+        for user, user_data in load_leaderboard_data(missing, since).items():
+            all_data[user] = store.publish(("leaderboard", user), (since, user_data)).value[1]
+    return {user: all_data[user] for user in users_list}
+
+@timed()
+def load_user_data(user, ttl="60"):
+    """Load data from user's specific Google Sheet tab, skipping config rows (1-10)
+    Pass ttl="0" to bypass the read cache (e.g. right after a save)"""
+    try:
+        # A fresh read (ttl="0") never comes from a snapshot
+        snapshots = serve_snapshots([user]) if ttl != "0" else None
+        if snapshots is not None:
+            annotate(cache="snapshot", rows=len(snapshots[user]))
+            return split_user_sheet(user, snapshots[user])
         
-        return data_df, config
+        df = get_storage().read_tab(user, fresh=ttl == "0")  # Sheets reads are cached for 60 seconds by default
+        get_snapshot_store().save({user: df}, force=ttl == "0")
+        annotate(cache="miss", rows=len(df))
+        return split_user_sheet(user, df)
     except Exception as e:
         error_msg = str(e) if e else "Unknown error"
         error_type = type(e).__name__
+        annotate(error=f"{error_type}: {error_msg}")
         st.error(f"Error loading data for {user}: {error_type} - {error_msg}")
         st.exception(e)
         return pd.DataFrame(), None
 
+@timed()
+def get_user_data(user, fresh=False):
+    """(data_df, config) for user from the shared data store, so every session
+    uses the same frame. It's loaded and published as a new version when it's
+    missing, expired or still from a stale snapshot, or with fresh=True
+    (right after a save). The frame is shared: copy it before changing it."""
+    store = get_data_store()
+    key = ("user", user)
+    entry = None if fresh else store.get(key, max_age=shared_data_max_age())
+    if entry is not None and snapshot_age(entry.value[0]) is None:
+        annotate(cache="hit", rows=len(entry.value[0]))
+        CACHE_LOOKUPS.inc(cache="user_data", result="hit")
+        return entry.value
+    annotate(cache="miss")
+    CACHE_LOOKUPS.inc(cache="user_data", result="miss")
+    
+    df, config = load_user_data(user, ttl="0" if fresh else "60")
+    if config is None:
+        # Nothing to share; load_user_data has already shown the error
+        return df, config
+    return store.publish(key, (df, config)).value
+
+@timed()
+def refresh_shared_data(storage, store, snapshots):
+    """One pass of the background refresher: re-read every tab (just the new
+    and changed rows, with incremental sync) and publish the users list, user
+    data and leaderboard entries of every tab that changed, so renders find
+    them already loaded.
+
+    It runs off the script thread, so it never calls st.*: tabs whose config
+    can't be parsed are skipped, and the pass raises once the others are
+    published (the refresher records the failure for the sidebar)."""
+    # A user published after this point (e.g. by a save) is newer than what
+    # this pass reads, so they're left for the next pass
+    known = store.get(("users",))
+    versions = {}
+    for user in known.value if known is not None else []:
+        versions[user] = store.version(("user", user))
+    tabs = storage.read_tabs(["users"] + list(versions))
+    users = parse_users(tabs["users"])
+    new_users = [user for user in users if user not in tabs]
+    if new_users:
+        for user in new_users:
+            versions[user] = store.version(("user", user))
+        tabs.update(storage.read_tabs(new_users))
+    annotate(rows=sum(len(tab) for tab in tabs.values()))
+    if storage.remote:
+        snapshots.save(tabs)
+    if known is None or known.value != users:
+        store.publish(("users",), users)
+    
+    since = leaderboard_since()
+    failed = []
+    for user in users:
+        tab = tabs[user]
+        previous = store.get(("tab", user))
+        try:
+            # Incremental sync returns the same frame while a tab is unchanged
+            if previous is None or previous.value is not tab:
+                publish_tab(store, user, tab, since, expected_version=versions[user], raise_errors=True)
+                continue
+            
+            entry = store.get(("leaderboard", user))
+            if entry is None or entry.value[0] != since:
+                projected = project_frame(tab, leaderboard_columns, since)
+                store.publish(("leaderboard", user),
+                              (since, split_leaderboard_sheet(user, projected, raise_errors=True)))
+        except Exception as e:
+            failed.append(f"{user} ({type(e).__name__}: {e})")
+    if failed:
+        raise StorageError(f"Could not load column config for {', '.join(failed)}")
+
+def publish_tab(store, user, tab, since, expected_version=None, raise_errors=False):
+    """Publish a user's raw tab to the shared data store along with the user
+    data and leaderboard entries built from it. Returns False (publishing
+    nothing) if the tab has no usable config, or if expected_version is given
+    and the user has been published since."""
+    user_df, user_config = split_user_sheet(user, tab, raise_errors=raise_errors)
+    if user_config is None:
+        return False
+    if store.publish(("user", user), (user_df, user_config), expected_version=expected_version) is None:
+        return False
+    store.publish(("tab", user), tab)
+    projected = project_frame(tab, leaderboard_columns, since)
+    store.publish(("leaderboard", user), (since, split_leaderboard_sheet(user, projected, raise_errors=raise_errors)))
+    return True
+
+@timed()
+def publish_saved_day(user):
+    """Publish a user's data to every session right after a save. With
+    write-behind storage and a tab the refresher already read, the saved
+    row is laid over that tab in memory; otherwise the tab is read again."""
+    storage = get_storage()
+    store = get_data_store()
+    tab = store.get(("tab", user))
+    if storage.write_behind and tab is not None:
+        if publish_tab(store, user, storage.apply_pending(user, tab.value), leaderboard_since()):
+            return
+    # A fresh read, not the pre-save cached one; other users' data is untouched
+    store.invalidate(("leaderboard", user))
+    get_user_data(user, fresh=True)
+
+@timed()
 def save_user_data(user, new_entry_dict, config):
-    """Save/update only today's row for the user, preserving all config rows and other data"""
+    """Save/update only today's row for the user, preserving all config rows and other data.
+    The storage backend writes just that row (on Sheets, via a cached date -> row
+    index, so the full tab is only read when the index no longer matches the sheet).
+    Sheets saves are committed to the local journal and written in the background."""
     try:
-        conn = get_connection()
-        
-        # Read the current sheet to get existing data and config rows
-        full_df = conn.read(worksheet=user, ttl="0")  # Don't cache on write
-        
-        if full_df.empty or len(full_df.columns) == 0:
-            st.error(f"Could not read existing data for {user}")
-            return False
-        
         # Get today's date string
         today = get_tracking_date_str()
         
-        # Get column names from the sheet (to ensure we include all columns like notes, timestamp, etc.)
-        column_names = full_df.columns.tolist()
-        
         # Convert boolean columns in new_entry to 0/1
         if config:
             for col_name, col_config in config.items():
-                if col_config.get('type', '') == 'boolean' and col_name in new_entry_dict:
+                if col_config.type == 'boolean' and col_name in new_entry_dict:
                     val = new_entry_dict[col_name]
                     new_entry_dict[col_name] = 1 if (val is True or str(val).upper() in ['TRUE', '1', 'YES', 'Y', 'T']) else 0
         
-        # Ensure new_entry has all required columns (fill missing ones with empty string)
-        for col in column_names:
-            if col not in new_entry_dict:
-                new_entry_dict[col] = ''
-        
-        # Build the new row as a list in the correct column order (matching sheet columns)
-        # Convert all values to native Python types (not numpy types) for JSON serialization
-        def to_native_type(val):
-            """Convert numpy/pandas types to native Python types"""
-            if val is None:
-                return ''
-            try:
-                if pd.isna(val):
-                    return ''
-            except (TypeError, ValueError):
-                pass
-            
-            # Get the type name to check for numpy types
-            type_name = type(val).__name__
-            type_module = type(val).__module__
-            
-            # Handle numpy types
-            if 'numpy' in type_module:
-                if 'int' in type_name:
-                    return int(val)
-                elif 'float' in type_name:
-                    return float(val)
-                elif 'bool' in type_name:
-                    return bool(val)
-            
-            # Handle pandas types
-            if 'pandas' in type_module:
-                if 'Timestamp' in type_name:
-                    return str(val)
-                elif 'int' in type_name:
-                    return int(val)
-                elif 'float' in type_name:
-                    return float(val)
-                elif 'bool' in type_name:
-                    return bool(val)
-            
-            # Handle datetime types
-            if isinstance(val, (datetime, date)):
-                return str(val)
-            
-            # Handle native Python types - return as-is
-            if isinstance(val, (int, float, bool, str)):
-                return val
-            
-            # Convert everything else to string
-            return str(val)
-        
-        new_row_values = [to_native_type(new_entry_dict.get(col, '')) for col in column_names]
+        # Update today's row in place if it already exists, otherwise add it
+        # after the last data row (missing columns are left blank)
+        get_storage().upsert_day(user, today, new_entry_dict)
         
-        # Find if today's row already exists (check in data rows, starting from row 11)
-        CONFIG_ROWS_COUNT = 10
-        if len(full_df) > CONFIG_ROWS_COUNT:
-            # Check data rows (starting from index 10, which is row 11 in the sheet)
-            data_df = full_df.iloc[CONFIG_ROWS_COUNT:].copy()
-            data_df.columns = full_df.columns  # Preserve column names
-            
-            # Find the row with today's date
-            if 'date' in data_df.columns:
-                # Convert date column to string for comparison (handle both date and datetime objects)
-                data_df['date_str'] = data_df['date'].apply(lambda x: str(x) if pd.notna(x) else '')
-                today_row_idx = data_df[data_df['date_str'] == today].index
-                
-                if len(today_row_idx) > 0:
-                    # Update existing row
-                    # today_row_idx[0] is the index in data_df, which preserves the original full_df indices
-                    # So it's the index in full_df (which includes config rows)
-                    # Sheet row number = DataFrame index + 1 (convert 0-indexed to 1-indexed)
-                    # But if it's updating one row too early, we need to add 1 more
-                    # Convert to native Python int to avoid numpy int64 JSON serialization issues
-                    sheet_row_num = int(today_row_idx[0]) + 2
-                    
-                    # Update the specific row using gspread directly
-                    # Access the underlying gspread client
-                    client = conn._instance._client
-                    spreadsheet_url = conn._instance._spreadsheet
-                    spreadsheet = client.open_by_url(spreadsheet_url)
-                    worksheet = spreadsheet.worksheet(user)
-                    
-                    # Update the row (sheet_row_num is 1-indexed)
-                    worksheet.update(range_name=f'A{sheet_row_num}', values=[new_row_values])
-                    return True
-        
-        # If we get here, today's row doesn't exist - insert it
-        # Find the last row with actual data (not blank)
-        if len(full_df) > CONFIG_ROWS_COUNT:
-            # Get data rows
-            data_df = full_df.iloc[CONFIG_ROWS_COUNT:].copy()
-            data_df.columns = full_df.columns
-            
-            # Find the last row that has at least one non-empty value (excluding date column which should always exist)
-            last_data_row_idx = None
-            for idx in reversed(data_df.index):
-                row = data_df.loc[idx]
-                # Check if row has any non-empty values (besides date which might be the only thing)
-                has_data = False
-                for col in data_df.columns:
-                    val = row[col]
-                    if pd.notna(val) and str(val).strip() != '':
-                        has_data = True
-                        break
-                if has_data:
-                    last_data_row_idx = idx
-                    break
-            
-            if last_data_row_idx is not None:
-                # Insert right after the last data row
-                # last_data_row_idx is the index in full_df (which already accounts for config rows)
-                # Sheet row number = DataFrame index + 1 (convert 0-indexed to 1-indexed)
-                # insert_row with index=X inserts AT position X, pushing existing rows down
-                # To insert AFTER the last data row, we need: last_data_row_idx + 1 (to 1-index) + 1 (to insert after)
-                # But if it's inserting one row too early, we need to add one more
-                # Convert to native Python int to avoid numpy int64 JSON serialization issues
-                sheet_row_num = int(last_data_row_idx) + 3  # +1 for 1-indexed, +2 to insert after (one more than before)
-            else:
-                # No data rows found, insert after config rows
-                sheet_row_num = CONFIG_ROWS_COUNT + 1
-        else:
-            # No data rows yet, insert after config rows
-            sheet_row_num = CONFIG_ROWS_COUNT + 1
-        
-        # Ensure sheet_row_num is a native Python int
-        sheet_row_num = int(sheet_row_num)
-        
-        # Use gspread to insert the row
-        # Access the underlying gspread client
-        client = conn._instance._client
-        spreadsheet_url = conn._instance._spreadsheet
-        spreadsheet = client.open_by_url(spreadsheet_url)
-        worksheet = spreadsheet.worksheet(user)
-        
-        # Insert the new row
-        worksheet.insert_row(new_row_values, index=sheet_row_num)
+        # This user's cached scores and trend charts are now stale
+        get_score_cache().invalidate(user)
+        get_figure_cache().invalidate(user)
+        SAVES.inc(outcome="success")
         return True
         
     except Exception as e:
         error_msg = str(e) if e else "Unknown error"
         error_type = type(e).__name__
+        annotate(error=f"{error_type}: {error_msg}")
+        SAVES.inc(outcome="failure")
         st.error(f"Error saving data for {user}: {error_type} - {error_msg}")
         st.exception(e)
         return False
 
+def render_debug_panel(spans, elapsed):
+    """Sidebar table of this run's loaders, render phases and Sheets calls
+    (shown with ?debug=1)"""
+    totals = summarize(spans)
+    summary = (f"Run: {elapsed * 1000:.0f} ms · {totals['sheets_requests']} Sheets requests "
+               f"({totals['sheets_ms']:.0f} ms, {totals['sheets_bytes']:,} bytes) · "
+               f"cache {totals['cache_hits']} hit / {totals['cache_misses']} miss")
+    if totals['errors']:
+        summary += f" · {totals['errors']} errors"
+    rows = [{
+        'phase': "· " * s.depth + s.name,
+        'ms': round(s.duration * 1000, 1),
+        'rows': s.rows,
+        'bytes': s.bytes,
+        'cache': s.cache,
+        'error': s.error,
+    } for s in sorted(spans, key=lambda s: s.started)]
+    with st.sidebar.expander("⏱️ Debug timings", expanded=True):
+        st.caption(summary)
+        st.dataframe(pd.DataFrame(rows).astype({'rows': 'Int64', 'bytes': 'Int64'}),
+                     hide_index=True, use_container_width=True)
+        if get_timings().path:
+            st.caption(f"Also appended to {get_timings().path}")
+
+# Time this run's loaders, render phases and Sheets calls; with ?debug=1
+# they're listed in the sidebar
+debug = st.query_params.get("debug") == "1"
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex[:8]
+run_started = time.perf_counter()
+get_timings().begin_run(session=st.session_state["session_id"])
+
 # App title
 st.title("🏆 Bahaha Dilly Dailies")
 st.markdown("*<small>(bobby, anne, hansa, anne, harini, anne, vinay with a silent v)</small>*", unsafe_allow_html=True)
@@ -407,9 +528,14 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# The tab bar is part of the page shell, drawn before the first Sheets read;
+# the open tab's body is filled in once the user's data has loaded
+tab1, tab2, tab3 = st.tabs(MAIN_TABS, key="main_tab", on_change="rerun")
+
 # Sidebar for user selection
 st.sidebar.title("User Login")
-users = load_users()
+with st.sidebar, st.spinner("Loading users..."):
+    users = load_users()
 if not users:
     st.sidebar.error("No users found. Please check the 'users' tab in the spreadsheet.")
     st.stop()
@@ -433,40 +559,50 @@ selected_user = st.sidebar.selectbox("Select your name:", users, index=default_i
 # Update query parameter when user changes
 if selected_user != url_user:
     st.query_params["user"] = selected_user
+get_timings().update_run(user=selected_user)
+get_metrics_exporter()
+sessions.touch(st.session_state["session_id"])
+
+# Load user-specific data and config from the store shared by all sessions
+with st.sidebar, st.spinner(f"Loading {selected_user}'s data..."):
+    user_df, config = get_user_data(selected_user)
+if config is None:
+    st.sidebar.error(f"Could not load configuration for {selected_user}")
+    st.stop()
 
-# Load user-specific data and config
-if 'current_user' not in st.session_state or st.session_state.current_user != selected_user:
-    st.session_state.current_user = selected_user
-    st.session_state.df, st.session_state.config = load_user_data(selected_user)
-    if st.session_state.config is None:
-        st.sidebar.error(f"Could not load configuration for {selected_user}")
-        st.stop()
-
-# Ensure we have config loaded (should already be loaded from load_user_data above)
-if 'config' not in st.session_state or st.session_state.config is None:
-    # This should rarely happen, but if it does, reload
-    if 'df' in st.session_state and not st.session_state.df.empty:
-        st.session_state.config = load_column_config(selected_user, st.session_state.df)
-    else:
-        st.session_state.config = load_column_config(selected_user)
-    if st.session_state.config is None:
-        st.sidebar.error(f"Could not load configuration for {selected_user}")
-        st.stop()
+snapshot_seconds = snapshot_age(user_df)
+if snapshot_seconds is not None:
+    st.sidebar.caption(f"🕒 Showing saved data from {describe_age(snapshot_seconds)} ago while it refreshes from Google Sheets")
+
+refresher = get_refresher()
+if refresher.running and refresher.is_behind():
+    refresher_status = refresher.status()
+    behind_text = f"⚠️ Background refresh is {describe_age(refresher_status['lag'])} behind"
+    if refresher_status['consecutive_failures']:
+        behind_text += f" ({refresher_status['consecutive_failures']} failed attempts, last: {refresher_status['last_error']})"
+    st.sidebar.caption(behind_text)
+
+storage = get_storage()
+if storage.write_behind and storage.pending_count(selected_user):
+    save_status = storage.status()
+    pending_text = f"🔄 {storage.pending_count(selected_user)} saved day(s) waiting to sync to Google Sheets"
+    if save_status['consecutive_failures']:
+        pending_text += f" (retrying: {save_status['last_error']})"
+    st.sidebar.caption(pending_text)
 
 st.sidebar.markdown("---")
 st.sidebar.markdown(f"### {selected_user.capitalize()}'s Goals")
 
 # Display user-specific goals in sidebar dynamically
-config = st.session_state.config
 goals_list = []
 for col_name, col_config in config.items():
-    if col_config.get('has_goal', False) and col_name not in ['user', 'date', 'notes', 'timestamp']:
-        emoji = col_config.get('emoji', '')
-        display_name = col_config.get('display_name', col_name)
-        units = col_config.get('units', '')
-        goal_type = col_config.get('weekly_or_daily_goal', '')
-        goal_target = col_config.get('goal_target', '')
-        goal_dir = col_config.get('goal_direction', '')
+    if col_config.goal is not None:
+        emoji = col_config.emoji
+        display_name = col_config.display_name
+        units = col_config.units
+        goal_type = col_config.goal.window
+        goal_target = col_config.goal_target
+        goal_dir = col_config.goal.direction
         
         goal_text = f"{emoji} {display_name}"
         if units:
@@ -505,9 +641,6 @@ if goals_list:
 else:
     st.sidebar.markdown("No goals configured yet.")
 
-# Main tabs
-tab1, tab2, tab3 = st.tabs(["📝 Log Today", "📊 My Progress", "😎 Good Looking Week"])
-
 # Helper function to render dynamic form
 def render_kpi_form(user, config, existing_data):
     """Render KPI form dynamically based on column configuration"""
@@ -516,7 +649,7 @@ def render_kpi_form(user, config, existing_data):
     # Separate columns into trackable (not system columns)
     trackable_cols = []
     for col_name, col_config in config.items():
-        if col_name not in ['user', 'date', 'notes', 'timestamp']:
+        if col_name not in SYSTEM_COLUMNS:
             trackable_cols.append((col_name, col_config))
     
     # Split into two columns for layout
@@ -525,11 +658,11 @@ def render_kpi_form(user, config, existing_data):
     
     for idx, (col_name, col_config) in enumerate(trackable_cols):
         col = cols[idx % 2]
-        col_type = col_config.get('type', 'note')
-        emoji = col_config.get('emoji', '')
-        display_name = col_config.get('display_name', col_name)
-        units = col_config.get('units', '')
-        help_text = col_config.get('help_text', '')
+        col_type = col_config.type
+        emoji = col_config.emoji
+        display_name = col_config.display_name
+        units = col_config.units
+        help_text = col_config.help_text
         
         # Build label: [emoji] [display_name] ([units])
         label = f"{emoji} {display_name}".strip()
@@ -538,14 +671,9 @@ def render_kpi_form(user, config, existing_data):
         
         with col:
             if col_type == 'boolean':
-                # Handle 0/1, True/False, and string values
-                val = existing_data.get(col_name, False)
-                if val in [True, 1, '1', 'TRUE', 'True', 'true']:
-                    default_val = True
-                elif val in [False, 0, '0', 'FALSE', 'False', 'false'] or pd.isna(val):
-                    default_val = False
-                else:
-                    default_val = bool(val)
+                # Already decoded to True/False/<NA> at load time
+                val = existing_data.get(col_name)
+                default_val = bool(val) if val is not None and pd.notna(val) else False
                 new_entry[col_name] = st.checkbox(
                     label,
                     value=default_val,
@@ -553,7 +681,8 @@ def render_kpi_form(user, config, existing_data):
                     key=f"checkbox_{user}_{col_name}"
                 )
             elif col_type == 'int':
-                default_val = int(existing_data.get(col_name, 0)) if existing_data.get(col_name) not in [None, ''] else 0
+                val = existing_data.get(col_name)
+                default_val = int(val) if val is not None and pd.notna(val) else 0
                 new_entry[col_name] = st.number_input(
                     label,
                     min_value=0,
@@ -564,7 +693,8 @@ def render_kpi_form(user, config, existing_data):
                     key=f"number_int_{user}_{col_name}"
                 )
             elif col_type == 'float':
-                default_val = float(existing_data.get(col_name, 0.0)) if existing_data.get(col_name) not in [None, ''] else 0.0
+                val = existing_data.get(col_name)
+                default_val = float(val) if val is not None and pd.notna(val) else 0.0
                 new_entry[col_name] = st.number_input(
                     label,
                     min_value=0.0,
@@ -588,12 +718,13 @@ def render_kpi_form(user, config, existing_data):
     return new_entry
 
 # Tab 1: Log Today's KPIs (Dynamic per user)
-with tab1:
+@st.fragment
+@timed()
+def render_log_today(selected_user):
     st.header(f"Log KPIs for {selected_user}")
 
     today = get_tracking_date_str()
-    config = st.session_state.config
-    df = st.session_state.df
+    df, config = get_user_data(selected_user)
 
     # Check if already logged today
     if not df.empty and 'date' in df.columns:
@@ -629,41 +760,33 @@ with tab1:
             if save_user_data(selected_user, new_entry, config):
                 st.success("✅ Data saved successfully!")
                 st.balloons()
-                # Clear cache for batch loading function since we updated data
-                load_all_users_data.clear()
-                # Reload data (will use fresh data due to ttl="0" in save function)
-                st.session_state.df, st.session_state.config = load_user_data(selected_user)
+                # Publish this user's new data to every session
+                publish_saved_day(selected_user)
             else:
-                st.error("Failed to save to Google Sheets")
+                st.error("Failed to save your entry")
 
 # Tab 2: My Progress (Dynamic per user)
-with tab2:
+@st.fragment
+@timed()
+def render_progress(selected_user):
     st.header(f"{selected_user.capitalize()}'s Progress")
 
-    user_df = st.session_state.df.copy()
-    config = st.session_state.config
+    user_df, config = get_user_data(selected_user)
+    user_df = user_df.copy()
 
     if not user_df.empty and len(user_df) > 0 and 'date' in user_df.columns:
-        user_df['date'] = pd.to_datetime(user_df['date'])
+        # Columns were already decoded to typed dtypes at load time
         user_df = user_df.sort_values('date')
 
         # Summary Statistics - averages for all numerical stats (int or float) and boolean counts
         st.subheader("📊 Summary Statistics")
 
-        # Get yesterday's date in US Eastern Time for filtering
-        yesterday_et = get_yesterday()
-        week_start = yesterday_et - timedelta(days=6)  # 7 days including yesterday
-        
-        # Filter to past week (ending yesterday)
-        user_df['date_only'] = user_df['date'].dt.date
-        week_df = user_df[(user_df['date_only'] >= week_start) & (user_df['date_only'] <= yesterday_et)].copy()
-
         # Get all numerical columns (int or float type) and boolean columns
         numerical_cols = []
         boolean_cols = []
         for col_name, col_config in config.items():
-            if col_name not in ['user', 'date', 'notes', 'timestamp']:
-                col_type = col_config.get('type', 'note')
+            if col_name not in SYSTEM_COLUMNS:
+                col_type = col_config.type
                 if col_type in ['int', 'float']:
                     numerical_cols.append((col_name, col_config))
                 elif col_type == 'boolean':
@@ -673,6 +796,10 @@ with tab2:
         all_stats_cols = numerical_cols + boolean_cols
         
         if all_stats_cols:
+            # Every widget's numbers, for the past week ending yesterday (US Eastern) and the week before
+            summary = weekly_summary(user_df, [(col_name, col_config.type) for col_name, col_config in all_stats_cols],
+                                     get_yesterday()).to_dict('index')
+
             # Use 3 columns per row for better spacing
             cols_per_row = 3
             num_rows = (len(all_stats_cols) + cols_per_row - 1) // cols_per_row
@@ -683,53 +810,34 @@ with tab2:
                     idx = row * cols_per_row + col_idx
                     if idx < len(all_stats_cols):
                         col_name, col_config = all_stats_cols[idx]
-                        emoji = col_config.get('emoji', '')
-                        display_name = col_config.get('display_name', col_name)
-                        units = col_config.get('units', '')
-                        col_type = col_config.get('type', 'note')
+                        emoji = col_config.emoji
+                        display_name = col_config.display_name
+                        units = col_config.units
+                        stats = summary[col_name]
+                        # Week-over-week change, green when it moves toward the goal
+                        delta = None
+                        if pd.notna(stats['delta']):
+                            delta = f"{stats['delta']:+.1f}" if col_config.type != 'boolean' else f"{stats['delta']:+.0f}"
+                        delta_color = "inverse" if col_config.goal_direction == 'at_most' else "normal"
                         
                         with cols[col_idx]:
                             if col_name in user_df.columns:
-                                if col_type in ['int', 'float']:
-                                    # Calculate average for past week only
-                                    if not week_df.empty and col_name in week_df.columns:
-                                        col_data = pd.to_numeric(week_df[col_name], errors='coerce')
-                                        col_data_valid = col_data[col_data.notna()]
-                                        if len(col_data_valid) > 0:
-                                            avg_val = col_data_valid.mean()
-                                            # Shorter label
-                                            label = f"{emoji} Avg {display_name}"
-                                            value_text = f"{avg_val:.1f}"
-                                            if units:
-                                                value_text += f" {units}"
-                                            st.metric(label, value_text)
-                                        else:
-                                            label = f"{emoji} Avg {display_name}"
-                                            value_text = "0.0"
-                                            if units:
-                                                value_text += f" {units}"
-                                            st.metric(label, value_text)
-                                    else:
-                                        label = f"{emoji} Avg {display_name}"
-                                        value_text = "0.0"
-                                        if units:
-                                            value_text += f" {units}"
-                                        st.metric(label, value_text)
-                                elif col_type == 'boolean':
-                                    # Count non-zero (True) values in past week
-                                    if not week_df.empty and col_name in week_df.columns:
-                                        # Convert boolean column to numeric for counting
-                                        col_data = week_df[col_name].apply(
-                                            lambda x: str(x).upper() in ['TRUE', '1', 'YES', 'Y', 'T', True] 
-                                            if pd.notna(x) else False
-                                        )
-                                        true_count = int(col_data.sum())
-                                        # Shorter label
-                                        label = f"{emoji} {display_name} days"
-                                        st.metric(label, f"{true_count}")
-                                    else:
-                                        label = f"{emoji} {display_name} days"
-                                        st.metric(label, "0")
+                                if col_config.type in ['int', 'float']:
+                                    # Average for past week only (0.0 if nothing was logged)
+                                    avg_val = stats['mean'] if stats['count'] > 0 else 0.0
+                                    value_text = f"{avg_val:.1f}"
+                                    if units:
+                                        value_text += f" {units}"
+                                    details = f"Logged {stats['count']} of {stats['days_logged']} days"
+                                    if stats['count'] > 0:
+                                        details += f", min {stats['min']:g}, max {stats['max']:g}"
+                                    st.metric(f"{emoji} Avg {display_name}", value_text, delta=delta,
+                                              delta_color=delta_color, help=details)
+                                elif col_config.type == 'boolean':
+                                    # Days checked in past week
+                                    st.metric(f"{emoji} {display_name} days", f"{int(stats['total'])}", delta=delta,
+                                              delta_color=delta_color,
+                                              help=f"Checked on {int(stats['total'])} of {stats['days_logged']} days logged")
                 
                 # Add spacing between rows
                 if row < num_rows - 1:
@@ -738,26 +846,24 @@ with tab2:
         # Trends section - charts for all numerical stats
         st.subheader("📈 Trends")
         
-        if numerical_cols:
-            # Display charts in 2 columns
-            for idx in range(0, len(numerical_cols), 2):
-                cols = st.columns(2)
-                for i in range(2):
-                    if idx + i < len(numerical_cols):
-                        col_name, col_config = numerical_cols[idx + i]
-                        emoji = col_config.get('emoji', '')
-                        display_name = col_config.get('display_name', col_name)
-                        units = col_config.get('units', '')
-                        
-                        with cols[i]:
-                            if col_name in user_df.columns:
-                                col_data = pd.to_numeric(user_df[col_name], errors='coerce')
-                                if col_data.notna().any():
-                                    fig = px.line(user_df, x='date', y=col_name,
-                                                title=f"{emoji} {display_name}")
-                                    if units:
-                                        fig.update_layout(yaxis_title=units)
-                                    st.plotly_chart(fig, use_container_width=True)
+        with span("progress.charts"):
+            trend_cols = [(col_name, f"{col_config.emoji} {col_config.display_name}", col_config.units)
+                          for col_name, col_config in numerical_cols
+                          if col_name in user_df.columns and user_df[col_name].notna().any()]
+            if trend_cols:
+                resolution = st.radio("Resolution", list(RESOLUTIONS), horizontal=True,
+                                      key=f"trend_resolution_{selected_user}")
+                # One figure for every metric, rebuilt only when the data, config or resolution changes
+                figure_cache = get_figure_cache()
+                figure_key = (selected_user, data_version(user_df), config_version(config), resolution)
+                figure_json = figure_cache.get(figure_key)
+                annotate(cache="hit" if figure_json is not None else "miss", rows=len(user_df))
+                CACHE_LOOKUPS.inc(cache="trends", result="hit" if figure_json is not None else "miss")
+                if figure_json is None:
+                    figure_json = trend_figure(user_df, trend_cols, resolution).to_json()
+                    figure_cache.put(figure_key, figure_json)
+                import plotly.io as pio  # Deferred until a chart is drawn (see trend_figure)
+                st.plotly_chart(pio.from_json(figure_json), use_container_width=True)
 
         # Recent entries
         st.subheader("📅 Recent Entries")
@@ -770,241 +876,86 @@ with tab2:
     else:
         st.info("No data logged yet. Go to 'Log Today' to start tracking!")
 
-# Helper function to calculate user score dynamically
-def calculate_user_score(user, df, config):
-    """Calculate user score based on column configuration"""
-    if config is None:
-        return 0
-    
-    # Get yesterday's date
-    yesterday = get_yesterday()
-    
-    # Get all columns with goals
-    goal_columns = []
-    for col_name, col_config in config.items():
-        if col_config.get('has_goal', False) and col_name not in ['user', 'date', 'notes', 'timestamp']:
-            goal_columns.append((col_name, col_config))
-    
-    if not goal_columns:
-        return 0
-    
-    # Prepare dataframe if it exists
-    if df.empty or 'date' not in df.columns:
-        # No data - all goals will be treated as not met (0)
-        return 0
-    
-    df['date'] = pd.to_datetime(df['date']).dt.date
-    df = df.sort_values('date')
-    
-    # Filter data to only include entries up to and including yesterday
-    df = df[df['date'] <= yesterday].copy()
-    
-    # Calculate score for each goal
-    goal_scores = []
-    points_per_goal = 100.0 / len(goal_columns)  # Distribute points evenly
-    
-    for col_name, col_config in goal_columns:
-        goal_type = col_config.get('weekly_or_daily_goal', '')
-        goal_target = col_config.get('goal_target', None)
-        goal_direction = col_config.get('goal_direction', 'at_least')
-        col_type = col_config.get('type', 'note')
-        
-        if goal_type == 'daily':
-            # Daily: Use past 7 days of data (ending yesterday)
-            # Compute rate of days with goal met over days with data
-            # Score = (M/N) * points_per_goal where M = days met, N = days with data
-            # If N=0, score = 0
-            
-            week_start = yesterday - timedelta(days=6)  # 7 days including yesterday
-            
-            # Filter to the 7-day period ending yesterday
-            week_df = df[(df['date'] >= week_start) & (df['date'] <= yesterday)].copy()
-            
-            if week_df.empty or col_name not in week_df.columns:
-                # No data - N=0, score = 0
-                goal_scores.append(0)
-                continue
-            
-            # Get only rows that have data for this column (not NaN)
-            week_df_with_data = week_df[week_df[col_name].notna()].copy()
-            
-            if week_df_with_data.empty:
-                # No data for this column - N=0, score = 0
-                goal_scores.append(0)
-                continue
-            
-            num_dates_with_data = len(week_df_with_data)  # Number of days with data
-            
-            # Convert goal_target to numeric
-            try:
-                if col_type == 'boolean':
-                    # For boolean, goal_target should be 1 (True) or 0 (False)
-                    goal_target_num = 1 if (goal_target is True or str(goal_target).upper() in ['TRUE', '1']) else 0
-                else:
-                    goal_target_num = float(goal_target) if goal_target not in [None, '', 'None'] else None
-            except (ValueError, TypeError):
-                goal_target_num = None
-            
-            if goal_target_num is None:
-                goal_scores.append(0)
-                continue
-            
-            # Count days where goal was met (M)
-            num_days_with_goal_met = 0
-            for idx, row in week_df_with_data.iterrows():
-                value = row[col_name]
-                
-                # Convert value to numeric (treats boolean as 0/1)
-                if col_type == 'boolean':
-                    # Convert boolean to 0/1
-                    numeric_value = 1 if str(value).upper() in ['TRUE', '1', 'YES', 'Y', 'T', True] else 0
-                else:
-                    # Convert to numeric
-                    try:
-                        numeric_value = float(value) if pd.notna(value) else 0
-                    except (ValueError, TypeError):
-                        numeric_value = 0
-                
-                # Check if goal was met for this day
-                goal_met = False
-                if goal_direction == 'at_most':
-                    goal_met = numeric_value <= goal_target_num
-                else:  # at_least
-                    goal_met = numeric_value >= goal_target_num
-                
-                if goal_met:
-                    num_days_with_goal_met += 1
-            
-            # Calculate score: (M/N) * points_per_goal
-            if num_dates_with_data > 0:
-                score = (num_days_with_goal_met / num_dates_with_data) * points_per_goal
-            else:
-                score = 0
-            
-            goal_scores.append(score)
-            
-        elif goal_type == 'weekly_total':
-            # Weekly total: Sum up values over the preceding 7 days (ending yesterday)
-            # Check if total meets goal_threshold
-            # If no data, treat as 0
-            
-            week_start = yesterday - timedelta(days=6)  # 7 days including yesterday
-            
-            # Filter to the 7-day period ending yesterday
-            week_df = df[(df['date'] >= week_start) & (df['date'] <= yesterday)].copy()
-            
-            if week_df.empty or col_name not in week_df.columns:
-                # No data - treat sum as 0
-                week_sum = 0
-            else:
-                # Convert column to numeric (treats boolean as 0/1)
-                if col_type == 'boolean':
-                    # Convert boolean to 0/1 and sum
-                    col_data = week_df[col_name].apply(
-                        lambda x: 1 if (pd.notna(x) and str(x).upper() in ['TRUE', '1', 'YES', 'Y', 'T', True]) else 0
-                    )
-                    week_sum = float(col_data.sum())
-                else:
-                    # Convert to numeric and sum
-                    col_data = pd.to_numeric(week_df[col_name], errors='coerce')
-                    week_sum = float(col_data.sum()) if col_data.notna().any() else 0
-            
-            # Convert goal_target to numeric
-            try:
-                goal_target_num = float(goal_target) if goal_target not in [None, '', 'None'] else None
-            except (ValueError, TypeError):
-                goal_target_num = None
-            
-            if goal_target_num is None:
-                goal_scores.append(0)
-                continue
-            
-            # Check if goal was met
-            goal_met = False
-            if goal_direction == 'at_most':
-                goal_met = week_sum <= goal_target_num
-            else:  # at_least
-                goal_met = week_sum >= goal_target_num
-            
-            # Weekly portion should still be counted even if there are fewer than 7 data points
-            goal_scores.append(points_per_goal if goal_met else 0)
-            
-        elif goal_type == 'count_per_week':
-            # Count per week: Count non-zero values in the 7-day period ending yesterday
-            # Check if count meets goal_threshold (at_most or at_least)
-            # If no data, treat count as 0
-            
-            week_start = yesterday - timedelta(days=6)  # 7 days including yesterday
-            
-            # Filter to the 7-day period ending yesterday
-            week_df = df[(df['date'] >= week_start) & (df['date'] <= yesterday)].copy()
-            
-            if week_df.empty or col_name not in week_df.columns:
-                # No data - treat count as 0
-                non_zero_count = 0
-            else:
-                # Count non-zero values (treats boolean True/1 as non-zero)
-                if col_type == 'boolean':
-                    # Count True/1 values
-                    col_data = week_df[col_name].apply(
-                        lambda x: 1 if (pd.notna(x) and str(x).upper() in ['TRUE', '1', 'YES', 'Y', 'T', True]) else 0
-                    )
-                    non_zero_count = int(col_data.sum())
-                else:
-                    # Convert to numeric and count non-zero values
-                    col_data = pd.to_numeric(week_df[col_name], errors='coerce')
-                    # Count values that are not NaN and not zero
-                    non_zero_count = int((col_data.notna() & (col_data != 0)).sum())
-            
-            # Convert goal_target to numeric
-            try:
-                goal_target_num = float(goal_target) if goal_target not in [None, '', 'None'] else None
-            except (ValueError, TypeError):
-                goal_target_num = None
-            
-            if goal_target_num is None:
-                goal_scores.append(0)
-                continue
-            
-            # Check if goal was met
-            goal_met = False
-            if goal_direction == 'at_most':
-                goal_met = non_zero_count <= goal_target_num
-            else:  # at_least
-                goal_met = non_zero_count >= goal_target_num
-            
-            # Count per week should still be counted even if there are fewer than 7 data points
-            goal_scores.append(points_per_goal if goal_met else 0)
-    
-    return sum(goal_scores)
-
 # Tab 3: Good Looking Week
-with tab3:
+@st.fragment
+@timed()
+def render_leaderboard(users):
     st.header("😎 Good Looking Weeks")
 
     st.info("💡 Who's having a good looking week? Scores are based on each person's individual goals and completion rates.")
 
     leaderboard_data = []
+    score_history = []
+    yesterday = get_yesterday()
+    history_start = pd.Timestamp(yesterday - timedelta(days=SCORE_HISTORY_DAYS - 1))
+    score_cache = get_score_cache()
+
+    # Recent goal columns of all users, shared across sessions (missing ones
+    # are read in a single batch operation)
+    since = leaderboard_since()
+    all_users_data = get_leaderboard_data(users, since)
+
+    # Served from stale snapshots: reload once the background refresh is done
+    snapshot_ages = [snapshot_age(df) for df, _, _ in all_users_data.values()]
+    snapshot_ages = [age for age in snapshot_ages if age is not None]
+    if snapshot_ages and not get_snapshot_store().refreshing(["users"] + users):
+        for user, (df, _, _) in all_users_data.items():
+            if snapshot_age(df) is not None:
+                get_data_store().invalidate(("leaderboard", user))
+        all_users_data = get_leaderboard_data(users, since)
+        snapshot_ages = [age for age in (snapshot_age(df) for df, _, _ in all_users_data.values()) if age is not None]
+    if snapshot_ages:
+        st.caption(f"🕒 Leaderboard is from saved data ({describe_age(max(snapshot_ages))} old) while it refreshes from Google Sheets")
+
+    with span("leaderboard.scoring"):
+        score_hits = score_misses = 0
+        for user in users:
+            user_specific_df, user_config, total_days = all_users_data.get(user, (pd.DataFrame(), None, 0))
+
+            if total_days == 0 or user_config is None:
+                continue
 
-    # Load all users' data in a single cached batch operation
-    all_users_data = load_all_users_data(users)
-
-    for user in users:
-        user_specific_df, user_config = all_users_data.get(user, (pd.DataFrame(), None))
-
-        if user_specific_df.empty or len(user_specific_df) == 0 or user_config is None:
-            continue
-
-        total_days = len(user_specific_df)
-
-        # Calculate score dynamically based on column configuration
-        score = calculate_user_score(user, user_specific_df, user_config)
-
-        leaderboard_data.append({
-            'User': user.capitalize(),
-            'Total Days': total_days,
-            'Score': round(score, 1)
-        })
+            # Reuse the cached score unless this user's data or config changed
+            score_key = score_cache.key(user, user_specific_df, user_config, yesterday)
+            cached_score = score_cache.get(score_key)
+            if cached_score is None:
+                # Score for every day of the shown history in one pass (ending yesterday),
+                # from the user's first logged day if that's more recent
+                first_day = user_specific_df['date'].min() if not user_specific_df.empty else pd.NaT
+                start = max(history_start, first_day) if pd.notna(first_day) else history_start
+                timeline = score_timeline(user_specific_df, user_config, end=yesterday, start=start)
+                if timeline.empty:
+                    # Nothing logged on or before yesterday
+                    score = calculate_user_score(user, user_specific_df, user_config, yesterday)
+                else:
+                    score = timeline.iloc[-1]
+                score_cache.put(score_key, (score, timeline))
+                score_misses += 1
+            else:
+                score, timeline = cached_score
+                score_hits += 1
+
+            if not timeline.empty:
+                score_history.append(pd.DataFrame({
+                    'Date': timeline.index,
+                    'User': user.capitalize(),
+                    'Score': timeline.round(1).values
+                }))
+
+            # Week-over-week movement (score as of the same day last week)
+            last_week_score = timeline.get(pd.Timestamp(yesterday - timedelta(days=7)))
+            change = round(score - last_week_score, 1) if last_week_score is not None else None
+
+            leaderboard_data.append({
+                'User': user.capitalize(),
+                'Total Days': total_days,
+                'Score': round(score, 1),
+                'Change vs Last Week': change
+            })
+        annotate(cache="miss" if score_misses and not score_hits else "partial" if score_misses else "hit",
+                 hits=score_hits, misses=score_misses)
+        CACHE_LOOKUPS.inc(score_hits, cache="scores", result="hit")
+        CACHE_LOOKUPS.inc(score_misses, cache="scores", result="miss")
 
     if leaderboard_data:
         # Create leaderboard DataFrame
@@ -1022,13 +973,26 @@ with tab3:
                 medal = medals[idx] if idx < len(medals) else '🏅'
                 st.markdown(f"### {medal} #{i}")
                 st.markdown(f"### {row['User']}")
-                st.metric("Score", f"{row['Score']:.1f}/100")
+                change = row['Change vs Last Week']
+                st.metric("Score", f"{row['Score']:.1f}/100",
+                          delta=f"{change:+.1f} vs last week" if pd.notna(change) else None)
                 st.caption(f"{row['Total Days']} days logged")
 
         # Detailed view
         st.subheader("📊 Detailed View")
         st.dataframe(lb_df, use_container_width=True)
 
+        # Score history
+        if score_history:
+            st.subheader(f"📈 Score Over Time (last {SCORE_HISTORY_DAYS} days)")
+            with span("leaderboard.chart"):
+                import plotly.express as px  # Deferred until the chart is drawn, like the Trends chart's plotly
+                history_df = pd.concat(score_history, ignore_index=True)
+                fig = px.line(history_df, x='Date', y='Score', color='User')
+                fig.update_layout(yaxis_title="Score", yaxis_range=[0, 100])
+                st.plotly_chart(fig, use_container_width=True)
+                annotate(rows=len(history_df))
+
         st.caption("""
         **Scoring System**: Each person is scored out of 100 based on their individual goals.
         Scores reflect what percentage of personal goals were met across all logged days in the preceding week.
@@ -1037,6 +1001,24 @@ with tab3:
     else:
         st.info("No data available yet. Start logging to see who's having a good looking week!")
 
+# Main tabs: only the open tab's body runs, and each body is a fragment, so
+# using one (e.g. saving the form) reruns just that tab
+if tab1.open:
+    with tab1:
+        render_log_today(selected_user)
+if tab2.open:
+    with tab2:
+        render_progress(selected_user)
+if tab3.open:
+    with tab3:
+        render_leaderboard(users)
+
 # Footer
 st.markdown("---")
 st.markdown("Made with ❤️ for tracking daily progress | 🏆 Happy New Year!!")
+
+open_tab = next((label.split(" ", 1)[1] for tab, label in zip((tab1, tab2, tab3), MAIN_TABS) if tab.open), "")
+RERUN_SECONDS.observe(time.perf_counter() - run_started, tab=open_tab)
+if debug:
+    render_debug_panel(get_timings().current_spans(), time.perf_counter() - run_started)
+get_timings().end_run()
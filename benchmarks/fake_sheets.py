@@ -0,0 +1,279 @@
+"""
+In-memory fake of the Google Sheets API, for benchmarks and local runs.
+
+FakeSheetsBackend holds every tab as a list of rows and answers the handful of
+Sheets v4 REST calls the app makes (spreadsheet metadata, values get/batchGet,
+values update/batchUpdate/append/clear, insertDimension). FakeClient is a real
+gspread Client whose request() is served by the backend instead of HTTP, so
+everything above it - gspread Worksheets, gspread_dataframe,
+st-gsheets-connection, the app's request scheduler - runs unmodified.
+
+Latency and quota can be injected: every request sleeps for `latency` seconds,
+and with `quota_per_minute` set, reads or writes beyond the quota within a
+rolling minute get a 429 just like the real API.
+"""
+
+import json
+import re
+import threading
+import time
+from collections import Counter, deque
+from urllib.parse import unquote
+
+import gspread
+import requests
+from gspread.exceptions import APIError
+from gspread.utils import a1_to_rowcol
+
+SPREADSHEET_ID = "fake-spreadsheet"
+SPREADSHEET_URL = f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_ID}/edit"
+
+API_PREFIX = "https://sheets.googleapis.com/v4/spreadsheets/"
+
+# Extra blank rows reported in each tab's grid size, like a real sheet has
+SPARE_ROWS = 100
+
+
+class FakeResponse:
+    """Just enough of requests.Response for gspread and the scheduler"""
+
+    def __init__(self, status_code, payload, headers=None):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = headers or {}
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+    @property
+    def text(self):
+        return str(self._payload)
+
+    @property
+    def content(self):
+        return json.dumps(self._payload).encode()
+
+
+def api_error(status_code, message, status):
+    return APIError(FakeResponse(status_code, {"error": {"code": status_code, "message": message, "status": status}}))
+
+
+def split_range(range_name):
+    """'anne'!B42:B43 -> ('anne', 'B42:B43'); a bare tab name has no cell range"""
+    if "!" in range_name:
+        tab, cells = range_name.rsplit("!", 1)
+    else:
+        tab, cells = range_name, ""
+    if tab.startswith("'") and tab.endswith("'"):
+        tab = tab[1:-1].replace("''", "'")
+    return tab, cells
+
+
+def parse_cells(cells):
+    """A1 range -> (first_row, first_col, last_row, last_col), 1-indexed;
+    open ends (e.g. 'A:A' or a bare tab) are None"""
+    if not cells:
+        return 1, 1, None, None
+    bounds = []
+    for part in cells.split(":"):
+        match = re.fullmatch(r"([A-Za-z]*)(\d*)", part)
+        col_letters, row_digits = match.groups()
+        row = int(row_digits) if row_digits else None
+        col = a1_to_rowcol(f"{col_letters}1")[1] if col_letters else None
+        bounds.append((row, col))
+    (first_row, first_col), (last_row, last_col) = bounds[0], bounds[-1]
+    if len(bounds) == 1:
+        last_row, last_col = first_row, first_col
+    return first_row or 1, first_col or 1, last_row, last_col
+
+
+def is_blank(value):
+    return value is None or value == ""
+
+
+def trim(values):
+    """Drop trailing blank cells and rows, as the Sheets API does"""
+    trimmed = []
+    for row in values:
+        row = list(row)
+        while row and is_blank(row[-1]):
+            row.pop()
+        trimmed.append(row)
+    while trimmed and not trimmed[-1]:
+        trimmed.pop()
+    return trimmed
+
+
+class FakeSheetsBackend:
+    """In-memory spreadsheet: tab name -> list of rows (lists of cell values).
+
+    Cell values are what the API returns with UNFORMATTED_VALUE: numbers,
+    booleans and strings (dates already as formatted strings)."""
+
+    def __init__(self, tabs, latency=0.0, quota_per_minute=None):
+        self.tabs = {name: [list(row) for row in rows] for name, rows in tabs.items()}
+        self.latency = latency
+        self.quota_per_minute = quota_per_minute
+        self.url = SPREADSHEET_URL
+        self.requests = Counter()
+        # Cells returned by reads, a proxy for response payload size
+        self.cells_served = 0
+        self.rejected = 0
+        self._recent = {"read": deque(), "write": deque()}
+        self._lock = threading.Lock()
+
+    @property
+    def request_count(self):
+        return sum(self.requests.values())
+
+    def _check_quota(self, kind):
+        if self.quota_per_minute is None:
+            return
+        now = time.monotonic()
+        recent = self._recent[kind]
+        while recent and now - recent[0] >= 60:
+            recent.popleft()
+        if len(recent) >= self.quota_per_minute:
+            self.rejected += 1
+            raise api_error(429, f"Quota exceeded for {kind} requests per minute", "RESOURCE_EXHAUSTED")
+        recent.append(now)
+
+    def handle(self, method, endpoint, params=None, json=None):
+        """Serve one REST call; returns a FakeResponse or raises APIError"""
+        method = method.lower()
+        kind = "read" if method == "get" else "write"
+        if self.latency:
+            time.sleep(self.latency)
+
+        path = unquote(endpoint[len(API_PREFIX):]) if endpoint.startswith(API_PREFIX) else ""
+        with self._lock:
+            self._check_quota(kind)
+            if path == SPREADSHEET_ID and method == "get":
+                self.requests["metadata"] += 1
+                return FakeResponse(200, self.metadata())
+            if path == f"{SPREADSHEET_ID}/values:batchGet" and method == "get":
+                self.requests["values.batchGet"] += 1
+                ranges = (params or {}).get("ranges", [])
+                return FakeResponse(200, {"valueRanges": [self.get_values(name) for name in ranges]})
+            if path == f"{SPREADSHEET_ID}/values:batchUpdate" and method == "post":
+                self.requests["values.batchUpdate"] += 1
+                for value_range in (json or {}).get("data", []):
+                    self.update_values(value_range["range"], value_range["values"])
+                return FakeResponse(200, {"spreadsheetId": SPREADSHEET_ID})
+            if path == f"{SPREADSHEET_ID}:batchUpdate" and method == "post":
+                self.requests["batchUpdate"] += 1
+                return FakeResponse(200, self.batch_update(json or {}))
+            if path.startswith(f"{SPREADSHEET_ID}/values/"):
+                range_name = path[len(f"{SPREADSHEET_ID}/values/"):]
+                if method == "post" and range_name.endswith(":clear"):
+                    self.requests["values.clear"] += 1
+                    return FakeResponse(200, self.clear_values(range_name[:-len(":clear")]))
+                if method == "post" and range_name.endswith(":append"):
+                    self.requests["values.append"] += 1
+                    return FakeResponse(200, self.append_values(range_name[:-len(":append")], json["values"]))
+                if method == "get":
+                    self.requests["values.get"] += 1
+                    return FakeResponse(200, self.get_values(range_name))
+                if method == "put":
+                    self.requests["values.update"] += 1
+                    return FakeResponse(200, self.update_values(range_name, json["values"]))
+        raise api_error(404, f"Unsupported fake request: {method.upper()} {endpoint}", "NOT_FOUND")
+
+    def metadata(self):
+        sheets = []
+        for sheet_id, (name, rows) in enumerate(self.tabs.items()):
+            sheets.append({"properties": {
+                "sheetId": sheet_id,
+                "title": name,
+                "index": sheet_id,
+                "sheetType": "GRID",
+                "gridProperties": {
+                    "rowCount": len(rows) + SPARE_ROWS,
+                    "columnCount": max([len(row) for row in rows] + [26]),
+                },
+            }})
+        return {"spreadsheetId": SPREADSHEET_ID, "properties": {"title": "Fake"}, "sheets": sheets}
+
+    def _tab(self, name):
+        if name not in self.tabs:
+            raise api_error(400, f"Unable to parse range: {name}", "INVALID_ARGUMENT")
+        return self.tabs[name]
+
+    def get_values(self, range_name):
+        tab, cells = split_range(range_name)
+        rows = self._tab(tab)
+        first_row, first_col, last_row, last_col = parse_cells(cells)
+        last_row = last_row or len(rows)
+        values = []
+        for row in rows[first_row - 1:last_row]:
+            values.append(row[first_col - 1:last_col] if last_col else row[first_col - 1:])
+        values = trim(values)
+        self.cells_served += sum(len(row) for row in values)
+        return {"range": range_name, "majorDimension": "ROWS", "values": values}
+
+    def update_values(self, range_name, values):
+        tab, cells = split_range(range_name)
+        rows = self._tab(tab)
+        first_row, first_col, _, _ = parse_cells(cells)
+        for offset, new_row in enumerate(values):
+            row_number = first_row + offset
+            while len(rows) < row_number:
+                rows.append([])
+            row = rows[row_number - 1]
+            end = first_col - 1 + len(new_row)
+            if len(row) < end:
+                row.extend([""] * (end - len(row)))
+            row[first_col - 1:end] = list(new_row)
+        return {"updatedRange": range_name, "updatedRows": len(values)}
+
+    def clear_values(self, range_name):
+        tab, cells = split_range(range_name)
+        if cells:
+            raise api_error(400, "The fake backend only clears whole tabs", "INVALID_ARGUMENT")
+        self._tab(tab)[:] = []
+        return {"clearedRange": range_name}
+
+    def append_values(self, range_name, values):
+        # The app only appends into rows it has just inserted, so this writes
+        # at the given row rather than searching for the end of the table
+        return self.update_values(range_name, values)
+
+    def batch_update(self, body):
+        names = list(self.tabs)
+        for request in body.get("requests", []):
+            insert = request.get("insertDimension")
+            if insert is None or insert["range"].get("dimension") != "ROWS":
+                raise api_error(400, f"Unsupported fake batchUpdate request: {request}", "INVALID_ARGUMENT")
+            rows = self.tabs[names[insert["range"]["sheetId"]]]
+            start, end = insert["range"]["startIndex"], insert["range"]["endIndex"]
+            rows[start:start] = [[] for _ in range(end - start)]
+        return {"spreadsheetId": SPREADSHEET_ID, "replies": [{} for _ in body.get("requests", [])]}
+
+
+class FakeClient(gspread.Client):
+    """gspread Client that talks to a FakeSheetsBackend instead of Google"""
+
+    def __init__(self, backend):
+        super().__init__(None, session=requests.Session())
+        self.backend = backend
+
+    def request(self, method, endpoint, params=None, data=None, json=None, files=None, headers=None):
+        return self.backend.handle(method, endpoint, params=params, json=json)
+
+
+def install_fake_connection(backend):
+    """Make st.connection("gsheets", type=GSheetsConnection) use the fake backend.
+
+    Only the connect step is replaced: reads still go through
+    st-gsheets-connection's own read()/caching code."""
+    from streamlit_gsheets.gsheets_connection import GSheetsConnection, GSheetsServiceAccountClient
+
+    def connect(self, **kwargs):
+        instance = GSheetsServiceAccountClient.__new__(GSheetsServiceAccountClient)
+        instance._spreadsheet = backend.url
+        instance._worksheet = None
+        instance._client = FakeClient(backend)
+        return instance
+
+    GSheetsConnection._connect = connect
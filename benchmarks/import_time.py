@@ -0,0 +1,125 @@
+"""
+Profile app.py's cold start with `python -X importtime`.
+
+Runs app.py's top-level imports (everything a cold start waits for before
+the page shell can be drawn) in a fresh interpreter, then the imports its
+functions defer until first use (the Sheets connection, the charts), and
+reports the wall time of each stage and the modules that took longest.
+Each run is a new interpreter, so nothing is already imported.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --repeat 10 --top 30 --json imports.json
+"""
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules whose top-level and deferred imports are profiled
+PROFILED_MODULES = ("app.py", "trends.py")
+
+# Separates the two stages in the importtime output
+STAGE_MARKER = "-- deferred imports --"
+
+
+def collect_imports(path):
+    """(top-level imports, imports inside functions) of a module, as source lines"""
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+    top_level = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    nested = [node for node in ast.walk(tree)
+              if isinstance(node, (ast.Import, ast.ImportFrom)) and node not in top_level]
+    return [ast.unparse(node) for node in top_level], [ast.unparse(node) for node in nested]
+
+
+def build_script():
+    """Source of the profiled run: each stage timed, results printed as JSON"""
+    startup, deferred = [], []
+    for name in PROFILED_MODULES:
+        module_startup, module_deferred = collect_imports(os.path.join(REPO_DIR, name))
+        startup += [line for line in module_startup if line not in startup]
+        deferred += [line for line in module_deferred if line not in deferred]
+    lines = [
+        "import json, sys, time",
+        "started = time.perf_counter()",
+        *startup,
+        "startup = time.perf_counter() - started",
+        f"sys.stderr.write({STAGE_MARKER!r} + '\\n')",
+        "started = time.perf_counter()",
+        *deferred,
+        "deferred = time.perf_counter() - started",
+        "print(json.dumps({'startup': startup, 'deferred': deferred}))",
+    ]
+    return "\n".join(lines), startup, deferred
+
+
+def parse_importtime(stderr):
+    """{stage: [(module, self seconds, cumulative seconds, depth)]} from -X importtime output"""
+    stages = {"startup": [], "deferred": []}
+    stage = "startup"
+    for line in stderr.splitlines():
+        if line == STAGE_MARKER:
+            stage = "deferred"
+            continue
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        stages[stage].append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    return stages
+
+
+def profile_once():
+    script, _, _ = build_script()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=REPO_DIR,
+                            capture_output=True, text=True, check=True)
+    walls = json.loads(result.stdout.strip().splitlines()[-1])
+    return walls, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters to profile")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules listed per stage")
+    parser.add_argument("--json", help="also write results to this JSON file")
+    args = parser.parse_args()
+
+    _, startup, deferred = build_script()
+    # Bytecode compilation would only slow the first run down
+    profile_once()
+    runs = [profile_once() for _ in range(args.repeat)]
+
+    results = {"args": vars(args), "stages": {}}
+    for stage, imports in (("startup", startup), ("deferred", deferred)):
+        wall = statistics.median(walls[stage] for walls, _ in runs)
+        # Slowest modules of the median run, by cumulative time (nested imports included)
+        _, modules = sorted(runs, key=lambda run: run[0][stage])[len(runs) // 2]
+        by_cumulative = sorted(modules[stage], key=lambda module: module[2], reverse=True)
+        print(f"{stage}: {wall * 1000:.0f} ms median wall time over {len(runs)} runs, "
+              f"{len(modules[stage])} modules imported")
+        print(f"  {'module':<60} {'self ms':>9} {'cumulative ms':>14}")
+        for name, self_s, cumulative_s, depth in by_cumulative[:args.top]:
+            print(f"  {'  ' * depth + name:<60} {self_s * 1000:>9.1f} {cumulative_s * 1000:>14.1f}")
+        results["stages"][stage] = {
+            "imports": imports,
+            "median_wall_ms": wall * 1000,
+            "modules_imported": len(modules[stage]),
+            "slowest": [{"module": name, "self_ms": self_s * 1000, "cumulative_ms": cumulative_s * 1000}
+                        for name, self_s, cumulative_s, _ in by_cumulative[:args.top]],
+        }
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Benchmark the app's data path against an in-memory fake Sheets backend.
+
+Times reading every tab, a background refresher pass, get_leaderboard_data,
+load_column_config, calculate_user_score, save_user_data, flushing saves to
+the sheet and full page runs, on a synthetic spreadsheet of N users with M
+years of history, with optional injected API latency and quota.
+
+Usage:
+    python benchmarks/run_benchmarks.py --users 5 --years 2 --latency-ms 150
+    python benchmarks/run_benchmarks.py --users 10 --years 3 --quota 60 --json results.json
+"""
+
+import argparse
+import ast
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_DIR, "app.py")
+sys.path.insert(0, REPO_DIR)
+
+# Keep benchmark snapshots out of the real snapshot directory
+os.environ.setdefault("BDD_SNAPSHOT_DIR", tempfile.mkdtemp(prefix="bdd-bench-snapshots-"))
+os.environ.setdefault("BDD_SAVE_JOURNAL", os.path.join(tempfile.mkdtemp(prefix="bdd-bench-journal-"), "journal.db"))
+os.environ.setdefault("BDD_TIMINGS_LOG", os.path.join(tempfile.mkdtemp(prefix="bdd-bench-timings-"), "timings.jsonl"))
+os.environ.setdefault("BDD_METRICS_FILE", os.path.join(tempfile.mkdtemp(prefix="bdd-bench-metrics-"), "metrics.prom"))
+# The page's background refresher would add its requests to every
+# measurement; its passes are timed on their own instead
+os.environ.setdefault("BDD_REFRESH_INTERVAL", "0")
+
+import streamlit as st  # noqa: E402
+import streamlit.logger  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import scheduler  # noqa: E402
+from fake_sheets import FakeSheetsBackend, install_fake_connection  # noqa: E402
+from synthetic_data import make_day_row, make_spreadsheet  # noqa: E402
+
+
+def load_app_functions():
+    """Import app.py's imports, constants and function definitions without
+    running the page itself (the top-level Streamlit calls are skipped)"""
+    with open(APP_PATH) as f:
+        tree = ast.parse(f.read(), filename=APP_PATH)
+
+    def keep(node):
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef)):
+            return True
+        # Module-level constants (UPPER_CASE = ...)
+        return isinstance(node, ast.Assign) and all(
+            isinstance(target, ast.Name) and target.id.isupper() for target in node.targets
+        )
+
+    module = ast.Module(body=[node for node in tree.body if keep(node)], type_ignores=[])
+    namespace = {"__name__": "app_functions", "__file__": APP_PATH}
+    exec(compile(module, APP_PATH, "exec"), namespace)
+    return namespace
+
+
+def clear_streamlit_caches():
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+class Result:
+    def __init__(self, name, times, requests, cells):
+        self.name = name
+        self.times = times
+        self.requests = requests
+        self.cells = cells
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "runs": len(self.times),
+            "median_ms": statistics.median(self.times) * 1000,
+            "min_ms": min(self.times) * 1000,
+            "max_ms": max(self.times) * 1000,
+            "api_requests_per_run": self.requests / len(self.times),
+            "cells_read_per_run": self.cells / len(self.times),
+        }
+
+
+def measure(name, backend, fn, repeat, setup=None):
+    """Time fn() `repeat` times (setup() runs untimed before each call)"""
+    times = []
+    requests = cells = 0
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        requests_before, cells_before = backend.request_count, backend.cells_served
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+        requests += backend.request_count - requests_before
+        cells += backend.cells_served - cells_before
+    return Result(name, times, requests, cells)
+
+
+# Scheduler quota when the fake backend has none: effectively no pacing
+UNLIMITED_QUOTA = 10 ** 9
+
+
+def run_benchmarks(n_users, years, latency, quota, repeat):
+    # Pace requests to the fake quota the way production paces to the real one
+    scheduler.READ_QUOTA_PER_MINUTE = scheduler.WRITE_QUOTA_PER_MINUTE = quota or UNLIMITED_QUOTA
+
+    backend = FakeSheetsBackend(make_spreadsheet(n_users, years), latency=latency, quota_per_minute=quota)
+    install_fake_connection(backend)
+    app = load_app_functions()
+
+    users = app["load_users"]()
+    storage = app["get_storage"]()
+    if storage.write_behind:
+        # Saves are flushed by the timed flush() calls below, not in the background
+        storage.stop()
+    all_data = {user: app["split_user_sheet"](user, tab) for user, tab in storage.read_tabs(users).items()}
+    yesterday = app["get_yesterday"]()
+    first_user = users[0]
+    results = []
+
+    def forget_tabs():
+        if storage.delta is not None:
+            storage.delta.forget()
+
+    results.append(measure(
+        "read all tabs (cold)", backend,
+        lambda: storage.read_tabs(["users"] + users), repeat,
+        setup=forget_tabs,
+    ))
+
+    rng = random.Random(1)
+    new_day = date.today()
+
+    def log_new_day():
+        # Someone else saved a day since the last refresh
+        nonlocal new_day
+        new_day += timedelta(days=1)
+        backend.tabs[first_user].append(make_day_row(first_user, new_day, rng, 0))
+
+    results.append(measure(
+        "read all tabs (refresh, 1 new row)", backend,
+        lambda: storage.read_tabs(["users"] + users), repeat,
+        setup=log_new_day,
+    ))
+    store = app["get_data_store"]()
+    snapshots = app["get_snapshot_store"]()
+    results.append(measure(
+        "refresher pass (1 new row)", backend,
+        lambda: app["refresh_shared_data"](storage, store, snapshots), repeat,
+        setup=log_new_day,
+    ))
+    since = app["leaderboard_since"]()
+
+    def forget_leaderboard():
+        for user in users:
+            store.invalidate(("leaderboard", user))
+
+    results.append(measure(
+        "get_leaderboard_data (cold)", backend,
+        lambda: app["get_leaderboard_data"](users, since), repeat,
+        setup=forget_leaderboard,
+    ))
+    results.append(measure(
+        "get_leaderboard_data (shared, warm)", backend,
+        lambda: app["get_leaderboard_data"](users, since), repeat,
+    ))
+    results.append(measure(
+        "load_column_config (cold)", backend,
+        lambda: app["load_column_config"](first_user), repeat,
+        setup=st.cache_data.clear,
+    ))
+
+    def score_everyone():
+        for user, (user_df, user_config) in all_data.items():
+            app["calculate_user_score"](user, user_df, user_config, yesterday)
+
+    results.append(measure(
+        f"calculate_user_score (x{len(all_data)} users)", backend, score_everyone, repeat * 5,
+    ))
+
+    _, config = all_data[first_user]
+
+    def entry():
+        return {"user": first_user, "date": app["get_tracking_date_str"](), "workout": True, "steps": 9000}
+
+    results.append(measure(
+        "save_user_data", backend,
+        lambda: app["save_user_data"](first_user, entry(), config), repeat,
+    ))
+    if storage.write_behind:
+        def queue_save(cold):
+            if cold:
+                storage.invalidate(first_user)
+            app["save_user_data"](first_user, entry(), config)
+
+        results.append(measure(
+            "flush 1 saved day (cold row index)", backend,
+            storage.flush, repeat, setup=lambda: queue_save(cold=True),
+        ))
+        results.append(measure(
+            "flush 1 saved day (warm row index)", backend,
+            storage.flush, repeat, setup=lambda: queue_save(cold=False),
+        ))
+
+    # Whole-page runs through Streamlit's script runner
+    def cold_rerun():
+        clear_streamlit_caches()
+        AppTest.from_file(APP_PATH, default_timeout=600).run()
+
+    results.append(measure("full rerun (cold caches)", backend, cold_rerun, repeat))
+
+    page = AppTest.from_file(APP_PATH, default_timeout=600)
+    page.run()
+    results.append(measure("full rerun (warm caches)", backend, page.run, repeat))
+
+    # Only the open tab's body runs, so reruns cost what that tab costs
+    for label in app["MAIN_TABS"]:
+        page.session_state["main_tab"] = label
+        page.run()
+        tab_name = label.split(" ", 1)[1]
+        results.append(measure(f"rerun, {tab_name} open (warm)", backend, page.run, repeat))
+    if page.exception:
+        raise RuntimeError(f"App raised during benchmark: {page.exception[0].value}")
+
+    return results, backend
+
+
+def print_report(results, backend, args):
+    rows = sum(len(rows) - 10 for name, rows in backend.tabs.items() if name != "users")
+    print(f"{args.users} users, {args.years} years ({rows} data rows), "
+          f"latency {args.latency_ms} ms, quota {args.quota or 'unlimited'}/min")
+    print(f"{'benchmark':<40} {'runs':>5} {'median ms':>10} {'min ms':>9} {'max ms':>9} "
+          f"{'API req/run':>12} {'cells/run':>10}")
+    for result in results:
+        r = result.as_dict()
+        print(f"{r['name']:<40} {r['runs']:>5} {r['median_ms']:>10.1f} {r['min_ms']:>9.1f} "
+              f"{r['max_ms']:>9.1f} {r['api_requests_per_run']:>12.1f} {r['cells_read_per_run']:>10.0f}")
+    print(f"API requests by type: {dict(backend.requests)}; rejected by quota: {backend.rejected}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5, help="number of user tabs")
+    parser.add_argument("--years", type=float, default=1, help="years of daily history per user")
+    parser.add_argument("--latency-ms", type=float, default=0, help="injected latency per API request")
+    parser.add_argument("--quota", type=int, default=None, help="reads/writes allowed per minute before 429s")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--json", help="also write results to this JSON file")
+    args = parser.parse_args()
+
+    # Streamlit warns about running outside `streamlit run` on every cached call
+    streamlit.logger.set_log_level("error")
+
+    results, backend = run_benchmarks(args.users, args.years, args.latency_ms / 1000, args.quota, args.repeat)
+    print_report(results, backend, args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": [r.as_dict() for r in results]}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Synthetic spreadsheets in the app's layout, for benchmarks.
+
+make_spreadsheet() builds a 'users' tab plus one tab per user, each with the
+header row, the 9 config rows (rows 2-10) and one data row per logged day.
+Every goal window and column type the app supports is represented, and some
+days and cells are left blank the way real logs are.
+"""
+
+import random
+from datetime import date, datetime, timedelta
+
+# (column, display_name, emoji, units, type, has_goal, window, goal_target, direction, help_text)
+COLUMNS = [
+    ('user', 'User', '👤', '', 'note', 'FALSE', '', '', '', ''),
+    ('date', 'Date', '📅', '', 'date', 'FALSE', '', '', '', ''),
+    ('workout', 'Workout', '💪', '', 'boolean', 'TRUE', 'count_per_week', 3, 'at_least', '3x per week'),
+    ('stretch', 'Stretch', '🧘', '', 'boolean', 'TRUE', 'daily', 'TRUE', 'at_least', 'Daily goal'),
+    ('steps', 'Steps', '👟', 'steps', 'int', 'TRUE', 'daily', 8000, 'at_least', 'Daily goal: 8000'),
+    ('drinks', 'Drinks', '🍷', 'drinks', 'int', 'TRUE', 'weekly_total', 7, 'at_most', 'At most 7 a week'),
+    ('sleep', 'Sleep', '😴', 'hours', 'float', 'TRUE', 'daily', 7.5, 'at_least', 'Daily goal: 7.5h'),
+    ('weight', 'Weight', '⚖️', 'lb', 'float', 'FALSE', '', '', '', 'Optional tracking'),
+    ('notes', 'Notes', '📝', '', 'note', 'FALSE', '', '', '', ''),
+    ('timestamp', 'Timestamp', '⏰', '', 'timestamp', 'FALSE', '', '', '', ''),
+]
+
+
+def config_rows():
+    """Header row plus config rows 2-10, as a list of rows"""
+    return [list(row) for row in zip(*COLUMNS)]
+
+
+def make_day_row(user, day, rng, blank_cell_rate):
+    """One day's data row, with a share of cells left blank"""
+    values = {
+        'workout': rng.random() < 0.5,
+        'stretch': rng.random() < 0.7,
+        'steps': rng.randint(2000, 14000),
+        'drinks': rng.choice([0, 0, 0, 1, 2, 3]),
+        'sleep': round(rng.uniform(5.0, 9.0), 1),
+        'weight': round(rng.uniform(150, 160), 1),
+        'notes': rng.choice(['', '', '', 'felt good', 'tired']),
+    }
+    row = [user, str(day)]
+    for name in [col[0] for col in COLUMNS[2:-1]]:
+        row.append('' if rng.random() < blank_cell_rate else values[name])
+    logged_at = datetime.combine(day, datetime.min.time()) + timedelta(hours=21, minutes=rng.randint(0, 120))
+    row.append(logged_at.strftime('%Y-%m-%d %H:%M:%S'))
+    return row
+
+
+def make_user_tab(user, years, end, rng, missed_day_rate=0.1, blank_cell_rate=0.05):
+    """Rows of one user's tab covering `years` years of days ending at `end`"""
+    rows = config_rows()
+    days = int(round(years * 365))
+    for offset in range(days, 0, -1):
+        if rng.random() < missed_day_rate:
+            continue
+        rows.append(make_day_row(user, end - timedelta(days=offset), rng, blank_cell_rate))
+    return rows
+
+
+def make_spreadsheet(n_users, years, end=None, seed=0):
+    """Tabs (name -> rows) for `n_users` users with `years` years of history each"""
+    rng = random.Random(seed)
+    end = end or date.today()
+    users = [f"user{i + 1}" for i in range(n_users)]
+    tabs = {'users': [['user']] + [[user] for user in users]}
+    for user in users:
+        tabs[user] = make_user_tab(user, years, end, rng)
+    return tabs
@@ -0,0 +1,251 @@
+"""
+Column configuration (rows 2-10 of each user's tab) and config-driven decoding
+of the data rows below it.
+
+The config rows are compiled once into immutable ColumnSpec objects, and every
+goal column gets a GoalRule with its numeric target and comparator already
+worked out, so the sidebar, form and scorer never re-parse config strings.
+
+The type row (row 5) says how each column should be read. Data rows are
+decoded once at load time into compact typed columns so the form, progress
+stats and scoring don't have to re-parse cells on every use.
+"""
+
+import operator
+
+import numpy as np
+import pandas as pd
+
+# Columns that are never scored or shown as KPIs
+SYSTEM_COLUMNS = ['user', 'date', 'notes', 'timestamp']
+
+# Cell values (after str().upper()) that count as a checked boolean
+TRUTHY_STRINGS = ['TRUE', '1', 'YES', 'Y', 'T']
+
+# Goal windows the scorer knows how to evaluate
+GOAL_WINDOWS = ['daily', 'weekly_total', 'count_per_week']
+
+# Smallest nullable integer dtype that holds every value of an int column
+INT_DTYPES = ['Int16', 'Int32', 'Int64']
+
+
+def python_float(val, failed):
+    """float(val), or `failed` if float() can't parse it"""
+    try:
+        return float(val)
+    except (ValueError, TypeError):
+        return failed
+
+
+def to_float_series(col_data, failed=0.0):
+    """Convert a column to floats the way float(value) would, per cell.
+
+    pd.to_numeric handles the common cases in one pass; the few non-null cells
+    it rejects are retried with float() (which also accepts e.g. '1_000'),
+    and anything float() rejects too becomes `failed`."""
+    numeric = pd.to_numeric(col_data, errors='coerce').astype(float)
+    retry = numeric.isna() & col_data.notna()
+    if retry.any():
+        numeric[retry] = [python_float(val, failed) for val in col_data[retry]]
+    return numeric
+
+
+class FrozenSlots:
+    """Base for small immutable config objects: attributes are set once in
+    __init__ via _set() and can't be reassigned afterwards"""
+    __slots__ = ()
+
+    def _set(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    # Pickle support (st.cache_data copies return values by pickling them)
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        self._set(**state)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class GoalRule(FrozenSlots):
+    """A compiled goal: which column, which window, and how to test a value"""
+    __slots__ = ('column', 'col_type', 'window', 'target', 'direction', 'compare')
+
+    def __init__(self, column, col_type, window, goal_target, direction):
+        self._set(
+            column=column,
+            col_type=col_type,
+            window=window,
+            # Numeric target, or None if the goal isn't set/parseable
+            target=parse_goal_target(goal_target, col_type, window),
+            direction=direction,
+            compare=operator.le if direction == 'at_most' else operator.ge,
+        )
+
+    def is_met(self, value):
+        """Whether value(s) meet the target (works on scalars and Series)"""
+        return self.compare(value, self.target)
+
+
+class ColumnSpec(FrozenSlots):
+    """One column of a user's tab, as described by config rows 2-10"""
+    __slots__ = ('name', 'display_name', 'emoji', 'units', 'type', 'has_goal',
+                 'weekly_or_daily_goal', 'goal_target', 'goal_direction', 'help_text', 'goal')
+
+    def __init__(self, name, display_name, emoji, units, type, has_goal,
+                 weekly_or_daily_goal, goal_target, goal_direction, help_text):
+        goal = None
+        if has_goal and name not in SYSTEM_COLUMNS:
+            goal = GoalRule(name, type, weekly_or_daily_goal, goal_target, goal_direction)
+        self._set(
+            name=name,
+            display_name=display_name,
+            emoji=emoji,
+            units=units,
+            type=type,
+            has_goal=has_goal,
+            weekly_or_daily_goal=weekly_or_daily_goal,
+            goal_target=goal_target,
+            goal_direction=goal_direction,
+            help_text=help_text,
+            goal=goal,
+        )
+
+
+def parse_goal_target(goal_target, col_type, goal_type):
+    """Numeric goal target from config, or None if it isn't set/parseable"""
+    try:
+        if goal_type == 'daily' and col_type == 'boolean':
+            # For boolean, goal_target should be 1 (True) or 0 (False)
+            return 1 if (goal_target is True or str(goal_target).upper() in ['TRUE', '1']) else 0
+        return float(goal_target) if goal_target not in [None, '', 'None'] else None
+    except (ValueError, TypeError):
+        return None
+
+
+def compile_column_config(config_df):
+    """Compile the 9 config rows (display_name ... help_text) into ColumnSpecs.
+
+    config_df is the header-named frame of sheet rows 2-10. Each config row is
+    parsed with one vectorized pass across all columns. Returns a dict of
+    column name -> ColumnSpec in sheet order."""
+    names = pd.Series([str(col) for col in config_df.columns]).str.strip()
+    rows = config_df.iloc[0:9].reset_index(drop=True)
+    rows.columns = range(len(rows.columns))
+
+    blank = rows.isna()
+    text = rows.astype(str)
+
+    def text_row(row, default):
+        return text.iloc[row].where(~blank.iloc[row], default)
+
+    display_names = text.iloc[0].where(~blank.iloc[0], names)
+    emojis = text_row(1, '')
+    units = text_row(2, '')
+    types = text.iloc[3].str.lower().where(~blank.iloc[3], 'note')
+    has_goals = ~blank.iloc[4] & (text.iloc[4].str.upper() == 'TRUE')
+    windows = text.iloc[5].str.lower().where(~blank.iloc[5], '')
+    goal_targets = rows.iloc[6].where(~blank.iloc[6], None)
+    directions = text.iloc[7].str.lower().where(~blank.iloc[7], '')
+    help_texts = text_row(8, '')
+
+    skip = (names == '') | names.str.lower().isin(['nan', 'none'])
+
+    config = {}
+    for col_idx in np.flatnonzero(~skip.to_numpy()):
+        name = names.iloc[col_idx]
+        config[name] = ColumnSpec(
+            name=name,
+            display_name=display_names.iloc[col_idx],
+            emoji=emojis.iloc[col_idx],
+            units=units.iloc[col_idx],
+            type=types.iloc[col_idx],
+            has_goal=bool(has_goals.iloc[col_idx]),
+            weekly_or_daily_goal=windows.iloc[col_idx],
+            goal_target=goal_targets.iloc[col_idx],
+            goal_direction=directions.iloc[col_idx],
+            help_text=help_texts.iloc[col_idx],
+        )
+    return config
+
+
+def goal_rules(config):
+    """GoalRules for every goal column, in sheet order"""
+    return [spec.goal for spec in config.values() if spec.goal is not None]
+
+
+def decode_boolean(col_data):
+    """Nullable boolean: True/1/Yes/Y/T -> True, blank -> <NA>, anything else -> False"""
+    values = col_data.to_numpy(dtype=object)
+    if pd.api.types.is_float_dtype(col_data):
+        # A column of 1/0 (or TRUE/FALSE) cells with blanks is parsed as
+        # 1.0/0.0, which should read the same as the cells themselves
+        values = np.where(col_data.to_numpy() == 1, 1, values)
+    upper = np.char.upper(values.astype(str))
+    decoded = pd.Series(np.isin(upper, TRUTHY_STRINGS), index=col_data.index, dtype='boolean')
+    decoded[col_data.isna().to_numpy()] = pd.NA
+    return decoded
+
+
+def decode_int(col_data, failed=np.nan):
+    """Smallest nullable Int dtype that fits, or float64 if any value isn't
+    whole; text that isn't a number becomes `failed`"""
+    numeric = to_float_series(col_data, failed=failed)
+    valid = numeric.dropna()
+    if not np.isfinite(valid).all() or not (valid == np.floor(valid)).all():
+        return numeric
+
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype.lower())
+        if valid.empty or (valid.min() >= info.min and valid.max() <= info.max):
+            return numeric.astype(dtype)
+    return numeric
+
+
+def decode_float(col_data, failed=np.nan):
+    """float64 with NaN for blanks (float32 would round targets like 25.1);
+    text that isn't a number becomes `failed`"""
+    return to_float_series(col_data, failed=failed)
+
+
+def decode_user_frame(data_df, config):
+    """Decode a user's raw data rows into typed columns using the config type row.
+
+    boolean -> nullable boolean, int -> Int16 (or wider), float -> float64,
+    date -> datetime64 (also used as the frame's DatetimeIndex); notes,
+    timestamps and unknown types are left as they are.
+
+    Text in a number column that isn't a number is blank (NaN), except in
+    goal columns: there it's a logged 0, as the scorer has always counted it
+    (a day with junk in it still counts towards a daily goal's days)."""
+    decoded = {}
+    for col_name in data_df.columns:
+        col_data = data_df[col_name]
+        spec = config.get(col_name) if config else None
+        col_type = spec.type if spec is not None else 'note'
+        failed = 0.0 if spec is not None and spec.goal is not None else np.nan
+
+        if col_type == 'boolean':
+            decoded[col_name] = decode_boolean(col_data)
+        elif col_type == 'int':
+            decoded[col_name] = decode_int(col_data, failed)
+        elif col_type == 'float':
+            decoded[col_name] = decode_float(col_data, failed)
+        elif col_type == 'date' or col_name == 'date':
+            decoded[col_name] = pd.to_datetime(col_data, errors='coerce')
+        else:
+            decoded[col_name] = col_data
+
+    typed_df = pd.DataFrame(decoded, index=data_df.index)
+    typed_df.attrs.update(data_df.attrs)
+    if 'date' in typed_df.columns:
+        typed_df.index = pd.DatetimeIndex(typed_df['date'])
+        typed_df.index.name = None
+    return typed_df
@@ -0,0 +1,121 @@
+"""
+Process-wide store of loaded data, shared by every browser session.
+
+Each session used to keep its own copy of the selected user's frame in
+st.session_state. The DataStore keeps one entry per key instead (e.g.
+("user", "anne")), each holding an immutable value and a version number that
+goes up every time a new value is published. Sessions read the current entry
+on every rerun, so a save in one session reaches every other session on its
+next rerun without a refetch, and memory stays at one copy per key however
+many sessions are open.
+
+Values are shared, so callers must not modify them in place: copy first.
+
+VersionedLRU is the bounded cache for values derived from that data
+(leaderboard scores, trend figures): keys are tuples that start with the user
+and include the versions the value was computed from, so a stale entry is
+simply never looked up again and ages out.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class StoreEntry:
+    """One published value: read-only, replaced (not modified) on publish"""
+
+    __slots__ = ("key", "value", "version", "published_at")
+
+    def __init__(self, key, value, version, published_at):
+        self.key = key
+        self.value = value
+        self.version = version
+        self.published_at = published_at
+
+    def age(self, now=None):
+        return (now if now is not None else time.time()) - self.published_at
+
+
+class DataStore:
+    """Versioned, thread-safe key -> value store"""
+
+    def __init__(self):
+        self._entries = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, max_age=None):
+        """Current entry for key, or None if there isn't one or it's older
+        than max_age seconds"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or (max_age is not None and entry.age() > max_age):
+            return None
+        return entry
+
+    def version(self, key):
+        """Last version published for key (0 if never), even if since invalidated"""
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def publish(self, key, value, expected_version=None):
+        """Replace key's value with a new version; returns the new entry.
+        With expected_version, only if nothing has been published for key
+        since that version (returns None otherwise), so a value loaded before
+        a newer publish can't overwrite it."""
+        with self._lock:
+            if expected_version is not None and self._versions.get(key, 0) != expected_version:
+                return None
+            version = self._versions.get(key, 0) + 1
+            entry = StoreEntry(key, value, version, time.time())
+            self._versions[key] = version
+            self._entries[key] = entry
+        return entry
+
+    def invalidate(self, key):
+        """Drop key's value so the next reader loads it again"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class VersionedLRU:
+    """Thread-safe LRU cache of values computed from a user's data.
+
+    Keys are tuples whose first element is the user, followed by whatever the
+    value depends on, e.g. (user, data version, config version, as-of date),
+    so an entry is only reused while those are unchanged. Call
+    invalidate(user) after writing the user's tab to drop their entries."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user):
+        """Drop every cached value for `user`"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user]:
+                del self._entries[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
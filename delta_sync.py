@@ -0,0 +1,257 @@
+"""
+Incremental ("delta") sync of tabs from Google Sheets.
+
+A full read downloads every row of a tab on each refresh, although usually the
+only difference is today's row. DeltaSync keeps the raw values of every tab it
+has read, plus a content hash per row, and refreshes a tab by fetching only:
+  - the header and config rows (rows 1-10),
+  - the timestamp column of the data rows, and
+  - the tail: everything below the last row it has seen.
+Rows whose timestamp no longer matches the cached one are then re-fetched in a
+second request and merged in. A tab is only re-parsed when a row's hash
+actually changed; otherwise the previous DataFrame is returned as-is.
+
+Edits that don't touch the timestamp (say, a cell fixed by hand in the sheet)
+don't show up in a delta, so each tab is still read in full every
+FULL_SYNC_INTERVAL seconds - and straight away when its header changes or a
+delta looks like rows were inserted or deleted rather than edited.
+"""
+
+import hashlib
+import json
+import threading
+import time
+
+from gspread.exceptions import APIError
+from gspread.utils import absolute_range_name
+
+from sheets import CONFIG_ROWS_COUNT, batch_get_values, column_letter, values_to_dataframe
+
+# Column the app stamps on every save; edits to a row change it
+TIMESTAMP_COLUMN = 'timestamp'
+
+# Seconds between full re-reads of a tab, to pick up edits that a delta can't see
+FULL_SYNC_INTERVAL = 30 * 60
+
+# More changed timestamps than this means rows moved (inserted or deleted
+# mid-tab, or re-sorted), which a full read handles better than a patch
+MAX_CHANGED_ROWS = 20
+
+
+def trim_row(row):
+    """Row without trailing blank cells, as the Sheets API returns it"""
+    row = list(row)
+    while row and row[-1] in ('', None):
+        row.pop()
+    return row
+
+
+def row_hash(row):
+    return hashlib.blake2b(json.dumps(trim_row(row), default=str).encode(), digest_size=8).digest()
+
+
+def cell(row, col):
+    """Cell `col` (0-indexed) of a trimmed row, '' if past its end"""
+    return row[col] if col < len(row) else ''
+
+
+def row_runs(rows):
+    """Sorted row numbers -> (first, last) runs of consecutive rows"""
+    runs = []
+    for row in rows:
+        if runs and row == runs[-1][1] + 1:
+            runs[-1][1] = row
+        else:
+            runs.append([row, row])
+    return [tuple(run) for run in runs]
+
+
+class TabMirror:
+    """Raw values of one tab as last synced, with per-row hashes and the
+    parsed DataFrame"""
+
+    def __init__(self, values, now):
+        self.values = [trim_row(row) for row in values]
+        self.hashes = [row_hash(row) for row in self.values]
+        self.frame = values_to_dataframe(self.values)
+        self.full_synced_at = now
+
+    @property
+    def header(self):
+        return self.values[0] if self.values else []
+
+    @property
+    def width(self):
+        return max((len(row) for row in self.values), default=0)
+
+    def timestamp_col(self):
+        """0-indexed timestamp column, or None if the tab has none"""
+        header = [str(name) for name in self.header]
+        return header.index(TIMESTAMP_COLUMN) if TIMESTAMP_COLUMN in header else None
+
+    def merge(self, rows):
+        """Apply {sheet row number: row values}; returns True if anything
+        actually changed (the frame is re-parsed only then)"""
+        changed = False
+        for row_number, row in rows.items():
+            row = trim_row(row)
+            index = row_number - 1
+            while len(self.values) <= index:
+                self.values.append([])
+                self.hashes.append(row_hash([]))
+            new_hash = row_hash(row)
+            if new_hash != self.hashes[index]:
+                self.values[index] = row
+                self.hashes[index] = new_hash
+                changed = True
+
+        # Rows cleared at the bottom of the tab: the API doesn't return
+        # trailing empty rows, so neither should the mirror
+        while self.values and not self.values[-1]:
+            self.values.pop()
+            self.hashes.pop()
+            changed = True
+
+        if changed:
+            self.frame = values_to_dataframe(self.values)
+        return changed
+
+
+class DeltaSync:
+    """Reads tabs through a gspread client, incrementally after the first read.
+
+    read_tabs() takes one values:batchGet request for all tabs (full reads and
+    deltas together), plus one more only if some already-seen rows changed."""
+
+    def __init__(self, client, spreadsheet_url, full_sync_interval=FULL_SYNC_INTERVAL):
+        self.client = client
+        self.spreadsheet_url = spreadsheet_url
+        self.full_sync_interval = full_sync_interval
+        self._mirrors = {}
+        self._lock = threading.Lock()
+
+        # Running totals, for diagnostics
+        self.full_reads = 0
+        self.delta_reads = 0
+        self.rows_fetched = 0
+
+    def forget(self, name=None):
+        """Drop one tab's mirror (or all of them) so the next read is a full read"""
+        with self._lock:
+            if name is None:
+                self._mirrors.clear()
+            else:
+                self._mirrors.pop(name, None)
+
+    def _needs_full_read(self, mirror, now):
+        return (mirror is None or mirror.timestamp_col() is None
+                or now - mirror.full_synced_at >= self.full_sync_interval)
+
+    def read_tabs(self, names):
+        """Dict of tab name -> DataFrame, parsed like conn.read()"""
+        names = list(names)
+        # One sync at a time: mirrors are patched in place
+        with self._lock:
+            try:
+                return self._sync(names)
+            except APIError:
+                # e.g. a tail range past the end of the grid: start over
+                for name in names:
+                    self._mirrors.pop(name, None)
+                return self._sync(names)
+
+    def _sync(self, names):
+        now = time.time()
+        full = [name for name in names if self._needs_full_read(self._mirrors.get(name), now)]
+        delta = [name for name in names if name not in full]
+
+        # Full tabs, then three probe ranges per delta tab, all in one request
+        ranges = [absolute_range_name(name) for name in full]
+        for name in delta:
+            ranges.extend(self._probe_ranges(name, self._mirrors[name]))
+        results = batch_get_values(self.client, self.spreadsheet_url, ranges)
+
+        for name, values in zip(full, results):
+            self._mirrors[name] = TabMirror(values, now)
+            self.full_reads += 1
+            self.rows_fetched += len(values)
+
+        probes = results[len(full):]
+        refetch = {}
+        for i, name in enumerate(delta):
+            head, stamps, tail = probes[3 * i:3 * i + 3]
+            rows = self._apply_probe(name, head, stamps, tail, now)
+            if rows:
+                refetch[name] = rows
+
+        if refetch:
+            self._refetch_rows(refetch)
+
+        return {name: self._mirrors[name].frame for name in names}
+
+    def _probe_ranges(self, name, mirror):
+        ts_letter = column_letter(mirror.timestamp_col() + 1)
+        last_letter = column_letter(max(mirror.width, 1))
+        return [
+            absolute_range_name(name, f"1:{CONFIG_ROWS_COUNT}"),
+            absolute_range_name(name, f"{ts_letter}{CONFIG_ROWS_COUNT + 1}:{ts_letter}"),
+            absolute_range_name(name, f"A{len(mirror.values) + 1}:{last_letter}"),
+        ]
+
+    def _apply_probe(self, name, head, stamps, tail, now):
+        """Merge header/config rows and the tail into the mirror; returns the
+        already-seen rows whose timestamp changed (to fetch next)"""
+        mirror = self._mirrors[name]
+        if not head or trim_row(head[0]) != mirror.header:
+            # Columns changed: every row's layout may have too
+            self._full_read(name, now)
+            return []
+
+        seen_rows = len(mirror.values)
+        ts_col = mirror.timestamp_col()
+        changed = []
+        for row_number in range(CONFIG_ROWS_COUNT + 1, seen_rows + 1):
+            offset = row_number - CONFIG_ROWS_COUNT - 1
+            new_stamp = cell(stamps[offset], 0) if offset < len(stamps) and stamps[offset] else ''
+            if new_stamp != cell(mirror.values[row_number - 1], ts_col):
+                changed.append(row_number)
+
+        if len(changed) > MAX_CHANGED_ROWS:
+            self._full_read(name, now)
+            return []
+
+        rows = {row_number: row for row_number, row in enumerate(head, start=1)}
+        # Config rows that were cleared don't come back at all
+        for row_number in range(len(head) + 1, min(CONFIG_ROWS_COUNT, seen_rows) + 1):
+            rows[row_number] = []
+        for offset, row in enumerate(tail):
+            rows[seen_rows + 1 + offset] = row
+        mirror.merge(rows)
+
+        self.delta_reads += 1
+        self.rows_fetched += len(head) + len(tail) + len(changed)
+        return changed
+
+    def _refetch_rows(self, refetch):
+        """Fetch and merge the changed rows of every tab in one request"""
+        requests = []
+        for name, rows in refetch.items():
+            last_letter = column_letter(max(self._mirrors[name].width, 1))
+            for first, last in row_runs(rows):
+                requests.append((name, first, last, absolute_range_name(name, f"A{first}:{last_letter}{last}")))
+
+        results = batch_get_values(self.client, self.spreadsheet_url, [r[3] for r in requests])
+        merged = {}
+        for (name, first, last, _), values in zip(requests, results):
+            rows = merged.setdefault(name, {})
+            for row_number in range(first, last + 1):
+                offset = row_number - first
+                rows[row_number] = values[offset] if offset < len(values) else []
+        for name, rows in merged.items():
+            self._mirrors[name].merge(rows)
+
+    def _full_read(self, name, now):
+        values = batch_get_values(self.client, self.spreadsheet_url, [absolute_range_name(name)])[0]
+        self._mirrors[name] = TabMirror(values, now)
+        self.full_reads += 1
+        self.rows_fetched += len(values)
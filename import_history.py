@@ -0,0 +1,415 @@
+"""
+Bulk import of historical day rows: CSV files (spreadsheet exports, wearable
+exports), JSON Lines, or JSON in the legacy kpi_data.json layout
+({user: {date: {column: value}}}).
+
+Files are read in chunks of CHUNK_ROWS rows (JSON is parsed incrementally,
+a day or record at a time, so a large kpi_data.json is never loaded whole),
+and every value is checked and converted against the type row (row 5) of the
+user's tab, the same way the form's values are. Rows that fail are skipped
+and reported. Valid days are
+merged into the user's existing rows (imported columns win, the rest are
+kept) and upserted by date, BATCH_DAYS days per storage call; on Sheets that
+is one values:batchUpdate for days already logged plus one row insert for new
+ones (added after the tab's last row), instead of one request per row.
+
+    python import_history.py history.csv --user anne
+    python import_history.py garmin.csv --user bobby --map "Resting Heart Rate=rhr" --map "HRV=hrv"
+    python import_history.py kpi_data.json --map-user "Friend 1=anne" --dry-run
+
+Writes go to Google Sheets, or to the local database with BDD_STORAGE=sqlite.
+"""
+
+import argparse
+import json
+import math
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from column_config import TRUTHY_STRINGS, compile_column_config
+from scheduler import RequestScheduler
+from sheets import CONFIG_ROWS_COUNT
+from storage import STORAGE_BACKEND, SQLiteStorage, StorageError, frame_rows
+
+# Rows read from the input file at a time
+CHUNK_ROWS = 5000
+
+# Days written per storage call
+BATCH_DAYS = 500
+
+# Characters read from a JSON file at a time
+JSON_BLOCK_CHARS = 1 << 16
+
+# Cell values (after str().upper()) that count as an unchecked boolean
+FALSY_STRINGS = ['FALSE', '0', '0.0', 'NO', 'N', 'F']
+
+# Validation errors printed in the report (the rest are only counted)
+MAX_ERRORS_SHOWN = 20
+
+
+def is_blank(value):
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    return isinstance(value, str) and value.strip() == ''
+
+
+def normalize_date(value):
+    """'YYYY-MM-DD' for anything pandas can parse as a date or timestamp"""
+    try:
+        # ISO dates and timestamps, without pandas' per-call overhead
+        return datetime.fromisoformat(str(value).strip()).strftime('%Y-%m-%d')
+    except ValueError:
+        pass
+    day = pd.to_datetime(value, errors='coerce')
+    if pd.isna(day):
+        raise ValueError(f"{value!r} isn't a date")
+    return day.strftime('%Y-%m-%d')
+
+
+def coerce_cell(value, col_type):
+    """Value as it should be written to a column of col_type ('' for blanks);
+    raises ValueError if it can't be read as that type"""
+    if is_blank(value):
+        return ''
+    if col_type == 'boolean':
+        # Stored as 1/0, like the form saves them
+        text = str(value).strip().upper()
+        if text in TRUTHY_STRINGS or text == '1.0':
+            return 1
+        if text in FALSY_STRINGS:
+            return 0
+        raise ValueError(f"{value!r} isn't a yes/no value")
+    if col_type == 'int':
+        number = float(value)
+        if not number.is_integer():
+            raise ValueError(f"{value!r} isn't a whole number")
+        return int(number)
+    if col_type == 'float':
+        number = float(value)
+        if not math.isfinite(number):
+            raise ValueError(f"{value!r} isn't a finite number")
+        return number
+    if col_type == 'date':
+        return normalize_date(value)
+    return str(value)
+
+
+class JSONStream:
+    """Incremental reader of one JSON document: objects and arrays are walked
+    an entry at a time (object_keys, array_items) and only the values taken
+    with value() are decoded whole"""
+
+    def __init__(self, f, block_chars=JSON_BLOCK_CHARS):
+        self.f = f
+        self.block_chars = block_chars
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Read another block; returns False at the end of the file"""
+        if self.eof:
+            return False
+        block = self.f.read(self.block_chars)
+        self.buf = self.buf[self.pos:] + block
+        self.pos = 0
+        self.eof = not block
+        return not self.eof
+
+    def peek(self):
+        """Next non-whitespace character ('' at the end of the file), not consumed"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            found = self.peek() or 'end of file'
+            raise ValueError(f"Invalid JSON: expected {char!r}, found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete value (string, number, object, ...)"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number or literal at the end of the buffer may continue in the next block
+            if end < len(self.buf) or not self._fill():
+                self.pos = end
+                return value
+
+    def _entries(self, close):
+        if self.peek() == close:
+            self.pos += 1
+            return
+        while True:
+            yield
+            separator = self.peek()
+            self.pos += 1
+            if separator == close:
+                return
+            if separator != ',':
+                raise ValueError(f"Invalid JSON: expected ',' or {close!r}, found {separator or 'end of file'!r}")
+
+    def object_keys(self):
+        """Keys of the object that comes next; read each key's value before the next one"""
+        self.expect('{')
+        for _ in self._entries('}'):
+            key = self.value()
+            self.expect(':')
+            yield key
+
+    def array_items(self):
+        """Items of the array that comes next, decoded one at a time"""
+        self.expect('[')
+        for _ in self._entries(']'):
+            yield self.value()
+
+
+def read_json_records(f, block_chars=JSON_BLOCK_CHARS):
+    """Records of a JSON file, one at a time: a list of records, or the legacy
+    kpi_data.json layout ({user: {date: {column: value}}}, read a day at a time)"""
+    stream = JSONStream(f, block_chars)
+    if stream.peek() == '[':
+        yield from stream.array_items()
+        return
+    for user in stream.object_keys():
+        if stream.peek() != '{':
+            raise ValueError(f"Expected {user!r} to map dates to days in the kpi_data.json layout")
+        for day in stream.object_keys():
+            yield {'user': user, 'date': day, **stream.value()}
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """DataFrames of up to chunk_rows records each, with the file's own column
+    names (legacy kpi_data.json records get 'user' and 'date' columns)"""
+    if path.endswith('.csv'):
+        # Everything as text: coerce_cell does the typing
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=False)
+    elif path.endswith(('.jsonl', '.ndjson')):
+        yield from pd.read_json(path, lines=True, chunksize=chunk_rows, dtype=False)
+    elif path.endswith('.json'):
+        with open(path) as f:
+            records = read_json_records(f)
+            while True:
+                chunk = [record for _, record in zip(range(chunk_rows), records)]
+                if not chunk:
+                    break
+                yield pd.DataFrame.from_records(chunk)
+    else:
+        raise ValueError(f"Don't know how to read {path!r} (expected .csv, .json or .jsonl)")
+
+
+class UserTab:
+    """One user's column config and existing rows by date, plus the days
+    imported for them that haven't been written yet"""
+
+    def __init__(self, user, tab):
+        if 'date' not in tab.columns or len(tab) < CONFIG_ROWS_COUNT - 1:
+            raise StorageError(f"Tab {user!r} has no config rows or no 'date' column")
+        self.user = user
+        self.columns = [str(col) for col in tab.columns]
+        self.config = compile_column_config(tab.iloc[0:CONFIG_ROWS_COUNT - 1])
+        self.existing = {}
+        for row in frame_rows(tab.iloc[CONFIG_ROWS_COUNT:]):
+            values = dict(zip(self.columns, row))
+            if values['date'] != '':
+                self.existing.setdefault(str(values['date']), values)
+        self.pending = {}
+
+    def col_type(self, column):
+        spec = self.config.get(column)
+        return spec.type if spec is not None else 'note'
+
+    def add(self, record, stamp):
+        """Merge one record (column -> raw value) into the day it's for.
+        Returns the record's columns the tab doesn't have (they're ignored);
+        raises ValueError if the date or a value doesn't fit the tab."""
+        day = normalize_date(record.get('date'))
+        cells = {}
+        unknown = set()
+        for column, value in record.items():
+            if column in ('user', 'date'):
+                continue
+            if column not in self.columns:
+                unknown.add(column)
+                continue
+            try:
+                cells[column] = coerce_cell(value, self.col_type(column))
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"{column}: {e}") from None
+
+        row = self.pending.get(day)
+        if row is None:
+            existing = self.existing.get(day, {})
+            # Existing cells are rewritten as they are, typed cells normalized
+            row = {}
+            for column in self.columns:
+                try:
+                    row[column] = coerce_cell(existing.get(column, ''), self.col_type(column))
+                except (TypeError, ValueError):
+                    row[column] = existing.get(column, '')
+            self.pending[day] = row
+        row.update(cells)
+        row['user'] = self.user
+        row['date'] = day
+        if 'timestamp' in self.columns and 'timestamp' not in cells:
+            # A new timestamp is how incremental refreshes spot changed rows
+            row['timestamp'] = stamp
+        return unknown
+
+    def take(self):
+        """The pending days as {date: values}, and how many of them the tab
+        doesn't have yet; they're no longer pending"""
+        # In date order, so new rows are added to the tab in date order
+        days, self.pending = dict(sorted(self.pending.items())), {}
+        new = sum(day not in self.existing for day in days)
+        self.existing.update(days)
+        return days, new
+
+
+class ImportStats:
+    """Counters for the throughput report"""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.chunks = 0
+        self.rows_valid = 0
+        self.errors = []
+        # (user, column) pairs of file columns the user's tab doesn't have
+        self.ignored_columns = set()
+        self.days_new = 0
+        self.days_updated = 0
+        self.write_calls = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def report(self, requests=None):
+        elapsed = max(self.elapsed, 1e-9)
+        days = self.days_new + self.days_updated
+        lines = [
+            f"Read {self.rows_read:,} rows in {self.chunks} chunks: "
+            f"{self.rows_valid:,} valid, {len(self.errors):,} skipped",
+            f"Wrote {days:,} days ({self.days_new:,} new, {self.days_updated:,} updated) "
+            f"in {self.write_calls} batched writes" + (f", {requests} API requests" if requests is not None else ""),
+            f"{elapsed:.2f} s: {self.rows_read / elapsed:,.0f} rows/s read, {days / elapsed:,.0f} days/s written",
+        ]
+        for user, column in sorted(self.ignored_columns):
+            lines.append(f"  ignored column {column!r} ({user}'s tab has no such column)")
+        for error in self.errors[:MAX_ERRORS_SHOWN]:
+            lines.append(f"  skipped {error}")
+        if len(self.errors) > MAX_ERRORS_SHOWN:
+            lines.append(f"  ... and {len(self.errors) - MAX_ERRORS_SHOWN} more")
+        return "\n".join(lines)
+
+
+def import_file(storage, path, user=None, column_map=None, user_map=None,
+                chunk_rows=CHUNK_ROWS, batch_days=BATCH_DAYS, dry_run=False):
+    """Import every record of `path` into `storage`; returns ImportStats.
+
+    user: the user for files without a 'user' column. column_map renames file
+    columns to tab columns (anything mapped to '' is dropped); user_map
+    renames users (e.g. legacy names)."""
+    column_map = column_map or {}
+    user_map = user_map or {}
+    stats = ImportStats()
+    tabs = {}
+    stamp = datetime.now().isoformat()
+
+    def write(tab):
+        days, new = tab.take()
+        if not days:
+            return
+        if not dry_run:
+            storage.upsert_days(tab.user, days)
+        stats.days_new += new
+        stats.days_updated += len(days) - new
+        stats.write_calls += 1
+
+    for chunk in read_chunks(path, chunk_rows):
+        stats.chunks += 1
+        chunk = chunk.rename(columns=column_map)
+        chunk = chunk.drop(columns=[col for col in chunk.columns if col == ''])
+        for line, record in enumerate(chunk.to_dict('records'), start=stats.rows_read + 1):
+            record_user = record.pop('user', None)
+            record_user = str(user if is_blank(record_user) else record_user or '').strip()
+            record_user = user_map.get(record_user, record_user).lower()
+            try:
+                if not record_user:
+                    raise ValueError("no user (add a 'user' column or pass --user)")
+                tab = tabs.get(record_user)
+                if tab is None:
+                    tab = tabs[record_user] = UserTab(record_user, storage.read_tab(record_user, fresh=True))
+                unknown = tab.add(record, stamp)
+            except (ValueError, StorageError) as e:
+                stats.errors.append(f"record {line}: {e}")
+                continue
+            stats.rows_valid += 1
+            stats.ignored_columns.update((record_user, column) for column in unknown)
+            if len(tab.pending) >= batch_days:
+                write(tab)
+        stats.rows_read += len(chunk)
+
+    for tab in tabs.values():
+        write(tab)
+    stats.elapsed = time.perf_counter() - stats.started
+    return stats
+
+
+def parse_mapping(pairs):
+    """['a=b', ...] -> {'a': 'b', ...}"""
+    mapping = {}
+    for pair in pairs or []:
+        source, sep, target = pair.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(f"Expected SOURCE=TARGET, got {pair!r}")
+        mapping[source.strip()] = target.strip()
+    return mapping
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help=".csv, .json (kpi_data.json layout or a list of records) or .jsonl file")
+    parser.add_argument("--user", help="user the rows belong to, if the file has no 'user' column")
+    parser.add_argument("--map", action="append", metavar="SOURCE=TARGET",
+                        help="rename a file column to a tab column (repeatable; empty TARGET drops it)")
+    parser.add_argument("--map-user", action="append", metavar="SOURCE=TARGET", help="rename a user (repeatable)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows read at a time")
+    parser.add_argument("--batch-days", type=int, default=BATCH_DAYS, help="days written per batched write")
+    parser.add_argument("--dry-run", action="store_true", help="validate and count, but don't write")
+    args = parser.parse_args()
+
+    if STORAGE_BACKEND == 'sqlite':
+        storage = SQLiteStorage()
+        scheduler = None
+    else:
+        from populate_config_rows import connect_sheets_storage
+        storage = connect_sheets_storage()
+        if storage is None:
+            return
+        # Paced to the Sheets quotas and retried on 429s, like the app's requests
+        scheduler = RequestScheduler()
+        scheduler.install(storage.client)
+
+    stats = import_file(storage, args.path, user=args.user, column_map=parse_mapping(args.map),
+                        user_map=parse_mapping(args.map_user), chunk_rows=args.chunk_rows,
+                        batch_days=args.batch_days, dry_run=args.dry_run)
+    if args.dry_run:
+        print("Dry run: nothing was written")
+    print(stats.report(requests=scheduler.requests_sent if scheduler is not None else None))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Lightweight timings of Sheets calls and render phases.
+
+A span is one timed piece of work: a Sheets API request (recorded by the
+RequestScheduler), a loader such as load_users, or a render phase such as
+scoring the leaderboard. Each span has a duration and, where the code doing
+the work sets them with annotate(), the rows and bytes it handled and whether
+a cache answered ('hit', 'miss', 'partial' or 'snapshot').
+
+Spans are grouped into runs. The app starts one per script run (begin_run /
+end_run); a span opened on a thread with no run in progress (a fragment
+rerun, a background refresher pass, a save flush) is a run of its own. With
+BDD_TIMINGS_LOG set, every span is appended to that JSON Lines file for
+offline aggregation; the page shows the spans of its current run in the
+sidebar with ?debug=1 either way.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# JSON Lines file every span is appended to. Off unless BDD_TIMINGS_LOG is
+# set: the file is never rotated, so it's meant for profiling sessions, not
+# long-running deployments
+TIMINGS_LOG = os.environ.get("BDD_TIMINGS_LOG", "")
+
+# Span attributes annotate() sets directly; anything else goes in its fields
+SPAN_ATTRIBUTES = ("rows", "bytes", "cache", "error")
+
+
+class Span:
+    """One timed piece of work, nested `depth` spans deep in its run"""
+
+    __slots__ = ("name", "kind", "depth", "parent", "started", "duration", "rows", "bytes", "cache", "error", "fields")
+
+    def __init__(self, name, kind, depth=0, parent=None, fields=None):
+        self.name = name
+        # 'sheets' for API requests, 'phase' for everything else
+        self.kind = kind
+        self.depth = depth
+        self.parent = parent
+        self.started = time.time()
+        self.duration = None
+        self.rows = None
+        self.bytes = None
+        self.cache = None
+        self.error = None
+        self.fields = fields or {}
+
+    def as_dict(self):
+        record = {
+            "ts": round(self.started, 3),
+            "name": self.name,
+            "kind": self.kind,
+            "depth": self.depth,
+            "parent": self.parent,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "cache": self.cache,
+            "error": self.error,
+        }
+        record.update(self.fields)
+        return record
+
+
+class Timings:
+    """Collects each thread's spans into runs and appends every span to a
+    JSON Lines file (none if path is None)"""
+
+    def __init__(self, path=None):
+        self.path = path or None
+        self._file = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        # Running totals, for diagnostics
+        self.spans_recorded = 0
+        self.write_errors = 0
+
+    def log_to(self, path):
+        """Append spans to `path` from now on (None or '' stops logging); returns self"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.path = path or None
+        return self
+
+    def begin_run(self, **fields):
+        """Start collecting this thread's spans as a new run, replacing any
+        run left unfinished (e.g. by st.stop()). fields (session, user, ...)
+        are added to the JSON line of every span in the run."""
+        self._local.run = {"run": uuid.uuid4().hex[:12], **fields}
+        self._local.spans = []
+        self._local.stack = []
+
+    def update_run(self, **fields):
+        """Add fields to the run in progress on this thread"""
+        run = getattr(self._local, "run", None)
+        if run is not None:
+            run.update(fields)
+
+    def end_run(self):
+        """Finish this thread's run; returns its spans in the order they ended"""
+        spans = getattr(self._local, "spans", None) or []
+        self._local.run = None
+        self._local.spans = None
+        self._local.stack = []
+        with self._lock:
+            if self._file is not None:
+                try:
+                    self._file.flush()
+                except OSError:
+                    self.write_errors += 1
+        return spans
+
+    def current_spans(self):
+        """Spans that have ended so far in this thread's run"""
+        return list(getattr(self._local, "spans", None) or [])
+
+    @contextmanager
+    def span(self, name, kind="phase", **fields):
+        """Time the body as a span (yielded, so the body can set rows, bytes
+        or cache on it). Exceptions are recorded on the span and re-raised."""
+        implicit = getattr(self._local, "run", None) is None
+        if implicit:
+            self.begin_run()
+        stack = self._local.stack
+        span = Span(name, kind, depth=len(stack), parent=stack[-1].name if stack else None, fields=fields)
+        stack.append(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            stack.pop()
+            self._record(span)
+            if implicit:
+                self.end_run()
+
+    def annotate(self, **values):
+        """Set rows, bytes, cache or error (or extra fields) on this thread's
+        innermost open span; does nothing outside a span"""
+        stack = getattr(self._local, "stack", None)
+        if not stack:
+            return
+        span = stack[-1]
+        for key, value in values.items():
+            if key in SPAN_ATTRIBUTES:
+                setattr(span, key, value)
+            else:
+                span.fields[key] = value
+
+    def _record(self, span):
+        # The run may have been ended inside the span (e.g. by st.stop())
+        spans = getattr(self._local, "spans", None)
+        if spans is not None:
+            spans.append(span)
+        run = getattr(self._local, "run", None) or {}
+        record = {**run, "thread": threading.current_thread().name, **span.as_dict()}
+        with self._lock:
+            self.spans_recorded += 1
+            if self.path is None:
+                return
+            try:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8")
+                self._file.write(json.dumps(record, default=str) + "\n")
+            except OSError:
+                self.write_errors += 1
+
+
+# Process-wide recorder (the app points it at TIMINGS_LOG)
+timings = Timings()
+
+
+def span(name, kind="phase", **fields):
+    return timings.span(name, kind, **fields)
+
+
+def annotate(**values):
+    timings.annotate(**values)
+
+
+def timed(name=None, kind="phase"):
+    """Decorator: every call of the function is a span (named after it by default)"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timings.span(name or fn.__name__, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def summarize(spans):
+    """Totals over spans, for the debug panel: Sheets requests and their
+    time and bytes, and cache hits and misses"""
+    requests = [s for s in spans if s.kind == "sheets"]
+    caches = [s.cache for s in spans if s.cache is not None]
+    return {
+        "sheets_requests": len(requests),
+        "sheets_ms": sum(s.duration for s in requests) * 1000,
+        "sheets_bytes": sum(s.bytes or 0 for s in requests),
+        "cache_hits": sum(cache in ("hit", "snapshot") for cache in caches),
+        "cache_misses": sum(cache in ("miss", "partial") for cache in caches),
+        "errors": sum(s.error is not None for s in spans),
+    }
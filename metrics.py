@@ -0,0 +1,334 @@
+"""
+Process-wide metrics in the Prometheus text exposition format.
+
+Per-page timings (instrumentation.py) show where one rerun went; these are
+running totals for the whole app process, to spot quota pressure, slow saves
+or falling cache hit rates building up over time:
+
+  - bdd_sheets_request_duration_seconds: Sheets API latency, by request type
+  - bdd_sheets_request_errors_total / _throttled_seconds_total: failed
+    requests by HTTP status (429 is quota) and time spent waiting for quota
+  - bdd_saves_total and bdd_save_flushes_total: save_user_data outcomes, and
+    write-behind flushes to Sheets; bdd_saves_pending: days not yet flushed
+  - bdd_cache_lookups_total: hits and misses of the shared data store,
+    score cache and trend figure cache, by cache (hit ratio = hit / all
+    lookups)
+  - bdd_active_sessions and bdd_rerun_duration_seconds: browser sessions
+    seen in the last ACTIVE_SESSION_WINDOW, and full page rerun times
+
+Updates are a dict lookup and an add under a lock, so they're cheap enough
+for the hot path. A MetricsExporter, with BDD_METRICS_FILE set, writes
+everything to that file every METRICS_INTERVAL seconds (for node_exporter's
+textfile collector) and, with BDD_METRICS_PORT set, serves it at
+http://<host>:<port>/metrics. Both are off by default.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Text file the exporter rewrites (off unless BDD_METRICS_FILE is set)
+METRICS_FILE = os.environ.get("BDD_METRICS_FILE", "")
+
+# Port for the /metrics endpoint (0, the default, means no endpoint)
+METRICS_PORT = int(os.environ.get("BDD_METRICS_PORT", "0"))
+
+# Seconds between metrics file writes
+METRICS_INTERVAL = 15.0
+
+# A session counts as active if it reran within this many seconds
+ACTIVE_SESSION_WINDOW = 300.0
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RERUN_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger(__name__)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    """A named metric with one value (or histogram) per combination of label values"""
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        """(suffix, label values, extra labels, value) of every sample"""
+        with self._lock:
+            return [("", key, (), value) for key, value in sorted(self._values.items())]
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{format_labels(self.labelnames, key, extra)} {format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """A total that only goes up"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """A value that goes up and down: set directly, or read from a function
+    (returning a number) each time the metrics are exposed"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function):
+        """Read the gauge from function() (None skips the sample)"""
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception as e:
+                logger.warning("Reading gauge %s failed: %s: %s", self.name, type(e).__name__, e)
+                return []
+            # None: nothing to report (yet)
+            return [] if value is None else [("", (), (), value)]
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Counts of observations at or below each bucket bound, plus their sum"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket plus +Inf, then the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def count(self, **labels):
+        with self._lock:
+            counts = self._values.get(self._key(labels))
+            return sum(counts[:-1]) if counts else 0
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in sorted(self._values.items())]
+        samples = []
+        for key, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                samples.append(("_bucket", key, (("le", format_value(bound)),), cumulative))
+            samples.append(("_sum", key, (), counts[-1]))
+            samples.append(("_count", key, (), cumulative))
+        return samples
+
+
+class SessionTracker:
+    """Last rerun time of each browser session, for the active sessions gauge"""
+
+    def __init__(self, window=ACTIVE_SESSION_WINDOW):
+        self.window = window
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def touch(self, session_id):
+        with self._lock:
+            self._seen[session_id] = time.time()
+
+    def active(self):
+        """Sessions seen within the window (older ones are forgotten)"""
+        cutoff = time.time() - self.window
+        with self._lock:
+            for session_id in [s for s, seen in self._seen.items() if seen < cutoff]:
+                del self._seen[session_id]
+            return len(self._seen)
+
+
+class Registry:
+    """The metrics of one process, in registration order"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def expose(self):
+        """Every metric in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+sessions = SessionTracker()
+
+SHEETS_REQUEST_SECONDS = registry.histogram(
+    "bdd_sheets_request_duration_seconds", "Sheets API request latency (each attempt)", ["request"])
+SHEETS_REQUEST_ERRORS = registry.counter(
+    "bdd_sheets_request_errors_total", "Sheets API requests that failed, by HTTP status (0: no response)",
+    ["request", "status"])
+SHEETS_THROTTLED_SECONDS = registry.counter(
+    "bdd_sheets_throttled_seconds_total", "Seconds requests waited for Sheets quota")
+SAVES = registry.counter(
+    "bdd_saves_total", "save_user_data calls, by outcome (success or failure)", ["outcome"])
+SAVE_FLUSHES = registry.counter(
+    "bdd_save_flushes_total", "Saved days written to the backend by the write-behind flusher, by outcome",
+    ["outcome"])
+SAVES_PENDING = registry.gauge(
+    "bdd_saves_pending", "Saved days waiting to be written to the backend")
+CACHE_LOOKUPS = registry.counter(
+    "bdd_cache_lookups_total", "Shared data store, score and trend figure cache lookups, by cache and result (hit, miss, snapshot)",
+    ["cache", "result"])
+ACTIVE_SESSIONS = registry.gauge(
+    "bdd_active_sessions", f"Browser sessions that reran in the last {ACTIVE_SESSION_WINDOW:.0f} seconds")
+ACTIVE_SESSIONS.set_function(sessions.active)
+RERUN_SECONDS = registry.histogram(
+    "bdd_rerun_duration_seconds", "Full page rerun time, by open tab", ["tab"], buckets=RERUN_BUCKETS)
+REFRESHER_LAG_SECONDS = registry.gauge(
+    "bdd_refresher_lag_seconds", "Seconds since the background refresher's last successful pass")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = registry
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.expose().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes would otherwise be logged to stderr every few seconds
+        pass
+
+
+class MetricsExporter:
+    """Writes the registry to a text file every `interval` seconds (atomically,
+    so readers never see half a file) and optionally serves it over HTTP"""
+
+    def __init__(self, registry=registry, path=METRICS_FILE, port=METRICS_PORT, interval=METRICS_INTERVAL):
+        self.registry = registry
+        self.path = path or None
+        self.port = port
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+
+        # Running totals, for diagnostics
+        self.writes = 0
+        self.write_errors = 0
+
+    def start(self):
+        """Start the file writer and the endpoint (whichever are configured); returns self"""
+        if self.path and (self._thread is None or not self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+            self._thread.start()
+        if self.port and self._server is None:
+            handler = type("MetricsHandler", (_MetricsHandler,), {"registry": self.registry})
+            try:
+                self._server = ThreadingHTTPServer(("", self.port), handler)
+            except OSError as e:
+                logger.warning("Could not serve metrics on port %d: %s", self.port, e)
+            else:
+                threading.Thread(target=self._server.serve_forever, name="metrics-endpoint", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def write(self):
+        """Write the metrics file now; returns whether it was written"""
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.registry.expose())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Writing metrics to %s failed: %s", self.path, e)
+            self.write_errors += 1
+            return False
+        self.writes += 1
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.write()
+            self._stop.wait(self.interval)
@@ -1,8 +1,30 @@
 """
 Script to populate configuration rows (2-10) in each user's tab based on old USER_CONFIG.
 Run this once to migrate from hardcoded config to spreadsheet-based config.
+
+Every tab's header and config rows are read in one request, then the tabs are
+migrated MAX_WORKERS at a time, sharing one request scheduler. Only config rows
+that differ from what's in the tab are written (all of them in one request per
+tab), and tabs without config rows get theirs inserted above the data, so
+re-running it is cheap. --dry-run prints the cells that would change instead.
+
+    python populate_config_rows.py --dry-run
 """
 
+import argparse
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+
+from scheduler import RequestScheduler
+from sheets import CONFIG_ROWS_COUNT
+from storage import CONFIG_ROW_NAMES, STORAGE_BACKEND, SheetsStorage, SQLiteStorage, frame_rows, to_cell_value
+
+# Tabs migrated at the same time
+MAX_WORKERS = 4
+
 # Reconstructed USER_CONFIG from old code
 OLD_CONFIG = {
     "bobby": {
@@ -196,8 +218,8 @@ OLD_CONFIG = {
     }
 }
 
-def populate_config_rows():
-    """Populate configuration rows 2-10 for each user tab"""
+def connect_sheets_storage():
+    """SheetsStorage for the spreadsheet in .streamlit/secrets.toml, or None if it can't connect"""
     # Read secrets.toml manually (simple TOML parser for our use case)
     try:
         secrets = {}
@@ -230,7 +252,7 @@ def populate_config_rows():
     except Exception as e:
         print(f"Could not read secrets.toml: {e}")
         print("Make sure .streamlit/secrets.toml exists and is properly formatted.")
-        return
+        return None
     
     # Use gspread directly
     import gspread
@@ -260,148 +282,235 @@ def populate_config_rows():
         spreadsheet_url = conn_config.get('spreadsheet')
         if not spreadsheet_url:
             print("Error: No spreadsheet URL found in secrets.toml")
-            return
-        sheet_id = spreadsheet_url.split('/d/')[1].split('/')[0]
-        spreadsheet = client.open_by_key(sheet_id)
+            return None
+        return SheetsStorage(client, spreadsheet_url)
     except Exception as e:
         print(f"Error connecting to Google Sheets: {e}")
-        return
-    
-    for user, config in OLD_CONFIG.items():
-        print(f"\nProcessing {user}...")
-        try:
-            worksheet = spreadsheet.worksheet(user)
-            
-            # Get all existing data
-            all_values = worksheet.get_all_values()
-            if not all_values:
-                print(f"  Warning: No data found in {user} tab")
-                continue
-            
-            # Get column names from row 1
-            row1 = all_values[0] if all_values else []
-            if not row1:
-                print(f"  Warning: No columns found in row 1 for {user}")
-                continue
-            
-            columns = row1
-            
-            # Check if config rows already exist (rows 2-10 should have config names in column A)
-            has_existing_config = False
-            if len(all_values) >= 10:
-                # Check if row 2 has a config name in column A
-                if len(all_values) > 1 and all_values[1] and all_values[1][0] in ['display_name', 'emoji', 'units', 'type', 'has_goal', 'weekly_or_daily_goal', 'goal_target', 'goal_direction', 'help_text']:
-                    has_existing_config = True
-                    print(f"  Note: Config rows already exist, will update them")
-            
-            # If config rows don't exist, shift existing data down
-            if not has_existing_config:
-                # Get existing data rows (everything after row 1)
-                existing_data = all_values[1:] if len(all_values) > 1 else []
-                
-                if existing_data:
-                    print(f"  Shifting {len(existing_data)} existing data rows down by 9 rows...")
-                    # Clear the worksheet first (we'll rebuild it)
-                    worksheet.clear()
-                    
-                    # Write row 1 (column names) back
-                    worksheet.update(values=[row1], range_name='A1')
-                    
-                    # Write existing data starting at row 11
-                    if existing_data:
-                        worksheet.update(values=existing_data, range_name='A11')
-            
-            # Build config rows with config names in column A
-            config_row_names = ['display_name', 'emoji', 'units', 'type', 'has_goal', 
-                              'weekly_or_daily_goal', 'goal_target', 'goal_direction', 'help_text']
-            config_rows = []
-            
-            # Row 2: display_name
-            row2 = [config_row_names[0]] + [config['display_names'].get(col, col.title().replace('_', ' ')) for col in columns[1:]]
-            config_rows.append(row2)
-            
-            # Row 3: emoji
-            row3 = [config_row_names[1]] + [config['emojis'].get(col, '') for col in columns[1:]]
-            config_rows.append(row3)
-            
-            # Row 4: units
-            row4 = [config_row_names[2]] + [config['units'].get(col, '') for col in columns[1:]]
-            config_rows.append(row4)
-            
-            # Row 5: type
-            row5 = [config_row_names[3]] + [config['types'].get(col, 'note') for col in columns[1:]]
-            config_rows.append(row5)
-            
-            # Row 6: has_goal
-            row6 = [config_row_names[4]]
-            for col in columns[1:]:
-                has_goal = col in config['weekly_goals'] or col in config['daily_goals']
-                row6.append('TRUE' if has_goal else 'FALSE')
-            config_rows.append(row6)
-            
-            # Row 7: weekly_or_daily_goal
-            row7 = [config_row_names[5]]
-            for col in columns[1:]:
-                if col in config['weekly_goals']:
-                    row7.append('weekly')
-                elif col in config['daily_goals']:
-                    row7.append('daily')
-                else:
-                    row7.append('')
-            config_rows.append(row7)
-            
-            # Row 8: goal_target
-            row8 = [config_row_names[6]]
-            for col in columns[1:]:
-                if col in config['weekly_goals']:
-                    row8.append(config['weekly_goals'][col])
-                elif col in config['daily_goals']:
-                    row8.append(config['daily_goals'][col])
-                else:
-                    row8.append('')
-            config_rows.append(row8)
-            
-            # Row 9: goal_direction
-            row9 = [config_row_names[7]]
-            for col in columns[1:]:
-                if col in config['daily_goals'] and isinstance(config['daily_goals'][col], (int, float)):
-                    # For numeric daily goals, check if it's a "less than" goal
-                    if col == 'added_sugar':  # Special case: less than 25g
-                        row9.append('at_most')
-                    else:
-                        row9.append('at_least')
-                elif col in config['weekly_goals'] and isinstance(config['weekly_goals'][col], (int, float)):
-                    # For weekly goals, check if it's a max (like drinks_daily: 12)
-                    if col == 'drinks_daily' or col == 'red_meat':  # Special cases
-                        row9.append('at_most')
-                    else:
-                        row9.append('at_least')
-                else:
-                    row9.append('at_least')  # Default for boolean goals
-            config_rows.append(row9)
-            
-            # Row 10: help_text
-            row10 = [config_row_names[8]] + [config['help_texts'].get(col, '') for col in columns[1:]]
-            config_rows.append(row10)
-            
-            # Write rows 2-10 (indices 1-9 in 0-indexed, but gspread uses 1-indexed)
-            for idx, row_data in enumerate(config_rows, start=2):
-                # Ensure row_data has same length as columns
-                while len(row_data) < len(columns):
-                    row_data.append('')
-                # Use correct parameter order to avoid deprecation warning
-                worksheet.update(values=[row_data[:len(columns)]], range_name=f'A{idx}')
-            
-            print(f"  ✓ Successfully populated config rows for {user}")
-            
-        except Exception as e:
-            print(f"  ✗ Error processing {user}: {e}")
-            import traceback
-            traceback.print_exc()
+        return None
+
+def build_config_rows(columns, config):
+    """Config rows 2-10 for a tab with these columns, from its OLD_CONFIG entry"""
+    # Build config rows with config names in column A
+    config_row_names = CONFIG_ROW_NAMES
+    config_rows = []
+
+    # Row 2: display_name
+    row2 = [config_row_names[0]] + [config['display_names'].get(col, col.title().replace('_', ' ')) for col in columns[1:]]
+    config_rows.append(row2)
+
+    # Row 3: emoji
+    row3 = [config_row_names[1]] + [config['emojis'].get(col, '') for col in columns[1:]]
+    config_rows.append(row3)
+
+    # Row 4: units
+    row4 = [config_row_names[2]] + [config['units'].get(col, '') for col in columns[1:]]
+    config_rows.append(row4)
+
+    # Row 5: type
+    row5 = [config_row_names[3]] + [config['types'].get(col, 'note') for col in columns[1:]]
+    config_rows.append(row5)
+
+    # Row 6: has_goal
+    row6 = [config_row_names[4]]
+    for col in columns[1:]:
+        has_goal = col in config['weekly_goals'] or col in config['daily_goals']
+        row6.append('TRUE' if has_goal else 'FALSE')
+    config_rows.append(row6)
+
+    # Row 7: weekly_or_daily_goal
+    row7 = [config_row_names[5]]
+    for col in columns[1:]:
+        if col in config['weekly_goals']:
+            row7.append('weekly')
+        elif col in config['daily_goals']:
+            row7.append('daily')
+        else:
+            row7.append('')
+    config_rows.append(row7)
+
+    # Row 8: goal_target
+    row8 = [config_row_names[6]]
+    for col in columns[1:]:
+        if col in config['weekly_goals']:
+            row8.append(config['weekly_goals'][col])
+        elif col in config['daily_goals']:
+            row8.append(config['daily_goals'][col])
+        else:
+            row8.append('')
+    config_rows.append(row8)
+
+    # Row 9: goal_direction
+    row9 = [config_row_names[7]]
+    for col in columns[1:]:
+        if col in config['daily_goals'] and isinstance(config['daily_goals'][col], (int, float)):
+            # For numeric daily goals, check if it's a "less than" goal
+            if col == 'added_sugar':  # Special case: less than 25g
+                row9.append('at_most')
+            else:
+                row9.append('at_least')
+        elif col in config['weekly_goals'] and isinstance(config['weekly_goals'][col], (int, float)):
+            # For weekly goals, check if it's a max (like drinks_daily: 12)
+            if col == 'drinks_daily' or col == 'red_meat':  # Special cases
+                row9.append('at_most')
+            else:
+                row9.append('at_least')
+        else:
+            row9.append('at_least')  # Default for boolean goals
+    config_rows.append(row9)
+
+    # Row 10: help_text
+    row10 = [config_row_names[8]] + [config['help_texts'].get(col, '') for col in columns[1:]]
+    config_rows.append(row10)
+
+    # Ensure each row has same length as columns
+    for row_data in config_rows:
+        while len(row_data) < len(columns):
+            row_data.append('')
+    return [row_data[:len(columns)] for row_data in config_rows]
+
+
+def cell_text(value):
+    """A cell as the sheet shows it, so cells read back compare equal to the
+    values that were written (True and 'TRUE', 25 and 25.0)"""
+    value = to_cell_value(value)
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def changed_cells(current_row, new_row):
+    """(column position, old, new) of every cell that differs"""
+    return [(i, old, new) for i, (old, new) in enumerate(zip_longest(current_row, new_row, fillvalue=''))
+            if cell_text(old) != cell_text(new)]
+
+
+class TabResult:
+    """What happened to one tab, and the lines to print for it"""
+
+    def __init__(self, user):
+        self.user = user
+        # 'inserted', 'updated', 'unchanged', 'skipped' or 'failed'
+        self.status = None
+        self.rows_written = 0
+        self.lines = []
+
+
+def migrate_tab(storage, user, config, head=None, dry_run=False):
+    """Bring one tab's config rows in line with its OLD_CONFIG entry, writing
+    only the rows that differ; head is the tab's header and config rows
+    (from read_config_rows) if they were read already. Returns a TabResult."""
+    result = TabResult(user)
+    try:
+        if head is None:
+            head = storage.read_config_rows([user])[user]
+
+        # Get column names from row 1
+        columns = [str(col) for col in head.columns]
+        if not columns:
+            result.status = 'skipped'
+            result.lines.append(f"  Warning: No data found in {user} tab")
+            return result
+        config_rows = build_config_rows(columns, config)
+
+        # Check if config rows already exist (rows 2-10 should have config names in column A)
+        has_existing_config = len(head) >= CONFIG_ROWS_COUNT - 1 and head.iloc[0, 0] in CONFIG_ROW_NAMES
+        if not has_existing_config:
+            # Existing rows move down below the new config rows
+            result.status = 'inserted'
+            result.rows_written = len(config_rows)
+            result.lines.append(f"  {'Would insert' if dry_run else 'Inserting'} {len(config_rows)} config rows "
+                                f"above the existing rows")
+            if not dry_run:
+                storage.write_config(user, columns, config_rows, insert=True)
+            return result
+
+        changed = []
+        for i, (current_row, new_row) in enumerate(zip(frame_rows(head), config_rows)):
+            cells = changed_cells(current_row, new_row)
+            if cells:
+                changed.append(i)
+                result.lines.append(f"  Row {i + 2} ({CONFIG_ROW_NAMES[i]}): " + ", ".join(
+                    f"{columns[col]} {cell_text(old)!r} -> {cell_text(new)!r}" for col, old, new in cells
+                ))
+        if not changed:
+            result.status = 'unchanged'
+            result.lines.append("  Config rows already up to date")
+            return result
+
+        result.status = 'updated'
+        result.rows_written = len(changed)
+        if not dry_run:
+            storage.write_config(user, columns, config_rows, rows=changed)
+        result.lines.append(f"  {'Would update' if dry_run else '✓ Updated'} {len(changed)} of "
+                            f"{len(config_rows)} config rows")
+    except Exception as e:
+        result.status = 'failed'
+        result.lines.append(f"  ✗ Error processing {user}: {e}")
+        result.lines.append(traceback.format_exc().rstrip())
+    return result
+
+
+def populate_config_rows(dry_run=False, workers=MAX_WORKERS):
+    """Populate configuration rows 2-10 for each user tab"""
+    # Google Sheets by default, or the local database with BDD_STORAGE=sqlite
+    if STORAGE_BACKEND == 'sqlite':
+        storage = SQLiteStorage()
+        scheduler = None
+    else:
+        storage = connect_sheets_storage()
+        if storage is None:
+            return
+        # One scheduler for every worker, so together they stay within the
+        # Sheets quotas (and are retried on 429s)
+        scheduler = RequestScheduler()
+        scheduler.install(storage.client)
+
+    started = time.perf_counter()
+    users = list(OLD_CONFIG)
+    try:
+        # Every tab's header and config rows in one read
+        heads = storage.read_config_rows(users)
+    except Exception:
+        # e.g. a missing tab fails the whole batch; read tabs one by one so
+        # only that tab reports the error
+        heads = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = executor.map(
+            lambda user: migrate_tab(storage, user, OLD_CONFIG[user], heads.get(user), dry_run=dry_run), users
+        )
+        counts = Counter()
+        rows_written = 0
+        for result in results:
+            print(f"\n{result.user}:")
+            for line in result.lines:
+                print(line)
+            counts[result.status] += 1
+            rows_written += result.rows_written
+
+    elapsed = time.perf_counter() - started
+    summary = ", ".join(f"{counts[status]} {status}" for status in ('inserted', 'updated', 'unchanged', 'skipped', 'failed')
+                        if counts[status])
+    print(f"\n{len(users)} tabs in {elapsed:.2f} s: {summary}")
+    requests = f" in {scheduler.requests_sent} API requests" if scheduler is not None else ""
+    print(f"{'Would write' if dry_run else 'Wrote'} {rows_written} config rows{requests}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true",
+                        help="show which config cells differ, but don't write anything")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="tabs migrated at the same time")
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     print("Populating configuration rows in Google Sheets...")
     print("=" * 60)
-    populate_config_rows()
+    populate_config_rows(dry_run=args.dry_run, workers=args.workers)
     print("=" * 60)
     print("Done!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Background refresher that keeps every tab warm.
+
+Without it, the first rerun after a shared entry expires reads Google Sheets
+itself, so every minute some visitor waits on the API. A Refresher instead
+runs a refresh function (re-read every tab, publish what changed) on a daemon
+thread every REFRESH_INTERVAL seconds, and page renders only read what it last
+published.
+
+The tracking date rolls over at 3am ET, which is also when everyone logs their
+last entries for the day. Within ROLLOVER_WINDOW of that moment the refresher
+runs every ROLLOVER_INTERVAL seconds instead, so the leaderboard and "already
+logged" checks move to the new day promptly.
+
+The refresher never raises: a failed pass is counted and logged and the next
+one runs on schedule. Its lag (seconds since the last successful pass) and
+failures are available from status() for the page to show.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# Seconds between refresh passes (BDD_REFRESH_INTERVAL=0 turns the refresher off)
+REFRESH_INTERVAL = float(os.environ.get("BDD_REFRESH_INTERVAL", "30"))
+
+# Seconds between passes close to the 3am ET rollover
+ROLLOVER_INTERVAL = float(os.environ.get("BDD_ROLLOVER_REFRESH_INTERVAL", "10"))
+
+# How long before and after the rollover the faster cadence applies
+ROLLOVER_WINDOW = timedelta(minutes=15)
+
+# A refresher whose last successful pass is this many intervals ago is behind
+MAX_LAG_INTERVALS = 3
+
+logger = logging.getLogger(__name__)
+
+
+def near_rollover(tracking_date, now, window=ROLLOVER_WINDOW):
+    """Whether the tracking date (tracking_date(now) -> date) changes within
+    `window` either side of `now`"""
+    return tracking_date(now - window) != tracking_date(now + window)
+
+
+class Refresher:
+    """Calls refresh() on a daemon thread, at a cadence that speeds up around
+    the rollover of tracking_date(now) -> date"""
+
+    def __init__(self, refresh, tracking_date, interval=REFRESH_INTERVAL,
+                 rollover_interval=ROLLOVER_INTERVAL, rollover_window=ROLLOVER_WINDOW):
+        self.refresh = refresh
+        self.tracking_date = tracking_date
+        self.interval = interval
+        self.rollover_interval = min(rollover_interval, interval)
+        self.rollover_window = rollover_window
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        # Running totals, for diagnostics
+        self.started_at = None
+        self.passes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_success = None
+        self.last_duration = None
+        self.last_error = None
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the thread (no-op if disabled or already running); returns self"""
+        with self._lock:
+            if self.enabled and not self.running:
+                self._stop.clear()
+                self.started_at = time.time()
+                self._thread = threading.Thread(target=self._run, name="tab-refresher", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        """Ask the thread to exit after the current pass"""
+        self._stop.set()
+
+    def next_interval(self, now=None):
+        """Seconds until the next pass"""
+        now = now or datetime.now(timezone.utc)
+        if near_rollover(self.tracking_date, now, self.rollover_window):
+            return self.rollover_interval
+        return self.interval
+
+    def run_once(self):
+        """One refresh pass; returns whether it succeeded"""
+        start = time.time()
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning("Background refresh failed: %s: %s", type(e).__name__, e)
+            with self._lock:
+                self.failures += 1
+                self.consecutive_failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+            return False
+        else:
+            with self._lock:
+                self.consecutive_failures = 0
+                self.last_success = time.time()
+            return True
+        finally:
+            with self._lock:
+                self.passes += 1
+                self.last_duration = time.time() - start
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.next_interval())
+
+    def lag(self, now=None):
+        """Seconds since the last successful pass (or since start, if none
+        has succeeded yet); None if the refresher never started"""
+        now = now or time.time()
+        with self._lock:
+            since = self.last_success or self.started_at
+        return None if since is None else now - since
+
+    def is_behind(self, now=None):
+        """Whether the last successful pass is more than MAX_LAG_INTERVALS ago"""
+        lag = self.lag(now)
+        return lag is not None and lag > MAX_LAG_INTERVALS * self.interval
+
+    def status(self):
+        """Lag, cadence and failure counts, for display"""
+        with self._lock:
+            status = {
+                "running": self.running,
+                "passes": self.passes,
+                "failures": self.failures,
+                "consecutive_failures": self.consecutive_failures,
+                "last_duration": self.last_duration,
+                "last_error": self.last_error,
+            }
+        status["lag"] = self.lag()
+        status["interval"] = self.next_interval() if self.enabled else None
+        return status
@@ -0,0 +1,287 @@
+"""
+Write-behind saves: a durable local journal of day rows, applied to the
+storage backend by a background flusher.
+
+Saving used to write to Google Sheets while the form waited (plus a full tab
+read whenever the row index was stale), and a Sheets error lost the entry.
+WriteBehindStorage wraps the backend instead: upsert_days() commits the rows
+to a local SQLite journal and returns, and a flusher thread writes them to
+the backend shortly after.
+
+  - The journal keeps one pending row per (user, date), so repeated edits of
+    the same day coalesce into a single update
+  - Rows only leave the journal once the backend has accepted them: after a
+    crash or restart they're replayed, and during an outage the flusher
+    retries with backoff
+  - Reads lay pending rows over what the backend returns, so the app sees its
+    own saves before they reach Sheets
+
+The journal belongs to one app process; don't point two at the same file.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from metrics import SAVE_FLUSHES
+from scheduler import backoff_delay
+from sheets import split_tab
+from storage import DATA_ROWS_ATTR, Storage, to_cell_value
+
+# Whether the app queues Sheets saves locally (BDD_WRITE_BEHIND=0 writes straight through)
+WRITE_BEHIND = os.environ.get("BDD_WRITE_BEHIND", "1") != "0"
+
+# Journal database file
+JOURNAL_PATH = os.environ.get(
+    "BDD_SAVE_JOURNAL",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "save_journal.db"),
+)
+
+# Seconds the flusher waits after a save before writing, so a quick run of
+# edits goes out as one update
+FLUSH_DELAY = 1.0
+
+# Backoff between failed flushes, in seconds (full jitter, see scheduler.py)
+RETRY_BASE = 2.0
+RETRY_MAX = 300.0
+
+JOURNAL_SCHEMA = """
+-- One pending row per (user, date); a new save replaces it with a new id
+CREATE TABLE IF NOT EXISTS pending (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    date TEXT NOT NULL,
+    cells TEXT NOT NULL,
+    queued_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS pending_user_date ON pending (user, date);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def overlay_days(tab, days, since=None):
+    """Copy of a tab frame (conn.read() layout, or projected) with day rows
+    (date string -> column -> value) written over it the way upsert_days
+    writes them: over the row with that date, or as a new row at the end.
+    Columns the frame doesn't have are ignored; with `since`, new days before
+    it are left out (as a projected read would)."""
+    if not days or 'date' not in tab.columns:
+        return tab
+
+    frame = tab
+    attrs = dict(tab.attrs)
+    for day, values in days.items():
+        data_dates = split_tab(frame)[1]['date'].astype(str)
+        matches = data_dates.index[data_dates.to_numpy() == day]
+        if len(matches) == 0 and since is not None and pd.Timestamp(day) < pd.Timestamp(since):
+            continue
+
+        label = matches[0] if len(matches) else (frame.index.max() + 1 if len(frame) else 0)
+        cells = {col: values.get(str(col), '') for col in frame.columns}
+        row = pd.DataFrame([{col: (np.nan if val == '' else val) for col, val in cells.items()}],
+                           index=[label], columns=frame.columns)
+        if len(matches):
+            position = frame.index.get_loc(label)
+            frame = pd.concat([frame.iloc[:position], row, frame.iloc[position + 1:]])
+        else:
+            frame = pd.concat([frame, row])
+            if DATA_ROWS_ATTR in attrs:
+                attrs[DATA_ROWS_ATTR] += 1
+    frame.attrs = attrs
+    return frame
+
+
+class SaveJournal:
+    """Pending day rows in a local SQLite file, mirrored in memory for reads.
+
+    Every add() is committed with synchronous=FULL before it returns, so an
+    acknowledged save survives a crash."""
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(JOURNAL_SCHEMA)
+        self._lock = threading.Lock()
+        # (user, date) -> (id, cells, queued_at)
+        self._rows = {}
+        for row_id, user, day, cells, queued_at in self._db.execute(
+            "SELECT id, user, date, cells, queued_at FROM pending ORDER BY id"
+        ):
+            self._rows[(user, day)] = (row_id, json.loads(cells), queued_at)
+
+    def add(self, user, days):
+        """Queue day rows (date string -> column -> value), replacing any
+        pending row for the same date"""
+        now = time.time()
+        with self._lock:
+            with self._db:
+                for day, values in days.items():
+                    cells = {str(col): to_cell_value(val) for col, val in values.items()}
+                    cursor = self._db.execute(
+                        "INSERT OR REPLACE INTO pending (user, date, cells, queued_at) VALUES (?, ?, ?, ?)",
+                        (user, day, json.dumps(cells), now),
+                    )
+                    self._rows[(user, day)] = (cursor.lastrowid, cells, now)
+
+    def pending(self, user=None):
+        """{user: {date: (id, cells)}} of every pending row (or just user's)"""
+        with self._lock:
+            rows = list(self._rows.items())
+        pending = {}
+        for (row_user, day), (row_id, cells, _) in rows:
+            if user is None or row_user == user:
+                pending.setdefault(row_user, {})[day] = (row_id, cells)
+        return pending
+
+    def days(self, user):
+        """{date: cells} of user's pending rows"""
+        return {day: cells for day, (_, cells) in self.pending(user).get(user, {}).items()}
+
+    def remove(self, ids):
+        """Drop rows that have been written, unless a newer save replaced them"""
+        ids = set(ids)
+        with self._lock:
+            with self._db:
+                self._db.executemany("DELETE FROM pending WHERE id = ?", [(row_id,) for row_id in ids])
+            for key in [key for key, (row_id, _, _) in self._rows.items() if row_id in ids]:
+                del self._rows[key]
+
+    def oldest_age(self):
+        """Seconds since the oldest pending row was queued, or None if there is none"""
+        with self._lock:
+            oldest = min((queued_at for _, _, queued_at in self._rows.values()), default=None)
+        return None if oldest is None else time.time() - oldest
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rows)
+
+
+class WriteBehindStorage(Storage):
+    """Wraps a backend so day-row saves go to a SaveJournal and are flushed
+    to the backend in the background. Everything else goes straight through."""
+
+    write_behind = True
+
+    def __init__(self, backend, journal, flush_delay=FLUSH_DELAY):
+        self.backend = backend
+        self.journal = journal
+        self.flush_delay = flush_delay
+        self.remote = backend.remote
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # One flush at a time, whether from the thread or flush() called directly
+        self._flush_lock = threading.Lock()
+
+        # Running totals, for diagnostics
+        self.flushed = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+
+    def __getattr__(self, name):
+        # Backend-specific extras (e.g. SheetsStorage.delta or .invalidate)
+        if name == "backend":
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    def start(self):
+        """Start the flusher (which first replays anything left in the journal); returns self"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="save-flusher", daemon=True)
+            self._thread.start()
+            if len(self.journal):
+                self._wake.set()
+        return self
+
+    def stop(self):
+        """Stop the flusher after its current flush; pending rows stay in the journal"""
+        self._stop.set()
+        self._wake.set()
+
+    def apply_pending(self, name, frame, since=None):
+        return overlay_days(frame, self.journal.days(name), since=since)
+
+    def read_tab(self, name, fresh=False):
+        return self.apply_pending(name, self.backend.read_tab(name, fresh=fresh))
+
+    def read_tabs(self, names):
+        return {name: self.apply_pending(name, frame) for name, frame in self.backend.read_tabs(names).items()}
+
+    def read_projected(self, names, columns_for, since):
+        frames = self.backend.read_projected(names, columns_for, since)
+        return {name: self.apply_pending(name, frame, since=since) for name, frame in frames.items()}
+
+    def read_config_rows(self, names):
+        # Pending saves are day rows, which these frames don't have
+        return self.backend.read_config_rows(names)
+
+    def upsert_days(self, user, days):
+        self.journal.add(user, days)
+        self._wake.set()
+
+    def write_config(self, user, columns, config_rows, insert=False, rows=None):
+        self.backend.write_config(user, columns, config_rows, insert=insert, rows=rows)
+
+    def write_users(self, users):
+        self.backend.write_users(users)
+
+    def flush(self):
+        """Write every pending row to the backend, one upsert_days call per
+        user; returns whether all of them were written"""
+        with self._flush_lock:
+            ok = True
+            for user, days in self.journal.pending().items():
+                try:
+                    self.backend.upsert_days(user, {day: cells for day, (_, cells) in days.items()})
+                except Exception as e:
+                    logger.warning("Flushing %d saved day(s) for %s failed: %s: %s",
+                                   len(days), user, type(e).__name__, e)
+                    self.failures += 1
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    SAVE_FLUSHES.inc(len(days), outcome="failure")
+                    ok = False
+                    continue
+                self.journal.remove(row_id for row_id, _ in days.values())
+                self.flushed += len(days)
+                SAVE_FLUSHES.inc(len(days), outcome="success")
+            self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+            return ok
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Idle until a save arrives, or until the next retry after a failure
+            retry = backoff_delay(self.consecutive_failures, RETRY_BASE, RETRY_MAX) if self.consecutive_failures else None
+            self._wake.wait(retry)
+            self._wake.clear()
+            if self._stop.wait(self.flush_delay):
+                break
+            self.flush()
+
+    def pending_count(self, user=None):
+        """Rows waiting to be written (for one user, or everyone)"""
+        if user is None:
+            return len(self.journal)
+        return len(self.journal.days(user))
+
+    def status(self):
+        """Pending rows and flush failures, for display"""
+        return {
+            "pending": len(self.journal),
+            "oldest_pending_age": self.journal.oldest_age(),
+            "flushed": self.flushed,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+        }
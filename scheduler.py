@@ -0,0 +1,236 @@
+"""
+Central scheduler for Google Sheets API traffic.
+
+Every HTTP request made by the shared gspread client (conn.read() and the
+batched loaders, save_user_data's writes, handle lookups) goes through one
+RequestScheduler, which:
+  - paces requests with token buckets sized to the per-minute Sheets quotas
+    (reads and writes are metered separately, as they are by the API),
+  - retries 429 and 5xx responses with jittered exponential backoff,
+  - lets identical GETs that are already in flight share one response.
+
+Every request sent is recorded as a 'sheets' span (see instrumentation.py)
+and in the process-wide latency and error metrics (see metrics.py).
+"""
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+import requests
+from gspread.exceptions import APIError
+
+from instrumentation import span
+from metrics import SHEETS_REQUEST_ERRORS, SHEETS_REQUEST_SECONDS, SHEETS_THROTTLED_SECONDS
+
+# Sheets API quota per minute per user (the service account), for each of reads and writes
+READ_QUOTA_PER_MINUTE = 60
+WRITE_QUOTA_PER_MINUTE = 60
+
+# Requests that may go out back to back before pacing kicks in. Buckets refill
+# at (quota - burst) per minute so no 60-second window can exceed the quota;
+# with a quota below 2 * BURST the burst is cut to half the quota, so there's
+# always something left to refill with.
+BURST = 10
+
+# Responses worth retrying: quota exhausted, and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # seconds
+BACKOFF_MAX = 32.0  # seconds
+
+# Methods that are safe to resend after a 5xx or dropped connection. Anything
+# else (e.g. POST :batchUpdate row inserts) is only retried on 429, which means
+# the request was rejected before it was applied.
+IDEMPOTENT_METHODS = {"get", "put"}
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def request_label(method, endpoint):
+    """Short name for a Sheets API request, without spreadsheet ids or
+    ranges: 'GET values:batchGet', 'PUT values', 'POST :batchUpdate', ..."""
+    method = method.upper()
+    if "/spreadsheets/" not in endpoint:
+        # e.g. Drive API calls: just the API's name
+        return f"{method} {urlparse(endpoint).path.strip('/').split('/')[0]}"
+    spreadsheet, _, rest = endpoint.split("/spreadsheets/", 1)[1].partition("/")
+    if not rest:
+        operation = spreadsheet.partition(":")[2]
+        return f"{method} :{operation}" if operation else f"{method} metadata"
+    if rest.startswith("values/"):
+        # One range (quoted, so any ':' left is an operation like ':append')
+        operation = rest.rpartition(":")[2] if ":" in rest else ""
+        return f"{method} values:{operation}" if operation else f"{method} values"
+    return f"{method} {rest}"
+
+
+def retry_after_seconds(response):
+    """Seconds from a Retry-After header, or 0 if there isn't a usable one"""
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", 0)))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a request may be sent"""
+
+    def __init__(self, per_minute, capacity):
+        if per_minute <= 0 or capacity < 1:
+            raise ValueError(f"A token bucket needs a positive refill rate and room for a token "
+                             f"(got {per_minute}/minute, capacity {capacity})")
+        self.rate = per_minute / 60.0
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Take one token, sleeping until one is available. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                # Refills land a rounding error short of a whole token
+                if self._tokens >= 1 - 1e-9:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def drain(self):
+        """Empty the bucket (after a 429) so every thread backs off, not just the one that was rejected"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+
+def quota_bucket(quota, burst):
+    """TokenBucket that lets `burst` requests (at most half the quota) go out
+    back to back and refills the rest of the per-minute quota steadily"""
+    if quota < 2:
+        raise ValueError(f"A Sheets quota of {quota} requests per minute is too low to pace (need at least 2)")
+    burst = max(1, min(burst, quota // 2))
+    return TokenBucket(quota - burst, burst)
+
+
+class RequestScheduler:
+    """Rate limiting, retries and read coalescing for a gspread client.
+
+    install(client) routes client.request() through the scheduler; call it
+    once per client (it's a no-op if the client is already installed)."""
+
+    def __init__(self, read_quota=None, write_quota=None, burst=BURST, max_retries=MAX_RETRIES):
+        # Module settings are looked up at construction so they can be tuned at runtime
+        read_quota = read_quota or READ_QUOTA_PER_MINUTE
+        write_quota = write_quota or WRITE_QUOTA_PER_MINUTE
+        self.read_bucket = quota_bucket(read_quota, burst)
+        self.write_bucket = quota_bucket(write_quota, burst)
+        self.max_retries = max_retries
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+        # Running totals, for diagnostics
+        self.requests_sent = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.throttled_seconds = 0.0
+
+    def install(self, client):
+        """Send every request made by `client` through this scheduler"""
+        if getattr(client, "_request_scheduler", None) is self:
+            return client
+        send = client.request
+
+        def scheduled_request(method, endpoint, params=None, **kwargs):
+            return self.request(send, method, endpoint, params=params, **kwargs)
+
+        client.request = scheduled_request
+        client._request_scheduler = self
+        return client
+
+    def request(self, send, method, endpoint, params=None, **kwargs):
+        """Send one API request via send(method, endpoint, params=..., **kwargs)"""
+        if method.lower() != "get":
+            return self._send(send, method, endpoint, params, kwargs)
+
+        key = (endpoint, json.dumps(params, sort_keys=True, default=str),
+               json.dumps(kwargs, sort_keys=True, default=str))
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # Same read already on its way: share its response (or error)
+            with span(request_label(method, endpoint), kind="sheets", coalesced=True):
+                return future.result()
+
+        try:
+            response = self._send(send, method, endpoint, params, kwargs)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def _send(self, send, method, endpoint, params, kwargs):
+        bucket = self.read_bucket if method.lower() == "get" else self.write_bucket
+        idempotent = method.lower() in IDEMPOTENT_METHODS
+
+        attempt = 0
+        while True:
+            waited = bucket.acquire()
+            with self._lock:
+                self.requests_sent += 1
+                self.throttled_seconds += waited
+            label = request_label(method, endpoint)
+            if waited:
+                SHEETS_THROTTLED_SECONDS.inc(waited)
+
+            started = time.perf_counter()
+            try:
+                with span(label, kind="sheets", attempt=attempt, throttled_ms=round(waited * 1000, 3)) as request_span:
+                    response = send(method, endpoint, params=params, **kwargs)
+                    request_span.bytes = len(response.content)
+                return response
+            except APIError as e:
+                status = e.response.status_code
+                SHEETS_REQUEST_ERRORS.inc(request=label, status=status)
+                retryable = status == 429 or (idempotent and status in RETRY_STATUSES)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                if status == 429:
+                    bucket.drain()
+                delay = max(backoff_delay(attempt), retry_after_seconds(e.response))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                SHEETS_REQUEST_ERRORS.inc(request=label, status=0)
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+            finally:
+                SHEETS_REQUEST_SECONDS.observe(time.perf_counter() - started, request=label)
+
+            with self._lock:
+                self.retries += 1
+            time.sleep(delay)
+            attempt += 1
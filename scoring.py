@@ -0,0 +1,270 @@
+"""
+Goal scoring for the Good Looking Week leaderboard.
+
+All goal columns for a user are evaluated at once with pandas/NumPy masks over
+the 7-day window ending on the as-of date (yesterday in the app), instead of
+walking rows one at a time.
+"""
+
+import hashlib
+import json
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from column_config import GOAL_WINDOWS, TRUTHY_STRINGS, goal_rules, to_float_series
+from data_store import VersionedLRU
+
+# Most (user, data version, config version, as-of date) results kept by ScoreCache
+SCORE_CACHE_SIZE = 256
+
+
+def truthy_mask(frame):
+    """2D boolean mask of cells that read as True/1/Yes/Y/T"""
+    if all(pd.api.types.is_bool_dtype(dtype) for dtype in frame.dtypes):
+        # Already decoded at load time (see column_config.decode_user_frame)
+        return frame.fillna(False).astype(bool)
+    values = np.char.upper(frame.to_numpy(dtype=object).astype(str))
+    return pd.DataFrame(np.isin(values, TRUTHY_STRINGS), index=frame.index, columns=frame.columns)
+
+
+def calculate_user_score(user, df, config, as_of):
+    """Calculate user score (0-100) from the 7 days ending `as_of`.
+
+    Every goal column gets an equal share of the 100 points:
+      - daily: share of logged days in the window where the goal was met
+      - weekly_total: full points if the window's total meets the target
+      - count_per_week: full points if the number of non-zero days meets the target
+    """
+    if config is None:
+        return 0
+
+    # Compiled goal rules for every goal column
+    rules = goal_rules(config)
+
+    if not rules:
+        return 0
+
+    # No data - all goals will be treated as not met (0)
+    if df.empty or 'date' not in df.columns:
+        return 0
+
+    # Filter once to the 7-day period ending as_of (inclusive), then sort
+    # just the window by calendar date
+    dates = pd.to_datetime(df['date'])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    week_start = as_of - timedelta(days=6)
+    in_week = (dates >= pd.Timestamp(week_start)) & (dates < pd.Timestamp(as_of + timedelta(days=1)))
+    week_df = df[in_week].assign(date=dates[in_week].dt.date).sort_values('date')
+
+    present = [rule.column for rule in rules if rule.column in week_df.columns]
+    bool_cols = [rule.column for rule in rules if rule.column in present and rule.col_type == 'boolean']
+    num_cols = [col_name for col_name in present if col_name not in bool_cols]
+
+    # Evaluate every goal column of the window at once
+    has_data = week_df[present].notna()
+    truthy = truthy_mask(week_df[bool_cols]) if bool_cols else None
+    numeric = None
+    if num_cols and not week_df.empty:
+        numeric = week_df[num_cols].apply(pd.to_numeric, errors='coerce')
+
+    goal_scores = []
+    points_per_goal = 100.0 / len(rules)  # Distribute points evenly
+
+    for rule in rules:
+        if rule.window not in GOAL_WINDOWS:
+            continue
+
+        col_name = rule.column
+        missing = week_df.empty or col_name not in present
+
+        if rule.window == 'daily':
+            # Score = (M/N) * points_per_goal where M = days met, N = days with data
+            if missing:
+                goal_scores.append(0)
+                continue
+
+            logged = has_data[col_name]
+            num_dates_with_data = int(logged.sum())
+            if num_dates_with_data == 0 or rule.target is None:
+                goal_scores.append(0)
+                continue
+
+            if rule.col_type == 'boolean':
+                values = truthy[col_name][logged].astype(int)
+            else:
+                values = to_float_series(week_df[col_name][logged])
+
+            num_days_with_goal_met = int(rule.is_met(values).sum())
+            goal_scores.append((num_days_with_goal_met / num_dates_with_data) * points_per_goal)
+
+        elif rule.window == 'weekly_total':
+            # Sum of values over the window (no data counts as 0)
+            if missing:
+                week_sum = 0
+            elif rule.col_type == 'boolean':
+                week_sum = float(truthy[col_name].sum())
+            else:
+                col_data = numeric[col_name]
+                week_sum = float(col_data.sum()) if col_data.notna().any() else 0
+
+            if rule.target is None:
+                goal_scores.append(0)
+                continue
+
+            # Weekly portion counts even if there are fewer than 7 data points
+            goal_scores.append(points_per_goal if rule.is_met(week_sum) else 0)
+
+        elif rule.window == 'count_per_week':
+            # Number of non-zero (or checked) days in the window
+            if missing:
+                non_zero_count = 0
+            elif rule.col_type == 'boolean':
+                non_zero_count = int(truthy[col_name].sum())
+            else:
+                col_data = numeric[col_name]
+                non_zero_count = int((col_data.notna() & (col_data != 0)).sum())
+
+            if rule.target is None:
+                goal_scores.append(0)
+                continue
+
+            goal_scores.append(points_per_goal if rule.is_met(non_zero_count) else 0)
+
+    return sum(goal_scores)
+
+
+def rolling_window_sum(per_day, window=7):
+    """Trailing `window`-day sums over a dense per-day array.
+
+    Values are added oldest day first, the same order calculate_user_score
+    sums a date-sorted week in, so float totals come out identical."""
+    totals = np.zeros(len(per_day), dtype=per_day.dtype)
+    for offset in range(window - 1, -1, -1):
+        shifted = np.zeros(len(per_day), dtype=per_day.dtype)
+        shifted[offset:] = per_day[:len(per_day) - offset]
+        totals = totals + shifted
+    return totals
+
+
+def score_timeline(df, config, end, start=None):
+    """Score for every as-of date from `start` (default: first logged date) to `end`.
+
+    Equivalent to calling calculate_user_score(user, df, config, as_of=d) for
+    each date d, but computed in a single pass: rows are aggregated per
+    calendar day over a dense daily index and every 7-day window comes from
+    rolling sums. Returns a float Series indexed by a daily DatetimeIndex."""
+    end = pd.Timestamp(end)
+
+    if df.empty or 'date' not in df.columns:
+        return pd.Series(dtype=float)
+
+    dates = pd.to_datetime(df['date'])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    days = dates.dt.normalize()
+
+    if start is None:
+        start = days.min()
+    start = pd.Timestamp(start)
+    if pd.isna(start) or start > end:
+        return pd.Series(dtype=float)
+
+    timeline = pd.date_range(start, end, freq='D')
+    if config is None:
+        return pd.Series(0.0, index=timeline)
+
+    rules = goal_rules(config)
+    if not rules:
+        return pd.Series(0.0, index=timeline)
+
+    # Dense daily index including the 6 days of lookback before `start`
+    dense_days = pd.date_range(start - timedelta(days=6), end, freq='D')
+    in_range = days.notna() & (days >= dense_days[0]) & (days <= end)
+    df = df[in_range]
+    days = days[in_range]
+
+    def per_day(values):
+        return values.groupby(days).sum().reindex(dense_days, fill_value=0).to_numpy()
+
+    bool_cols = [rule.column for rule in rules if rule.column in df.columns and rule.col_type == 'boolean']
+    truthy = truthy_mask(df[bool_cols]) if bool_cols else None
+
+    points_per_goal = 100.0 / len(rules)  # Distribute points evenly
+    scores = np.zeros(len(dense_days))
+
+    for rule in rules:
+        if rule.window not in GOAL_WINDOWS or rule.target is None:
+            continue
+
+        col_name = rule.column
+        missing = col_name not in df.columns
+
+        if rule.window == 'daily':
+            if missing:
+                continue
+            logged = df[col_name].notna()
+            if rule.col_type == 'boolean':
+                values = truthy[col_name].astype(int)
+            else:
+                values = to_float_series(df[col_name])
+            met = logged & rule.is_met(values)
+
+            logged_days = rolling_window_sum(per_day(logged.astype(int)))
+            met_days = rolling_window_sum(per_day(met.astype(int)))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                daily_scores = (met_days / logged_days) * points_per_goal
+            scores = scores + np.where(logged_days > 0, daily_scores, 0)
+
+        elif rule.window == 'weekly_total':
+            if missing:
+                week_sums = np.zeros(len(dense_days))
+            elif rule.col_type == 'boolean':
+                week_sums = rolling_window_sum(per_day(truthy[col_name].astype(int))).astype(float)
+            else:
+                numeric = pd.to_numeric(df[col_name], errors='coerce').fillna(0).astype(float)
+                week_sums = rolling_window_sum(per_day(numeric).astype(float))
+            scores = scores + np.where(rule.is_met(week_sums), points_per_goal, 0)
+
+        elif rule.window == 'count_per_week':
+            if missing:
+                counts = np.zeros(len(dense_days), dtype=int)
+            elif rule.col_type == 'boolean':
+                counts = rolling_window_sum(per_day(truthy[col_name].astype(int)))
+            else:
+                numeric = pd.to_numeric(df[col_name], errors='coerce')
+                counts = rolling_window_sum(per_day((numeric.notna() & (numeric != 0)).astype(int)))
+            scores = scores + np.where(rule.is_met(counts), points_per_goal, 0)
+
+    return pd.Series(scores, index=dense_days)[timeline]
+
+
+def data_version(df):
+    """Content hash of a user's data rows, stored in df.attrs so it's only
+    computed once per load (attrs survive copies and st.cache_data)"""
+    version = df.attrs.get('data_version')
+    if version is None:
+        digest = hashlib.sha1(json.dumps([str(c) for c in df.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        version = digest.hexdigest()
+        df.attrs['data_version'] = version
+    return version
+
+
+def config_version(config):
+    """Content hash of a user's compiled column config"""
+    return hashlib.sha1(repr(list(config.values())).encode()).hexdigest()
+
+
+class ScoreCache(VersionedLRU):
+    """Process-wide LRU cache of computed scores, keyed by (user, data
+    version, config version, as-of date)"""
+
+    def __init__(self, max_entries=SCORE_CACHE_SIZE):
+        super().__init__(max_entries)
+
+    @staticmethod
+    def key(user, df, config, as_of):
+        return (user, data_version(df), config_version(config), as_of)
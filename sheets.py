@@ -0,0 +1,238 @@
+"""
+Low-level Google Sheets helpers shared by the app and the maintenance scripts.
+
+These talk to a gspread client directly - in the app, the one
+st-gsheets-connection already holds (conn._instance._client) - so that several
+worksheets can be fetched or written without one conn.read() round-trip per tab.
+"""
+
+import re
+import threading
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+from requests.adapters import HTTPAdapter
+from gspread.urls import SPREADSHEET_VALUES_BATCH_URL
+from gspread.utils import absolute_range_name, extract_id_from_url, fill_gaps, rowcol_to_a1
+
+# Same render options st-gsheets-connection uses for conn.read(), so a batched
+# read parses to exactly the same DataFrame as a per-tab read
+READ_PARAMS = {
+    "valueRenderOption": "UNFORMATTED_VALUE",
+    "dateTimeRenderOption": "FORMATTED_STRING",
+}
+
+# Same options in gspread's keyword form, for Worksheet.get()
+PROBE_PARAMS = {
+    "value_render_option": "UNFORMATTED_VALUE",
+    "date_time_render_option": "FORMATTED_STRING",
+}
+
+UNNAMED_COLUMN_PATTERN = re.compile(r'^Unnamed:\s\d+(?:_level_\d+)?$')
+
+# Keep-alive connections to the Sheets API shared by all sessions/threads
+HTTP_POOL_SIZE = 10
+
+
+def get_client_and_url(conn):
+    """Return the gspread client and spreadsheet URL behind a GSheetsConnection"""
+    return conn._instance._client, conn._instance._spreadsheet
+
+
+def values_to_dataframe(values):
+    """Parse raw sheet values the same way conn.read() does
+    (row 1 as header, fully empty rows and empty unnamed columns dropped)"""
+    values = fill_gaps(values)
+    if not values:
+        return pd.DataFrame()
+
+    df = TextParser(values).read()
+    df = df.dropna(how='all', axis=0)
+
+    empty_unnamed = [
+        col for col in df.columns
+        if UNNAMED_COLUMN_PATTERN.search(str(col)) and df[col].isna().all()
+    ]
+    if empty_unnamed:
+        df = df.drop(labels=empty_unnamed, axis=1)
+
+    return df
+
+
+def column_letter(col):
+    """1-indexed column number -> A1 column letters (1 -> A, 27 -> AA)"""
+    return rowcol_to_a1(1, col)[:-1]
+
+
+def batch_get_values(client, spreadsheet_url, ranges):
+    """Raw values of several A1 ranges in a single values:batchGet request.
+
+    Returns one list of rows per range, in the same order as `ranges`."""
+    ranges = list(ranges)
+    if not ranges:
+        return []
+
+    spreadsheet_id = extract_id_from_url(spreadsheet_url)
+
+    params = dict(READ_PARAMS)
+    params["ranges"] = ranges
+    response = client.request("get", SPREADSHEET_VALUES_BATCH_URL % spreadsheet_id, params=params).json()
+
+    # valueRanges come back in the same order as the requested ranges
+    value_ranges = response.get("valueRanges", [])
+    return [value_range.get("values", []) for value_range in value_ranges]
+
+
+def batch_read_worksheets(client, spreadsheet_url, worksheets):
+    """Read several worksheets in a single values:batchGet request.
+
+    Returns a dict of worksheet name -> DataFrame, parsed like conn.read()."""
+    worksheets = list(worksheets)
+    values = batch_get_values(client, spreadsheet_url, [absolute_range_name(name) for name in worksheets])
+    return {name: values_to_dataframe(tab_values) for name, tab_values in zip(worksheets, values)}
+
+
+# Row 1 is the header, rows 2-10 are config rows; data rows start after them
+CONFIG_ROWS_COUNT = 10
+
+
+# A tab frame (values_to_dataframe, conn.read()) is indexed by sheet row - 2
+# (row 1 is the header), and blank rows are dropped without renumbering the
+# rest, so config and data rows are told apart by index, never by position
+
+def split_tab(tab):
+    """(rows 2-11, rows 12 on) of a tab frame"""
+    head = tab.index < CONFIG_ROWS_COUNT
+    return tab[head], tab[~head]
+
+
+def config_rows(tab):
+    """Config rows 2-10 of a tab frame, in order, with any blank ones as empty rows"""
+    return tab.reindex(range(CONFIG_ROWS_COUNT - 1))
+
+
+class SheetRowIndex:
+    """Maps tracking dates to sheet row numbers (1-indexed) for one user tab,
+    so a save can go straight to the right row without re-reading the sheet"""
+
+    def __init__(self, columns, date_rows, last_data_row, last_date=''):
+        self.columns = list(columns)
+        self.date_rows = dict(date_rows)
+        self.last_data_row = last_data_row
+        # Date cell of last_data_row, used by is_current() to detect edits
+        self.last_date = last_date
+
+    @classmethod
+    def from_sheet(cls, full_df):
+        """Build the index from a full tab read (as returned by conn.read)"""
+        date_rows = {}
+        last_data_row = None
+        last_date = ''
+
+        _, data_df = split_tab(full_df)
+        if len(data_df):
+            # Sheet row number = DataFrame index + 2 (header row + 1-indexing)
+            if 'date' in data_df.columns:
+                for idx, val in data_df['date'].items():
+                    if pd.notna(val):
+                        date_rows.setdefault(str(val), int(idx) + 2)
+
+            # Last row that has at least one non-empty value
+            has_data = (data_df.notna() & (data_df.astype(str).apply(lambda col: col.str.strip()) != '')).any(axis=1)
+            if has_data.any():
+                last_idx = has_data[has_data].index[-1]
+                last_data_row = int(last_idx) + 2
+                if 'date' in data_df.columns and pd.notna(data_df.at[last_idx, 'date']):
+                    last_date = str(data_df.at[last_idx, 'date'])
+
+        return cls(full_df.columns, date_rows, last_data_row, last_date)
+
+    def row_for_date(self, date_str):
+        """Sheet row holding date_str, or None if it hasn't been logged"""
+        return self.date_rows.get(date_str)
+
+    def next_insert_row(self):
+        """Sheet row a new entry should be inserted at"""
+        if self.last_data_row is None:
+            return CONFIG_ROWS_COUNT + 1
+        return self.last_data_row + 1
+
+    def record_insert(self, date_str, row):
+        """Update the index after a row was inserted at `row`"""
+        # insert_row pushes everything at or below `row` down by one
+        for key, existing_row in self.date_rows.items():
+            if existing_row >= row:
+                self.date_rows[key] = existing_row + 1
+        if self.last_data_row is not None and self.last_data_row >= row:
+            self.last_data_row += 1
+
+        self.date_rows.setdefault(date_str, row)
+        if self.last_data_row is None or row > self.last_data_row:
+            self.last_data_row = row
+            self.last_date = date_str
+
+    def is_current(self, worksheet):
+        """Cheaply check the tab hasn't changed shape since the index was built.
+
+        Reads just the date cells of the last known data row and the row after
+        it: the last row must still hold the same date and nothing may have
+        been appended below it."""
+        if self.last_data_row is None or 'date' not in self.columns:
+            return False
+
+        col_letter = column_letter(self.columns.index('date') + 1)
+        probe_range = f'{col_letter}{self.last_data_row}:{col_letter}{self.last_data_row + 1}'
+
+        values = worksheet.get(probe_range, **PROBE_PARAMS)
+        cells = [str(row[0]) if row else '' for row in values]
+        cells += [''] * (2 - len(cells))
+        return cells == [self.last_date, '']
+
+
+class SheetHandleCache:
+    """Process-wide cache of gspread Spreadsheet and Worksheet handles.
+
+    Opening a spreadsheet and looking up a worksheet each cost a metadata
+    round-trip, so handles are kept keyed by spreadsheet URL and worksheet
+    name. Call invalidate() when a tab is renamed or deleted (or a write with
+    a cached handle fails) so the next lookup fetches fresh metadata."""
+
+    def __init__(self, client, pool_size=HTTP_POOL_SIZE):
+        self.client = client
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._lock = threading.Lock()
+
+        # Share one pool of keep-alive connections between all writers
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.client.session.mount("https://", adapter)
+
+    def spreadsheet(self, spreadsheet_url):
+        with self._lock:
+            spreadsheet = self._spreadsheets.get(spreadsheet_url)
+            if spreadsheet is None:
+                spreadsheet = self.client.open_by_url(spreadsheet_url)
+                self._spreadsheets[spreadsheet_url] = spreadsheet
+            return spreadsheet
+
+    def worksheet(self, spreadsheet_url, worksheet_name):
+        key = (spreadsheet_url, worksheet_name)
+        with self._lock:
+            worksheet = self._worksheets.get(key)
+        if worksheet is not None:
+            return worksheet
+
+        worksheet = self.spreadsheet(spreadsheet_url).worksheet(worksheet_name)
+        with self._lock:
+            self._worksheets[key] = worksheet
+        return worksheet
+
+    def invalidate(self, spreadsheet_url, worksheet_name=None):
+        """Drop one cached worksheet handle, or every handle for the spreadsheet"""
+        with self._lock:
+            if worksheet_name is not None:
+                self._worksheets.pop((spreadsheet_url, worksheet_name), None)
+                return
+            self._spreadsheets.pop(spreadsheet_url, None)
+            for key in [k for k in self._worksheets if k[0] == spreadsheet_url]:
+                del self._worksheets[key]
@@ -0,0 +1,243 @@
+"""
+On-disk snapshots of raw worksheet frames, so a cold process (server restart,
+idle container wake-up) can show the last known data straight away instead of
+waiting on Google Sheets.
+
+Each tab is stored as a Parquet file, with a manifest.json recording when it
+was fetched from Sheets. Snapshots are served stale-while-revalidate: the first
+read of a tab in a process gets the snapshot, tagged with its age, and a
+background thread re-reads the tab from Sheets and rewrites the snapshot.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+# Where snapshots live (override with BDD_SNAPSHOT_DIR, e.g. a mounted volume)
+SNAPSHOT_DIR = os.environ.get(
+    "BDD_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshots"),
+)
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Routine (cached) reads rewrite a tab's snapshot at most this often, in seconds
+MIN_WRITE_INTERVAL = 60
+
+# DataFrame.attrs keys set on frames served from a snapshot
+FETCHED_AT_ATTR = "snapshot_fetched_at"
+STALE_ATTR = "snapshot_stale"
+
+logger = logging.getLogger(__name__)
+
+
+def describe_age(seconds):
+    """Human-readable age of a snapshot, e.g. '5 min' or '2 days'"""
+    if seconds < 60:
+        return "less than a minute"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} h"
+    days = int(seconds // 86400)
+    return f"{days} day" if days == 1 else f"{days} days"
+
+
+def snapshot_age(df, now=None):
+    """Seconds since a snapshot-served frame was fetched, or None for live data"""
+    fetched_at = df.attrs.get(FETCHED_AT_ATTR)
+    if fetched_at is None or not df.attrs.get(STALE_ATTR):
+        return None
+    return (now or time.time()) - fetched_at
+
+
+def to_parquet_frame(df):
+    """Copy of a raw tab frame that Parquet can store.
+
+    Column names become positional (the real names go in the manifest), and
+    object columns holding a mix of types (config text above numeric data)
+    are stored as text with blanks kept as nulls - the loaders parse cells
+    from text anyway."""
+    frame = df.copy()
+    frame.columns = [f"c{i}" for i in range(len(frame.columns))]
+    for col in frame.columns:
+        if frame[col].dtype == object and frame[col].dropna().map(type).nunique() > 1:
+            frame[col] = frame[col].map(lambda val: val if pd.isna(val) else str(val))
+    return frame
+
+
+class Snapshot:
+    """A tab's last known frame and when it was fetched from Sheets"""
+
+    def __init__(self, name, frame, fetched_at):
+        self.name = name
+        self.frame = frame
+        self.fetched_at = fetched_at
+
+    @property
+    def age(self):
+        """Seconds since the snapshot was fetched from Sheets"""
+        return time.time() - self.fetched_at
+
+
+class SnapshotStore:
+    """Parquet snapshots of worksheet frames plus a JSON manifest.
+
+    Tracks, per process, which tabs have been revalidated against Sheets:
+      - unseen: serve the snapshot (marked stale) and refresh it in the background
+      - refreshing: keep serving the stale snapshot
+      - refreshed: serve the freshly written snapshot once, then go live
+      - live: callers read from Sheets as usual and save() the result
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR, min_write_interval=MIN_WRITE_INTERVAL):
+        self.directory = directory
+        self.min_write_interval = min_write_interval
+        self._lock = threading.Lock()
+        self._manifest = self._load_manifest()
+        self._refreshing = set()
+        self._refreshed = set()
+        self._live = set()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest.get("tabs", {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _write_manifest(self):
+        # Caller holds self._lock
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "tabs": self._manifest}, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def file_name(name):
+        """Filesystem-safe, collision-free Parquet file name for a tab"""
+        safe = re.sub(r"[^A-Za-z0-9_-]", "_", name)[:40]
+        return f"{safe}-{hashlib.sha1(name.encode()).hexdigest()[:8]}.parquet"
+
+    def read(self, name):
+        """The tab's Snapshot, or None if there isn't a readable one"""
+        with self._lock:
+            entry = self._manifest.get(name)
+        if entry is None:
+            return None
+        try:
+            frame = pd.read_parquet(os.path.join(self.directory, entry["file"]))
+        except Exception as e:
+            logger.warning("Could not read snapshot of %s: %s", name, e)
+            return None
+        frame.columns = entry["columns"]
+        frame.attrs[FETCHED_AT_ATTR] = entry["fetched_at"]
+        return Snapshot(name, frame, entry["fetched_at"])
+
+    def write(self, name, df, fetched_at=None):
+        """Snapshot a frame just fetched from Sheets (best effort)"""
+        fetched_at = fetched_at or time.time()
+        file_name = self.file_name(name)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = os.path.join(self.directory, file_name + ".tmp")
+            to_parquet_frame(df).to_parquet(tmp_path)
+            os.replace(tmp_path, os.path.join(self.directory, file_name))
+            with self._lock:
+                self._manifest[name] = {
+                    "file": file_name,
+                    "fetched_at": fetched_at,
+                    "rows": len(df),
+                    "columns": list(df.columns),
+                }
+                self._write_manifest()
+        except Exception as e:
+            logger.warning("Could not write snapshot of %s: %s", name, e)
+
+    def save(self, frames, force=False):
+        """Record live reads: marks the tabs live and rewrites their snapshots
+        (at most every min_write_interval seconds unless force=True)"""
+        now = time.time()
+        for name, df in frames.items():
+            with self._lock:
+                self._live.add(name)
+                entry = self._manifest.get(name)
+            if force or entry is None or now - entry["fetched_at"] >= self.min_write_interval:
+                self.write(name, df, fetched_at=now)
+
+    def refreshing(self, names):
+        """Whether a background refresh of any of these tabs is still running"""
+        with self._lock:
+            return any(name in self._refreshing for name in names)
+
+    def serve(self, names, fetch):
+        """Stale-while-revalidate read of several tabs.
+
+        Returns a dict of name -> snapshot frame while any of the tabs hasn't
+        been revalidated in this process yet, starting a background refresh
+        (fetch(names) -> dict of frames) for those that need one. Returns None
+        when the caller should read from Sheets itself (everything live, or a
+        snapshot is missing)."""
+        names = list(names)
+        with self._lock:
+            if all(name in self._live for name in names):
+                return None
+            to_refresh = [
+                name for name in names
+                if name not in self._live and name not in self._refreshing and name not in self._refreshed
+            ]
+
+        snapshots = {}
+        for name in names:
+            snapshot = self.read(name)
+            if snapshot is None:
+                return None
+            snapshots[name] = snapshot
+
+        with self._lock:
+            stale = any(name in self._refreshing for name in names) or bool(to_refresh)
+            if not stale:
+                # Everything has been refreshed: serve the new snapshots once, then go live
+                for name in names:
+                    self._refreshed.discard(name)
+                    self._live.add(name)
+            self._refreshing.update(to_refresh)
+
+        if to_refresh:
+            threading.Thread(
+                target=self._refresh, args=(to_refresh, fetch),
+                name="snapshot-refresh", daemon=True,
+            ).start()
+
+        frames = {}
+        for name, snapshot in snapshots.items():
+            snapshot.frame.attrs[STALE_ATTR] = stale
+            frames[name] = snapshot.frame
+        return frames
+
+    def _refresh(self, names, fetch):
+        try:
+            frames = fetch(names)
+            for name in names:
+                self.write(name, frames[name])
+            with self._lock:
+                self._refreshed.update(names)
+        except Exception as e:
+            logger.warning("Background refresh of %s failed: %s", ", ".join(names), e)
+        finally:
+            with self._lock:
+                self._refreshing.difference_update(names)
@@ -0,0 +1,556 @@
+"""
+Storage backends: the users list, each user's tab (header, config rows and one
+row per logged day) and writes of day rows.
+
+The app and populate_config_rows.py go through a Storage instead of talking to
+Google Sheets directly. Every backend returns tabs in the shape conn.read()
+gives for a Sheets tab (row 1 as header, then config rows 2-10, then the data
+rows), so everything downstream works the same whichever one is in use:
+
+  - SheetsStorage: the shared Google Sheet (the default)
+  - SQLiteStorage: a local database file (BDD_STORAGE=sqlite), for running
+    fully offline with millisecond reads; copy_tabs() moves data between the
+    two, so Sheets can stay as a sync target
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+
+import pandas as pd
+
+from gspread.utils import absolute_range_name
+
+from delta_sync import DeltaSync, cell, row_runs, trim_row
+from sheets import (CONFIG_ROWS_COUNT, SheetHandleCache, SheetRowIndex, batch_get_values, batch_read_worksheets,
+                    column_letter, get_client_and_url, split_tab, values_to_dataframe)
+
+# Which backend the app uses: "sheets" or "sqlite"
+STORAGE_BACKEND = os.environ.get("BDD_STORAGE", "sheets")
+
+# Database file for the SQLite backend
+SQLITE_PATH = os.environ.get(
+    "BDD_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "dilly_dailies.db"),
+)
+
+# Names of config rows 2-10, top to bottom
+CONFIG_ROW_NAMES = ['display_name', 'emoji', 'units', 'type', 'has_goal',
+                    'weekly_or_daily_goal', 'goal_target', 'goal_direction', 'help_text']
+
+# How tab refreshes read Sheets: "incremental" (only new or changed rows, see
+# delta_sync.py) or "full" (the whole tab every time)
+SYNC_MODE = os.environ.get("BDD_SYNC", "incremental")
+
+# How long routine Sheets reads may be served from conn.read()'s cache
+READ_TTL = "60"
+
+USERS_TAB = "users"
+
+# DataFrame.attrs key on projected reads: how many dated data rows the whole tab has
+DATA_ROWS_ATTR = "data_rows"
+
+
+class StorageError(Exception):
+    """A tab is missing or can't be read/written in the expected layout"""
+
+
+def parse_users(df):
+    """Extract the lowercased user names from a 'users' tab DataFrame"""
+    if df.empty or len(df.columns) == 0:
+        return []
+
+    # Get column A (first column), skip row 0 (header), get all non-empty values
+    users = df.iloc[:, 0].dropna().tolist()
+    # Remove header if it exists and convert to lowercase
+    users = [str(u).lower().strip() for u in users if str(u).lower().strip() and str(u).lower().strip() != 'user']
+    return users
+
+
+def to_cell_value(val):
+    """Convert numpy/pandas types to native Python types (blank for missing)
+    so a row can be JSON-serialized for the Sheets API or the SQLite backend"""
+    if val is None:
+        return ''
+    try:
+        if pd.isna(val):
+            return ''
+    except (TypeError, ValueError):
+        pass
+
+    # Get the type name to check for numpy types
+    type_name = type(val).__name__
+    type_module = type(val).__module__
+
+    # Handle numpy types
+    if 'numpy' in type_module:
+        if 'int' in type_name:
+            return int(val)
+        elif 'float' in type_name:
+            return float(val)
+        elif 'bool' in type_name:
+            return bool(val)
+
+    # Handle pandas types
+    if 'pandas' in type_module:
+        if 'Timestamp' in type_name:
+            return str(val)
+        elif 'int' in type_name:
+            return int(val)
+        elif 'float' in type_name:
+            return float(val)
+        elif 'bool' in type_name:
+            return bool(val)
+
+    # Handle datetime types
+    if isinstance(val, (datetime, date)):
+        return str(val)
+
+    # Handle native Python types - return as-is
+    if isinstance(val, (int, float, bool, str)):
+        return val
+
+    # Convert everything else to string
+    return str(val)
+
+
+def project_frame(tab, columns_for, since):
+    """Cut a full tab (conn.read() layout) down the way read_projected() does:
+    the config rows plus data rows dated `since` or later, with only the
+    columns columns_for(config_df) picks"""
+    head, data = split_tab(tab)
+    if 'date' not in tab.columns:
+        raise StorageError("Tab has no 'date' column")
+
+    columns = [col for col in tab.columns if col in set(columns_for(head))]
+    dates = pd.to_datetime(data['date'], errors='coerce')
+    projected = pd.concat([head, data[dates >= pd.Timestamp(since)]])[columns]
+    projected.attrs.update(tab.attrs)
+    projected.attrs[DATA_ROWS_ATTR] = int(data['date'].notna().sum())
+    return projected
+
+
+def frame_rows(df):
+    """DataFrame rows as lists of cell values, blanks as ''"""
+    return [[to_cell_value(val) for val in row] for row in df.itertuples(index=False)]
+
+
+class Storage:
+    """Interface shared by the storage backends"""
+
+    # Whether reads go over the network (worth snapshotting to disk)
+    remote = False
+
+    # Whether day-row writes are queued and applied later (see save_queue.py)
+    write_behind = False
+
+    def read_users(self, fresh=False):
+        """Lowercased user names from the 'users' tab"""
+        return parse_users(self.read_tab(USERS_TAB, fresh=fresh))
+
+    def read_tab(self, name, fresh=False):
+        """One tab as a DataFrame in conn.read() layout.
+        fresh=True skips any read cache (e.g. right after a write)."""
+        raise NotImplementedError
+
+    def read_tabs(self, names):
+        """Several tabs at once: dict of name -> DataFrame"""
+        return {name: self.read_tab(name) for name in names}
+
+    def read_projected(self, names, columns_for, since):
+        """Tabs cut down to a few columns of their recent rows: the header and
+        config rows, plus the data rows dated `since` or later, with only the
+        columns columns_for(config_df) picks (config_df is the header-named
+        frame of config rows). Each frame's attrs[DATA_ROWS_ATTR] is the
+        number of dated data rows in the whole tab.
+
+        This default reads whole tabs and cuts them down in memory."""
+        return {name: project_frame(tab, columns_for, since) for name, tab in self.read_tabs(names).items()}
+
+    def read_config_rows(self, names):
+        """Just the header and config rows (rows 1-10) of several tabs, as
+        frames in conn.read() layout without the data rows.
+
+        This default reads whole tabs and cuts them down in memory."""
+        return {name: tab.iloc[:CONFIG_ROWS_COUNT - 1] for name, tab in self.read_tabs(names).items()}
+
+    def apply_pending(self, name, frame, since=None):
+        """A tab frame read earlier, with any day rows written since that
+        haven't reached the backend yet laid over it (only write-behind
+        storage has any)"""
+        return frame
+
+    def upsert_day(self, user, day, values):
+        """Write one day's row (values: column -> value), replacing that day's
+        row if it has one already"""
+        self.upsert_days(user, {day: values})
+
+    def upsert_days(self, user, days):
+        """Write several day rows at once (days: date string -> values)"""
+        raise NotImplementedError
+
+    def write_config(self, user, columns, config_rows, insert=False, rows=None):
+        """Write a tab's config rows 2-10 (one list per row, in `columns` order).
+        insert=True means the tab has no config rows yet, so existing data rows
+        have to move below them. rows: positions in config_rows of the rows
+        that changed, if only those need writing (None writes them all)."""
+        raise NotImplementedError
+
+    def write_users(self, users):
+        """Replace the 'users' tab"""
+        raise NotImplementedError
+
+
+class SheetsStorage(Storage):
+    """The shared Google Sheet.
+
+    Day-row writes go through a date -> row index per tab (SheetRowIndex) and
+    cached worksheet handles, so saving doesn't re-read the tab unless it
+    changed shape since the last write."""
+
+    remote = True
+
+    def __init__(self, client, spreadsheet_url, conn=None, sync_mode=SYNC_MODE):
+        self.client = client
+        self.spreadsheet_url = spreadsheet_url
+        # With a GSheetsConnection, cached single-tab reads use conn.read()
+        self.conn = conn
+        self.delta = DeltaSync(client, spreadsheet_url) if sync_mode == "incremental" else None
+        self.handles = SheetHandleCache(client)
+        self._row_indexes = {}
+        # Column letter of each tab's date column, as of the last projected read
+        self._date_columns = {}
+        # One lock per tab: writes to a tab (and its row index) are
+        # serialized, writes to different tabs can run at the same time
+        self._write_locks = {}
+        self._write_locks_lock = threading.Lock()
+
+    @classmethod
+    def from_connection(cls, conn):
+        client, spreadsheet_url = get_client_and_url(conn)
+        return cls(client, spreadsheet_url, conn=conn)
+
+    def read_tab(self, name, fresh=False):
+        if self.conn is not None and not (fresh and self.delta is not None):
+            return self.conn.read(worksheet=name, ttl="0" if fresh else READ_TTL)
+        return self.read_tabs([name])[name]
+
+    def read_tabs(self, names):
+        if self.delta is not None:
+            # Only rows that are new or changed since the last read
+            return self.delta.read_tabs(names)
+        # All tabs in one values:batchGet request
+        return batch_read_worksheets(self.client, self.spreadsheet_url, names)
+
+    def read_projected(self, names, columns_for, since):
+        """Only the cells asked for, in two or three values:batchGet requests
+        covering every tab: the header/config rows and date columns, then
+        the picked columns over the span of rows dated `since` or later"""
+        names = list(names)
+        # Row 11 is read with the config rows, as it's in a full read's head
+        # (see split_tab)
+        head_range = f"1:{CONFIG_ROWS_COUNT + 1}"
+        first_data_row = CONFIG_ROWS_COUNT + 2
+
+        def date_range(name, letter):
+            return absolute_range_name(name, f"{letter}{first_data_row}:{letter}")
+
+        # Date columns are looked up where they were last time, and fetched
+        # again below for any tab where that turns out to be wrong
+        guesses = {name: self._date_columns.get(name) for name in names}
+        ranges = []
+        for name in names:
+            ranges.append(absolute_range_name(name, head_range))
+            if guesses[name]:
+                ranges.append(date_range(name, guesses[name]))
+        results = iter(batch_get_values(self.client, self.spreadsheet_url, ranges))
+
+        heads, date_cells = {}, {}
+        for name in names:
+            heads[name] = [trim_row(row) for row in next(results)]
+            if guesses[name]:
+                date_cells[name] = next(results)
+
+        misplaced = []
+        for name in names:
+            header = [str(col) for col in heads[name][0]] if heads[name] else []
+            if 'date' not in header:
+                raise StorageError(f"Tab {name!r} has no 'date' column")
+            letter = column_letter(header.index('date') + 1)
+            if letter != guesses[name]:
+                misplaced.append(name)
+            self._date_columns[name] = letter
+        if misplaced:
+            ranges = [date_range(name, self._date_columns[name]) for name in misplaced]
+            date_cells.update(zip(misplaced, batch_get_values(self.client, self.spreadsheet_url, ranges)))
+
+        # Which columns and rows each tab needs
+        plans = {}
+        ranges = []
+        for name in names:
+            header = heads[name][0]
+            wanted = set(columns_for(values_to_dataframe(heads[name])))
+            col_indexes = [i for i, col in enumerate(header) if str(col) in wanted]
+            column_runs = row_runs(col_indexes)
+
+            date_values = [cell(row, 0) for row in date_cells[name]]
+            dates = pd.to_datetime(pd.Series(date_values, dtype=object), errors='coerce')
+            recent = [first_data_row + i for i in (dates >= pd.Timestamp(since)).to_numpy().nonzero()[0]]
+            data_rows = sum(value != '' for value in date_values)
+            row_span = (recent[0], recent[-1]) if recent else None
+
+            plans[name] = (col_indexes, column_runs, row_span, data_rows)
+            if row_span is not None:
+                for first_col, last_col in column_runs:
+                    ranges.append(absolute_range_name(
+                        name, f"{column_letter(first_col + 1)}{row_span[0]}:{column_letter(last_col + 1)}{row_span[1]}"
+                    ))
+        results = iter(batch_get_values(self.client, self.spreadsheet_url, ranges))
+
+        frames = {}
+        for name in names:
+            col_indexes, column_runs, row_span, data_rows = plans[name]
+            values = [[cell(row, i) for i in col_indexes] for row in heads[name]]
+            # Sheet row number of each entry of `values`
+            row_numbers = list(range(1, len(values) + 1))
+            if row_span is not None:
+                # Stitch each row back together from its column runs
+                first_row, last_row = row_span
+                rows = [[] for _ in range(last_row - first_row + 1)]
+                for first_col, last_col in column_runs:
+                    run_values = next(results)
+                    for offset, row in enumerate(rows):
+                        run_row = run_values[offset] if offset < len(run_values) else []
+                        row.extend(cell(run_row, i) for i in range(last_col - first_col + 1))
+                values += rows
+                row_numbers += range(first_row, last_row + 1)
+            frame = values_to_dataframe(values)
+            # Indexed like a full read (sheet row - 2), whatever was skipped or blank
+            frame.index = [row_numbers[label + 1] - 2 for label in frame.index]
+            frame.attrs[DATA_ROWS_ATTR] = data_rows
+            frames[name] = frame
+        return frames
+
+    def read_config_rows(self, names):
+        """Rows 1-10 of every tab in one values:batchGet request"""
+        names = list(names)
+        ranges = [absolute_range_name(name, f"1:{CONFIG_ROWS_COUNT}") for name in names]
+        results = batch_get_values(self.client, self.spreadsheet_url, ranges)
+        return {name: values_to_dataframe([trim_row(row) for row in values]) for name, values in zip(names, results)}
+
+    def worksheet(self, name):
+        return self.handles.worksheet(self.spreadsheet_url, name)
+
+    def write_lock(self, name):
+        with self._write_locks_lock:
+            return self._write_locks.setdefault(name, threading.Lock())
+
+    def invalidate(self, user):
+        """Forget the tab's row index and worksheet handle (e.g. after a failed
+        write, or if the tab was renamed or deleted)"""
+        self._row_indexes.pop(user, None)
+        self._date_columns.pop(user, None)
+        self.handles.invalidate(self.spreadsheet_url, user)
+        if self.delta is not None:
+            self.delta.forget(user)
+
+    def row_index(self, user, worksheet):
+        """The tab's date -> row index, rebuilt from a full read if it's
+        missing or no longer matches the sheet"""
+        index = self._row_indexes.get(user)
+        if index is None or not index.is_current(worksheet):
+            full_df = self.read_tab(user, fresh=True)
+            if full_df.empty or len(full_df.columns) == 0:
+                raise StorageError(f"Could not read existing data for {user}")
+            index = SheetRowIndex.from_sheet(full_df)
+            self._row_indexes[user] = index
+        return index
+
+    def upsert_days(self, user, days):
+        with self.write_lock(user):
+            try:
+                worksheet = self.worksheet(user)
+                index = self.row_index(user, worksheet)
+
+                updates = []
+                inserts = []
+                for day, values in days.items():
+                    # Values in sheet column order (missing columns left blank)
+                    row_values = [to_cell_value(values.get(col, '')) for col in index.columns]
+                    sheet_row_num = index.row_for_date(day)
+                    if sheet_row_num is not None:
+                        updates.append({'range': f'A{sheet_row_num}', 'values': [row_values]})
+                    else:
+                        inserts.append((day, row_values))
+
+                # Update logged days in place, in one request
+                if len(updates) == 1:
+                    worksheet.update(range_name=updates[0]['range'], values=updates[0]['values'])
+                elif updates:
+                    worksheet.batch_update(updates)
+
+                # New days go right after the last data row (or after the
+                # config rows if there is none), all in one insert
+                if inserts:
+                    first_row = index.next_insert_row()
+                    if len(inserts) == 1:
+                        worksheet.insert_row(inserts[0][1], index=first_row)
+                    else:
+                        worksheet.insert_rows([row_values for _, row_values in inserts], row=first_row)
+                    for offset, (day, _) in enumerate(inserts):
+                        index.record_insert(day, first_row + offset)
+            except Exception:
+                # The write may have partially landed, so rebuild the index and
+                # worksheet handle next time
+                self.invalidate(user)
+                raise
+
+    def write_config(self, user, columns, config_rows, insert=False, rows=None):
+        with self.write_lock(user):
+            try:
+                worksheet = self.worksheet(user)
+                if insert:
+                    # New rows 2-10 push everything below them down, so the
+                    # data rows move without being read or re-uploaded
+                    worksheet.insert_rows(config_rows, row=2)
+                elif rows is None:
+                    worksheet.update(values=config_rows, range_name='A2')
+                elif rows:
+                    # Only the rows that changed, in one request
+                    worksheet.batch_update([{'range': f'A{2 + i}', 'values': [config_rows[i]]} for i in rows])
+            finally:
+                self.invalidate(user)
+
+    def write_users(self, users):
+        with self.write_lock(USERS_TAB):
+            worksheet = self.worksheet(USERS_TAB)
+            worksheet.clear()
+            worksheet.update(values=[['user']] + [[user] for user in users], range_name='A1')
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    position INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+-- Header row and the rows above the data (rows 2-11), as JSON lists
+CREATE TABLE IF NOT EXISTS tabs (
+    user TEXT PRIMARY KEY,
+    header TEXT NOT NULL,
+    preamble TEXT NOT NULL
+);
+-- One row per logged day; cells is a JSON object of column -> value
+CREATE TABLE IF NOT EXISTS days (
+    user TEXT NOT NULL,
+    date TEXT NOT NULL,
+    cells TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS days_user_date ON days (user, date);
+"""
+
+
+class SQLiteStorage(Storage):
+    """Local SQLite database with the same tab layout as the Sheet.
+
+    Day rows are keyed by (user, date), so a save is a single indexed upsert
+    and a tab read is one indexed range scan. Rows keep insertion order, like
+    rows appended to a sheet."""
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SQLITE_SCHEMA)
+        self._lock = threading.Lock()
+
+    def read_tab(self, name, fresh=False):
+        if name == USERS_TAB:
+            with self._lock:
+                rows = self._db.execute("SELECT name FROM users ORDER BY position").fetchall()
+            return values_to_dataframe([['user']] + [[user] for user, in rows])
+
+        with self._lock:
+            tab = self._db.execute("SELECT header, preamble FROM tabs WHERE user = ?", (name,)).fetchone()
+            days = self._db.execute("SELECT cells FROM days WHERE user = ? ORDER BY rowid", (name,)).fetchall()
+        if tab is None:
+            raise StorageError(f"No tab named {name!r}")
+
+        header = json.loads(tab[0])
+        values = [header] + json.loads(tab[1])
+        for cells, in days:
+            cells = json.loads(cells)
+            values.append([cells.get(col, '') for col in header])
+        # Same parsing as a Sheets read, so both backends give identical frames
+        return values_to_dataframe(values)
+
+    def upsert_days(self, user, days):
+        with self._lock:
+            tab = self._db.execute("SELECT header FROM tabs WHERE user = ?", (user,)).fetchone()
+            if tab is None:
+                raise StorageError(f"No tab named {user!r}")
+            header = json.loads(tab[0])
+
+            rows = []
+            for day, values in days.items():
+                cells = {col: to_cell_value(values.get(col, '')) for col in header}
+                rows.append((user, day, json.dumps(cells)))
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO days (user, date, cells) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user, date) DO UPDATE SET cells = excluded.cells",
+                    rows,
+                )
+
+    def write_config(self, user, columns, config_rows, insert=False, rows=None):
+        # Config lives apart from the day rows here, so nothing has to move
+        with self._lock:
+            tab = self._db.execute("SELECT preamble FROM tabs WHERE user = ?", (user,)).fetchone()
+            preamble = json.loads(tab[0]) if tab is not None else []
+            preamble = [list(row) for row in config_rows] + preamble[len(config_rows):]
+            preamble += [[] for _ in range(CONFIG_ROWS_COUNT - len(preamble))]
+            with self._db:
+                self._db.execute(
+                    "INSERT INTO tabs (user, header, preamble) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user) DO UPDATE SET header = excluded.header, preamble = excluded.preamble",
+                    (user, json.dumps(list(columns)), json.dumps(preamble)),
+                )
+
+    def write_users(self, users):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM users")
+            self._db.executemany("INSERT INTO users (position, name) VALUES (?, ?)", list(enumerate(users)))
+
+
+def copy_tabs(source, target, users=None):
+    """Copy the users list, config rows and day rows from one storage to
+    another, e.g. Sheets -> SQLite to go local, or SQLite -> Sheets to sync back"""
+    users = users or source.read_users()
+    target.write_users(users)
+    tabs = source.read_tabs(users)
+    for user in users:
+        tab = tabs[user]
+        if 'date' not in tab.columns:
+            raise StorageError(f"Tab {user!r} has no 'date' column")
+        columns = [str(col) for col in tab.columns]
+        target.write_config(user, columns, frame_rows(tab.iloc[:CONFIG_ROWS_COUNT]))
+
+        data_df = tab.iloc[CONFIG_ROWS_COUNT:]
+        days = {}
+        for row in frame_rows(data_df):
+            values = dict(zip(columns, row))
+            if values['date'] != '':
+                days[str(values['date'])] = values
+        if days:
+            target.upsert_days(user, days)
+
+
+def open_storage(conn_factory=None, backend=STORAGE_BACKEND):
+    """The configured backend. conn_factory() should return a GSheetsConnection
+    (only called for the Sheets backend)."""
+    if backend == "sqlite":
+        return SQLiteStorage()
+    if backend != "sheets":
+        raise StorageError(f"Unknown storage backend {backend!r} (expected 'sheets' or 'sqlite')")
+    return SheetsStorage.from_connection(conn_factory())
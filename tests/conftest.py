@@ -0,0 +1,20 @@
+"""
+Shared setup for the test suite: the repo's modules (and the fake Sheets
+backend in benchmarks/) are importable, and nothing the tests run writes
+snapshots, journals, timings or metrics next to the code.
+"""
+
+import os
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+_scratch = tempfile.mkdtemp(prefix="bdd-tests-")
+os.environ.setdefault("BDD_SNAPSHOT_DIR", os.path.join(_scratch, "snapshots"))
+os.environ.setdefault("BDD_SAVE_JOURNAL", os.path.join(_scratch, "save_journal.db"))
+os.environ.setdefault("BDD_TIMINGS_LOG", "")
+os.environ.setdefault("BDD_METRICS_FILE", "")
+os.environ.setdefault("BDD_REFRESH_INTERVAL", "0")
@@ -0,0 +1,107 @@
+"""Whole-page runs of app.py through Streamlit's AppTest, and its data
+functions on their own, on the fake Sheets backend"""
+
+from datetime import date
+
+import pandas as pd
+import pytest
+import streamlit as st
+import streamlit.logger
+from streamlit.testing.v1 import AppTest
+
+import scheduler
+from conftest import REPO_DIR
+from fake_sheets import FakeSheetsBackend, install_fake_connection
+from refresher import Refresher
+from run_benchmarks import load_app_functions
+from synthetic_data import make_spreadsheet
+
+APP_PATH = f"{REPO_DIR}/app.py"
+MAIN_TABS = ["📝 Log Today", "📊 My Progress", "😎 Good Looking Week"]
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    # Streamlit warns about running outside `streamlit run` on every cached call
+    streamlit.logger.set_log_level("error")
+    monkeypatch.setattr(scheduler, "READ_QUOTA_PER_MINUTE", 10**9)
+    monkeypatch.setattr(scheduler, "WRITE_QUOTA_PER_MINUTE", 10**9)
+    backend = FakeSheetsBackend(make_spreadsheet(3, 0.3))
+    install_fake_connection(backend)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    yield backend
+    st.cache_resource.clear()
+
+
+def run(page):
+    page.run()
+    assert not page.exception, page.exception[0].value
+    return page
+
+
+def test_warm_runs_make_no_sheets_requests(backend):
+    first = run(AppTest.from_file(APP_PATH, default_timeout=300))
+    for label in MAIN_TABS:
+        first.session_state["main_tab"] = label
+        run(first)
+    assert backend.requests
+
+    # A second session finds the users list, user data and leaderboard already loaded
+    backend.requests.clear()
+    page = run(AppTest.from_file(APP_PATH, default_timeout=300))
+    for label in MAIN_TABS:
+        page.session_state["main_tab"] = label
+        run(page)
+        assert dict(backend.requests) == {}, label
+
+
+class NoStreamlit:
+    """Stands in for the st module where nothing may call it"""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"st.{name} called off the script thread")
+
+
+def test_refresher_pass_never_calls_streamlit_and_reports_bad_config(backend):
+    app = load_app_functions()
+    storage, store, snapshots = app["get_storage"](), app["get_data_store"](), app["get_snapshot_store"]()
+    app["st"] = NoStreamlit()
+
+    # user2's config rows can't be compiled
+    compile_column_config = app["compile_column_config"]
+
+    def compile_or_fail(config_df):
+        if "broken" in config_df.columns:
+            raise ValueError("bad config row")
+        return compile_column_config(config_df)
+
+    app["compile_column_config"] = compile_or_fail
+    backend.tabs["user2"][0].append("broken")
+
+    refresher = Refresher(lambda: app["refresh_shared_data"](storage, store, snapshots),
+                          tracking_date=app["get_tracking_date"], interval=0)
+    assert not refresher.run_once()
+
+    status = refresher.status()
+    assert status["consecutive_failures"] == 1
+    assert "user2" in status["last_error"] and "bad config row" in status["last_error"]
+    # The other users were still published
+    assert store.get(("user", "user1")) is not None and store.get(("user", "user3")) is not None
+    assert store.get(("user", "user2")) is None
+
+
+def test_leaderboard_split_with_a_blank_config_row(backend):
+    app = load_app_functions()
+    rows = backend.tabs["user1"]
+    # The units row (row 4) cleared by hand
+    rows[3] = []
+    since = date.fromisoformat(rows[40][1])
+
+    projected = app["get_storage"]().read_projected(["user1"], app["leaderboard_columns"], since)["user1"]
+    data_df, config, days_logged = app["split_leaderboard_sheet"]("user1", projected)
+
+    assert data_df["date"].iloc[0] == pd.Timestamp(since)
+    assert len(data_df) == len(rows) - 40
+    assert days_logged == len(rows) - 11
+    assert [column for column, spec in config.items() if spec.goal is not None] == list(projected.columns[1:])
@@ -0,0 +1,73 @@
+"""DeltaSync's incremental reads give the same frames as a full read, on the fake Sheets backend"""
+
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+import scheduler
+from delta_sync import MAX_CHANGED_ROWS, DeltaSync
+from fake_sheets import SPREADSHEET_URL, FakeClient, FakeSheetsBackend
+from sheets import CONFIG_ROWS_COUNT, batch_read_worksheets
+from synthetic_data import make_day_row, make_spreadsheet
+
+END = date(2026, 3, 1)
+USERS = ["user1", "user2"]
+
+
+@pytest.fixture(autouse=True)
+def unlimited_quota(monkeypatch):
+    monkeypatch.setattr(scheduler, "READ_QUOTA_PER_MINUTE", 10**9)
+    monkeypatch.setattr(scheduler, "WRITE_QUOTA_PER_MINUTE", 10**9)
+
+
+def append_days(rows, user, rng, count):
+    last_day = date.fromisoformat(rows[-1][1])
+    for offset in range(1, count + 1):
+        rows.append(make_day_row(user, last_day + timedelta(days=offset), rng, 0.05))
+
+
+def edit_days(rows, user, rng, count, stamp):
+    """Re-save `count` logged days, the way the app does: new values and a new timestamp"""
+    for number in rng.sample(range(CONFIG_ROWS_COUNT, len(rows)), count):
+        day = date.fromisoformat(rows[number][1])
+        rows[number] = make_day_row(user, day, rng, 0.05)[:-1] + [stamp]
+
+
+def insert_days(rows, user, rng, count, from_end):
+    """Rows inserted by hand among the data rows, `from_end` rows above the last one"""
+    for _ in range(count):
+        position = len(rows) - from_end
+        # A second row for the day above it, so the dates stay in order
+        rows.insert(position, make_day_row(user, date.fromisoformat(rows[position - 1][1]), rng, 0.05))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_incremental_reads_match_full_reads(seed):
+    rng = random.Random(seed)
+    backend = FakeSheetsBackend(make_spreadsheet(len(USERS), 0.5, end=END, seed=seed))
+    client = FakeClient(backend)
+    delta = DeltaSync(client, SPREADSHEET_URL)
+    delta.read_tabs(USERS)
+
+    changes = [
+        lambda rows, user, n: append_days(rows, user, rng, 1),
+        lambda rows, user, n: append_days(rows, user, rng, 5),
+        lambda rows, user, n: edit_days(rows, user, rng, 1, f"edit {n}"),
+        lambda rows, user, n: edit_days(rows, user, rng, MAX_CHANGED_ROWS // 2, f"edit {n}"),
+        # Near the end only a few rows shift (patched); further up, a full read
+        lambda rows, user, n: insert_days(rows, user, rng, 1, 3),
+        lambda rows, user, n: insert_days(rows, user, rng, 2, MAX_CHANGED_ROWS + 10),
+        lambda rows, user, n: None,
+    ]
+    for round_number in range(30):
+        for user in USERS:
+            rng.choice(changes)(backend.tabs[user], user, round_number)
+
+        incremental = delta.read_tabs(USERS)
+        full = batch_read_worksheets(client, SPREADSHEET_URL, USERS)
+        for user in USERS:
+            pd.testing.assert_frame_equal(incremental[user], full[user])
+
+    assert delta.delta_reads > 0
@@ -0,0 +1,73 @@
+"""Incremental JSON reading in import_history.py"""
+
+import io
+import json
+import random
+
+import pytest
+
+from import_history import read_chunks, read_json_records
+
+VALUES = [0, 1, -3, 12.5, 1e-7, 123456789, True, False, None, '', 'felt good', 'café \U0001f3c3', 'a "quoted" \\ line\n',
+          [1, 2], {'nested': [None, {'x': 1}]}]
+
+
+def random_day(rng):
+    return {f'col{i}': rng.choice(VALUES) for i in range(rng.randint(0, 6))}
+
+
+def legacy_layout(rng):
+    return {f'user {u}': {f'2025-01-{d + 1:02d}': random_day(rng) for d in range(rng.randint(0, 12))}
+            for u in range(rng.randint(0, 4))}
+
+
+def legacy_records(data):
+    return [{'user': user, 'date': day, **values} for user, days in data.items() for day, values in days.items()]
+
+
+class CountingReader(io.StringIO):
+    """StringIO that counts the characters read from it"""
+
+    chars_read = 0
+
+    def read(self, size=-1):
+        text = super().read(size)
+        self.chars_read += len(text)
+        return text
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("block_chars", [1, 7, 4096])
+def test_records_match_a_whole_file_parse(seed, block_chars):
+    rng = random.Random(seed)
+    data = legacy_layout(rng)
+    records = [{'user': 'anne', 'date': f'2025-02-{d + 1:02d}', **random_day(rng)} for d in range(rng.randint(0, 12))]
+    for text in (json.dumps(data), json.dumps(data, indent=2), json.dumps(data, separators=(',', ':'))):
+        assert list(read_json_records(io.StringIO(text), block_chars)) == legacy_records(data)
+    for text in (json.dumps(records), json.dumps(records, indent=1)):
+        assert list(read_json_records(io.StringIO(text), block_chars)) == records
+
+
+def test_large_files_are_read_a_block_at_a_time():
+    data = {'anne': {f'day {d}': {'steps': d, 'notes': 'x' * 50} for d in range(20000)}}
+    f = CountingReader(json.dumps(data))
+    records = read_json_records(f, block_chars=1024)
+    assert next(records) == {'user': 'anne', 'date': 'day 0', 'steps': 0, 'notes': 'x' * 50}
+    assert f.chars_read <= 2 * 1024
+    assert sum(1 for _ in records) == 20000 - 1
+
+
+@pytest.mark.parametrize("text", ['{"anne": {"2025-01-01": {"steps": 1}', '{"anne": [1, 2]}', '{"anne": {} "bobby": {}}',
+                                  '[{"steps": 1},'])
+def test_invalid_documents_raise(text):
+    with pytest.raises(ValueError):
+        list(read_json_records(io.StringIO(text), block_chars=4))
+
+
+def test_json_files_are_chunked(tmp_path):
+    data = {'anne': {f'2025-01-{d + 1:02d}': {'steps': d} for d in range(25)}, 'bobby': {'2025-01-01': {'steps': 7}}}
+    path = tmp_path / 'kpi_data.json'
+    path.write_text(json.dumps(data))
+    chunks = list(read_chunks(str(path), chunk_rows=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 6]
+    assert [record for chunk in chunks for record in chunk.to_dict('records')] == legacy_records(data)
@@ -0,0 +1,154 @@
+"""The save journal, the write-behind flusher and overlay_days, against the fake Sheets backend"""
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import scheduler
+from fake_sheets import SPREADSHEET_URL, FakeClient, FakeSheetsBackend
+from save_queue import SaveJournal, WriteBehindStorage, overlay_days
+from sheets import CONFIG_ROWS_COUNT
+from storage import DATA_ROWS_ATTR, SheetsStorage
+from synthetic_data import make_spreadsheet
+
+END = date(2026, 3, 1)
+USER = "user1"
+
+
+@pytest.fixture(autouse=True)
+def unlimited_quota(monkeypatch):
+    monkeypatch.setattr(scheduler, "READ_QUOTA_PER_MINUTE", 10**9)
+    monkeypatch.setattr(scheduler, "WRITE_QUOTA_PER_MINUTE", 10**9)
+
+
+@pytest.fixture
+def backend():
+    return FakeSheetsBackend(make_spreadsheet(1, 0.1, end=END))
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    return str(tmp_path / "journal.db")
+
+
+def sheet_row(backend, day):
+    """The cells of the tab's row dated `day` (None if there is none), and how many there are"""
+    rows = [row for row in backend.tabs[USER][CONFIG_ROWS_COUNT:] if len(row) > 1 and row[1] == day]
+    return (rows[0] if rows else None), len(rows)
+
+
+def day_cells(day, steps):
+    return {"user": USER, "date": day, "steps": steps, "timestamp": f"{day} 21:00:00"}
+
+
+def test_repeated_edits_of_a_day_coalesce_into_one_pending_row(journal_path):
+    journal = SaveJournal(journal_path)
+    for steps in (1000, 2000, 3000):
+        journal.add(USER, {"2026-03-05": day_cells("2026-03-05", steps)})
+    journal.add(USER, {"2026-03-06": day_cells("2026-03-06", 4000)})
+
+    assert len(journal) == 2
+    assert journal.days(USER)["2026-03-05"]["steps"] == 3000
+
+
+def test_remove_keeps_a_row_replaced_by_a_newer_save(journal_path):
+    journal = SaveJournal(journal_path)
+    journal.add(USER, {"2026-03-05": day_cells("2026-03-05", 1000)})
+    written_ids = [row_id for row_id, _ in journal.pending(USER)[USER].values()]
+
+    # A save of the same day lands after the flush read the journal, before it removes what it wrote
+    journal.add(USER, {"2026-03-05": day_cells("2026-03-05", 2000)})
+    journal.remove(written_ids)
+
+    assert journal.days(USER)["2026-03-05"]["steps"] == 2000
+    assert SaveJournal(journal_path).days(USER)["2026-03-05"]["steps"] == 2000
+
+
+def test_save_during_a_flush_is_written_by_the_next_one(backend, journal_path):
+    storage = SheetsStorage(FakeClient(backend), SPREADSHEET_URL, sync_mode="full")
+    journal = SaveJournal(journal_path)
+    queue = WriteBehindStorage(storage, journal, flush_delay=0)
+    upsert_days = storage.upsert_days
+
+    def upsert_then_save_again(user, days):
+        upsert_days(user, days)
+        if days["2026-03-05"]["steps"] == 1000:
+            queue.upsert_days(USER, {"2026-03-05": day_cells("2026-03-05", 2000)})
+
+    storage.upsert_days = upsert_then_save_again
+    queue.upsert_days(USER, {"2026-03-05": day_cells("2026-03-05", 1000)})
+
+    assert queue.flush()
+    assert journal.days(USER)["2026-03-05"]["steps"] == 2000
+    assert queue.flush()
+    assert len(journal) == 0
+    row, count = sheet_row(backend, "2026-03-05")
+    assert count == 1 and row[4] == 2000
+
+
+def test_rows_pending_when_the_journal_reopens_are_replayed(backend, journal_path):
+    storage = SheetsStorage(FakeClient(backend), SPREADSHEET_URL, sync_mode="full")
+    existing_day = backend.tabs[USER][CONFIG_ROWS_COUNT + 3][1]
+    queue = WriteBehindStorage(storage, SaveJournal(journal_path))
+    queue.upsert_days(USER, {existing_day: day_cells(existing_day, 4242),
+                             "2026-03-05": day_cells("2026-03-05", 1000)})
+    # The process dies before the flusher runs
+    del queue
+
+    reopened = SaveJournal(journal_path)
+    assert set(reopened.days(USER)) == {existing_day, "2026-03-05"}
+    queue = WriteBehindStorage(storage, reopened)
+    assert queue.flush()
+
+    assert len(reopened) == 0
+    assert len(SaveJournal(journal_path)) == 0
+    for day, steps in ((existing_day, 4242), ("2026-03-05", 1000)):
+        row, count = sheet_row(backend, day)
+        assert count == 1 and row[4] == steps
+
+
+def projected_tab(backend):
+    """A read_projected-style frame of the user's tab: config rows, then data rows"""
+    rows = backend.tabs[USER]
+    frame = pd.DataFrame(rows[1:], columns=rows[0])
+    frame.attrs[DATA_ROWS_ATTR] = len(frame) - CONFIG_ROWS_COUNT
+    return frame
+
+
+def test_overlay_days_replaces_existing_dates_and_appends_new_ones(backend):
+    tab = projected_tab(backend)
+    data_rows = tab.attrs[DATA_ROWS_ATTR]
+    existing_day = tab['date'].iloc[CONFIG_ROWS_COUNT + 2]
+
+    overlaid = overlay_days(tab, {existing_day: day_cells(existing_day, 4242),
+                                  "2026-03-05": day_cells("2026-03-05", 1000)})
+
+    assert len(overlaid) == len(tab) + 1
+    assert overlaid.attrs[DATA_ROWS_ATTR] == data_rows + 1
+    # Replaced in place: same position, blanks where the save had no value
+    assert overlaid['date'].iloc[CONFIG_ROWS_COUNT + 2] == existing_day
+    assert overlaid['steps'].iloc[CONFIG_ROWS_COUNT + 2] == 4242
+    assert pd.isna(overlaid['sleep'].iloc[CONFIG_ROWS_COUNT + 2])
+    assert overlaid.iloc[-1]['date'] == "2026-03-05"
+    assert overlaid.iloc[-1]['steps'] == 1000
+    # The frame read is left alone
+    assert len(tab) == data_rows + CONFIG_ROWS_COUNT
+    assert tab.attrs[DATA_ROWS_ATTR] == data_rows
+
+
+def test_overlay_days_leaves_out_new_days_before_since(backend):
+    tab = projected_tab(backend)
+    data_rows = tab.attrs[DATA_ROWS_ATTR]
+    existing_day = tab['date'].iloc[CONFIG_ROWS_COUNT]
+
+    overlaid = overlay_days(tab, {existing_day: day_cells(existing_day, 4242),
+                                  "2020-01-01": day_cells("2020-01-01", 1),
+                                  "2026-03-05": day_cells("2026-03-05", 1000)},
+                            since=date(2026, 1, 1))
+
+    assert list(overlaid['date'].iloc[CONFIG_ROWS_COUNT:]).count("2020-01-01") == 0
+    assert overlaid.attrs[DATA_ROWS_ATTR] == data_rows + 1
+    # An existing row is still replaced, even if it's dated before `since`
+    assert overlaid['steps'].iloc[CONFIG_ROWS_COUNT] == 4242
+    assert overlaid.iloc[-1]['date'] == "2026-03-05"
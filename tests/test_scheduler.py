@@ -0,0 +1,80 @@
+"""Pacing of the RequestScheduler's token buckets, on a simulated clock"""
+
+import pytest
+
+import scheduler
+from scheduler import RequestScheduler, TokenBucket, quota_bucket
+
+
+class FakeClock:
+    """Stands in for the time module in scheduler.py: sleep() advances monotonic()"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        assert seconds >= 0, f"slept for {seconds} s"
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler, "time", clock)
+    return clock
+
+
+def send_times(bucket, clock, count):
+    """Clock times at which `count` back-to-back acquire() calls were let through"""
+    times = []
+    for _ in range(count):
+        bucket.acquire()
+        times.append(clock.now)
+    return times
+
+
+def max_in_window(times, window=60.0):
+    return max(sum(start <= t < start + window for t in times) for start in times)
+
+
+def test_burst_goes_out_unpaced_then_refills_at_the_rest_of_the_quota(clock):
+    bucket = quota_bucket(60, 10)
+    times = send_times(bucket, clock, 11)
+    assert times[:10] == [1000.0] * 10
+    # The other 50 requests of the minute are spread evenly over it
+    assert times[10] - times[9] == pytest.approx(60 / 50)
+
+
+def test_no_minute_exceeds_the_quota(clock):
+    times = send_times(quota_bucket(60, 10), clock, 300)
+    assert max_in_window(times) <= 60
+
+
+@pytest.mark.parametrize("quota", [2, 5, 10, 15, 20])
+def test_quota_at_or_below_burst_still_paces(clock, quota):
+    sched = RequestScheduler(read_quota=quota, write_quota=quota, burst=10)
+    for bucket in (sched.read_bucket, sched.write_bucket):
+        assert bucket.rate > 0
+        times = send_times(bucket, clock, 4 * quota)
+        assert max_in_window(times) <= quota
+    assert all(delay >= 0 for delay in clock.sleeps)
+
+
+def test_quota_too_low_to_pace_is_rejected():
+    with pytest.raises(ValueError):
+        quota_bucket(1, 10)
+    with pytest.raises(ValueError):
+        TokenBucket(0, 10)
+
+
+def test_drain_makes_the_next_request_wait(clock):
+    bucket = quota_bucket(60, 10)
+    bucket.acquire()
+    bucket.drain()
+    waited = bucket.acquire()
+    assert waited == pytest.approx(60 / 50)
@@ -0,0 +1,310 @@
+"""
+Parity of the vectorized scorer with the original row-by-row one.
+
+legacy_score() below is the scorer app.py had before scoring.py replaced it
+(as_of passed in instead of read from the clock, config as the plain dicts
+the old load_column_config built). calculate_user_score must return the same
+float, bit for bit, for every frame and as-of date; score_timeline must match
+calculate_user_score for every day it covers.
+"""
+
+import random
+import struct
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from column_config import compile_column_config, decode_user_frame
+from scoring import calculate_user_score, score_timeline
+
+# Cell values the generator draws from: blanks, booleans written every way
+# the sheet has seen, numbers as numbers and as text, and junk
+BOOLEAN_VALUES = [True, False, 1, 0, '1', '0', 'TRUE', 'true', 'yes', 'Y', 't', 'no', '', None, np.nan, 1.0, 'x']
+NUMBER_VALUES = [0, 1, 2, 5, 10, 25.5, '3', '7.5', 'abc', '', '1_000', None, np.nan, -1, 100, 0.0, 'nan', ' 4 ',
+                 True, False, 'TRUE']
+GOAL_TARGETS = [True, 'TRUE', 1, 0, '1', 3, 2.5, '4', '', None, 'abc', 25, 100, 'None']
+
+# What a sheet read actually returns for typed columns: blanks come back as
+# NaN, numbers as numbers, and the odd cell of text typed into a number column
+SHEET_BOOLEAN_VALUES = [True, False, 1, 0, '1', '0', 'TRUE', 'yes', 'no', None, np.nan, 'x']
+SHEET_INT_VALUES = [0, 1, 2, 5, 10, -1, 100, '3', None, np.nan, 'n/a', 'abc']
+SHEET_FLOAT_VALUES = [0, 1, 2, 5, 10, 25.5, 25.1, '3', '7.5', None, np.nan, -1, 100, 0.0, 'n/a']
+
+CASES = 1200
+
+
+def legacy_config(config_df):
+    """Column config as the old load_column_config built it from rows 2-10"""
+    config = {}
+    for col_idx, col_name in enumerate(str(col) for col in config_df.columns):
+        if col_name.strip() == '' or col_name.strip().lower() in ['nan', 'none']:
+            continue
+        col_name = col_name.strip()
+        cell = config_df.iloc[:, col_idx]
+        config[col_name] = {
+            'display_name': str(cell.iloc[0]) if not pd.isna(cell.iloc[0]) else col_name,
+            'emoji': str(cell.iloc[1]) if not pd.isna(cell.iloc[1]) else '',
+            'units': str(cell.iloc[2]) if not pd.isna(cell.iloc[2]) else '',
+            'type': str(cell.iloc[3]).lower() if not pd.isna(cell.iloc[3]) else 'note',
+            'has_goal': str(cell.iloc[4]).upper() == 'TRUE' if not pd.isna(cell.iloc[4]) else False,
+            'weekly_or_daily_goal': str(cell.iloc[5]).lower() if not pd.isna(cell.iloc[5]) else '',
+            'goal_target': cell.iloc[6] if not pd.isna(cell.iloc[6]) else None,
+            'goal_direction': str(cell.iloc[7]).lower() if not pd.isna(cell.iloc[7]) else '',
+            'help_text': str(cell.iloc[8]) if not pd.isna(cell.iloc[8]) else '',
+        }
+    return config
+
+
+def legacy_score(df, config, as_of):
+    """The original calculate_user_score, row by row"""
+    if config is None:
+        return 0
+    yesterday = as_of
+
+    goal_columns = []
+    for col_name, col_config in config.items():
+        if col_config.get('has_goal', False) and col_name not in ['user', 'date', 'notes', 'timestamp']:
+            goal_columns.append((col_name, col_config))
+    if not goal_columns:
+        return 0
+    if df.empty or 'date' not in df.columns:
+        return 0
+
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    df = df.sort_values('date')
+    df = df[df['date'] <= yesterday].copy()
+
+    goal_scores = []
+    points_per_goal = 100.0 / len(goal_columns)
+
+    for col_name, col_config in goal_columns:
+        goal_type = col_config.get('weekly_or_daily_goal', '')
+        goal_target = col_config.get('goal_target', None)
+        goal_direction = col_config.get('goal_direction', 'at_least')
+        col_type = col_config.get('type', 'note')
+        week_start = yesterday - timedelta(days=6)
+        week_df = df[(df['date'] >= week_start) & (df['date'] <= yesterday)].copy()
+
+        if goal_type == 'daily':
+            if week_df.empty or col_name not in week_df.columns:
+                goal_scores.append(0)
+                continue
+            week_df_with_data = week_df[week_df[col_name].notna()].copy()
+            if week_df_with_data.empty:
+                goal_scores.append(0)
+                continue
+            num_dates_with_data = len(week_df_with_data)
+
+            try:
+                if col_type == 'boolean':
+                    goal_target_num = 1 if (goal_target is True or str(goal_target).upper() in ['TRUE', '1']) else 0
+                else:
+                    goal_target_num = float(goal_target) if goal_target not in [None, '', 'None'] else None
+            except (ValueError, TypeError):
+                goal_target_num = None
+            if goal_target_num is None:
+                goal_scores.append(0)
+                continue
+
+            num_days_with_goal_met = 0
+            for _, row in week_df_with_data.iterrows():
+                value = row[col_name]
+                if col_type == 'boolean':
+                    numeric_value = 1 if str(value).upper() in ['TRUE', '1', 'YES', 'Y', 'T', True] else 0
+                else:
+                    try:
+                        numeric_value = float(value) if pd.notna(value) else 0
+                    except (ValueError, TypeError):
+                        numeric_value = 0
+                if goal_direction == 'at_most':
+                    goal_met = numeric_value <= goal_target_num
+                else:
+                    goal_met = numeric_value >= goal_target_num
+                if goal_met:
+                    num_days_with_goal_met += 1
+
+            goal_scores.append((num_days_with_goal_met / num_dates_with_data) * points_per_goal)
+
+        elif goal_type in ('weekly_total', 'count_per_week'):
+            if week_df.empty or col_name not in week_df.columns:
+                week_value = 0
+            elif col_type == 'boolean':
+                col_data = week_df[col_name].apply(
+                    lambda x: 1 if (pd.notna(x) and str(x).upper() in ['TRUE', '1', 'YES', 'Y', 'T', True]) else 0
+                )
+                week_value = float(col_data.sum()) if goal_type == 'weekly_total' else int(col_data.sum())
+            else:
+                col_data = pd.to_numeric(week_df[col_name], errors='coerce')
+                if goal_type == 'weekly_total':
+                    week_value = float(col_data.sum()) if col_data.notna().any() else 0
+                else:
+                    week_value = int((col_data.notna() & (col_data != 0)).sum())
+
+            try:
+                goal_target_num = float(goal_target) if goal_target not in [None, '', 'None'] else None
+            except (ValueError, TypeError):
+                goal_target_num = None
+            if goal_target_num is None:
+                goal_scores.append(0)
+                continue
+
+            if goal_direction == 'at_most':
+                goal_met = week_value <= goal_target_num
+            else:
+                goal_met = week_value >= goal_target_num
+            goal_scores.append(points_per_goal if goal_met else 0)
+
+    return sum(goal_scores)
+
+
+def bits(value):
+    return struct.pack('d', float(value))
+
+
+def outcome(fn, *args):
+    """fn's score as raw float bits, or the type of exception it raised"""
+    try:
+        return bits(fn(*args))
+    except Exception as e:
+        return type(e)
+
+
+def random_case(rng, sheet_values=False):
+    """(config rows 2-10 frame, raw data rows, as-of date) for one randomized
+    user. With sheet_values, cells only hold what a sheet read returns (see
+    SHEET_BOOLEAN_VALUES) rather than any junk."""
+    as_of = date(2026, 3, 10) + timedelta(days=rng.randint(-400, 400))
+    columns = ['user', 'date']
+    config_columns = [[None] * 9, [None, None, None, 'date', None, None, None, None, None]]
+    types = []
+    for i in range(rng.randint(1, 6)):
+        col_type = rng.choice(['boolean', 'int', 'float', 'note'])
+        types.append(col_type)
+        columns.append(f'c{i}')
+        config_columns.append([
+            f'Column {i}', rng.choice(['💪', '', None]), rng.choice(['', 'steps', None]),
+            rng.choice([col_type, col_type.upper()]),
+            rng.choice([True, 'TRUE', 'true']) if rng.random() < 0.85 else rng.choice([False, None, 'no']),
+            rng.choice(['daily', 'weekly_total', 'count_per_week', 'Daily', None, 'bogus']),
+            rng.choice(GOAL_TARGETS),
+            rng.choice(['at_least', 'at_most', 'AT_MOST', None]),
+            None,
+        ])
+    config_df = pd.DataFrame(list(zip(*config_columns)), columns=columns, dtype=object)
+
+    rows = []
+    for _ in range(rng.randint(0, 25)):
+        day = as_of - timedelta(days=rng.randint(-3, 14))
+        row = {'user': 'u', 'date': day.isoformat()}
+        for i, col_type in enumerate(types):
+            if rng.random() < 0.9:
+                if not sheet_values:
+                    row[f'c{i}'] = rng.choice(BOOLEAN_VALUES if col_type == 'boolean' else NUMBER_VALUES)
+                elif col_type == 'boolean':
+                    row[f'c{i}'] = rng.choice(SHEET_BOOLEAN_VALUES)
+                elif col_type == 'int':
+                    row[f'c{i}'] = rng.choice(SHEET_INT_VALUES)
+                else:
+                    row[f'c{i}'] = rng.choice(SHEET_FLOAT_VALUES)
+        rows.append(row)
+    data_df = pd.DataFrame(rows, columns=columns, dtype=object)
+    return config_df, data_df, as_of
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_legacy_scorer_on_raw_rows(seed):
+    rng = random.Random(seed)
+    for case in range(CASES // 4):
+        config_df, data_df, as_of = random_case(rng)
+        expected = outcome(legacy_score, data_df.copy(), legacy_config(config_df), as_of)
+        actual = outcome(calculate_user_score, 'u', data_df.copy(), compile_column_config(config_df), as_of)
+        assert actual == expected, f"seed {seed} case {case}:\n{config_df}\n{data_df}\nas of {as_of}"
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_legacy_scorer_on_decoded_rows(seed):
+    # What the app actually scores: the frame decode_user_frame typed at load time
+    rng = random.Random(100 + seed)
+    for case in range(CASES // 4):
+        config_df, data_df, as_of = random_case(rng, sheet_values=True)
+        config = compile_column_config(config_df)
+        expected = outcome(legacy_score, data_df.copy(), legacy_config(config_df), as_of)
+        actual = outcome(calculate_user_score, 'u', decode_user_frame(data_df, config), config, as_of)
+        assert actual == expected, f"seed {seed} case {case}:\n{config_df}\n{data_df}\nas of {as_of}"
+
+
+def config_frame(*specs):
+    """Config rows for (name, type, window, target, direction) goal columns"""
+    columns = ['user', 'date'] + [spec[0] for spec in specs]
+    cells = [[None] * 9, [None, None, None, 'date', None, None, None, None, None]]
+    for name, col_type, window, target, direction in specs:
+        cells.append([name, '', '', col_type, 'TRUE', window, target, direction, ''])
+    return pd.DataFrame(list(zip(*cells)), columns=columns, dtype=object)
+
+
+AS_OF = date(2026, 3, 10)
+
+
+def week_rows(column, values):
+    """One row per value, for the days ending AS_OF"""
+    days = [AS_OF - timedelta(days=offset) for offset in range(len(values) - 1, -1, -1)]
+    return pd.DataFrame({'user': 'u', 'date': [day.isoformat() for day in days], column: values}, dtype=object)
+
+
+@pytest.mark.parametrize("spec, values, expected", [
+    # Blank days don't count towards a daily goal's logged days
+    (('steps', 'int', 'daily', 8000, 'at_least'), [9000, None, 7000, np.nan], 50.0),
+    # at_most: lower is better, and the target itself counts as met
+    (('drinks', 'int', 'daily', 1, 'at_most'), [0, 1, 2, 3], 50.0),
+    (('drinks', 'int', 'weekly_total', 3, 'at_most'), [1, 1, 1, None], 100.0),
+    (('drinks', 'int', 'weekly_total', 3, 'at_most'), [1, 1, 2], 0),
+    # Booleans in every spelling; anything unrecognised is False
+    (('gym', 'boolean', 'count_per_week', 3, 'at_least'), ['TRUE', 'yes', 'Y', 'x', 'no', None], 100.0),
+    (('gym', 'boolean', 'count_per_week', 3, 'at_least'), [True, 1, '0', 'false'], 0),
+    (('gym', 'boolean', 'daily', 'TRUE', 'at_least'), [True, 'false', None, 't'], 100 * 2 / 3),
+    # Text in a number goal column is a logged 0: it counts towards a daily
+    # goal's days, and adds nothing to a total or count
+    (('steps', 'int', 'daily', 8000, 'at_least'), [9000, 'n/a', 'abc', None], 100 / 3),
+    (('drinks', 'float', 'daily', 1, 'at_most'), [3, 'n/a'], 50.0),
+    (('steps', 'int', 'weekly_total', 100, 'at_least'), [60, 'n/a', 40], 100.0),
+    (('steps', 'int', 'count_per_week', 2, 'at_least'), [60, 'n/a', 0], 0),
+    # A goal with no usable target scores nothing
+    (('steps', 'int', 'daily', 'abc', 'at_least'), [9000, 9000], 0),
+    # Days outside the 7-day window are ignored
+    (('steps', 'int', 'weekly_total', 100, 'at_least'), [100] + [None] * 7, 0),
+])
+def test_edge_cases_match_legacy(spec, values, expected):
+    config_df = config_frame(spec)
+    data_df = week_rows(spec[0], values)
+    config = compile_column_config(config_df)
+    legacy = legacy_score(data_df.copy(), legacy_config(config_df), AS_OF)
+    assert calculate_user_score('u', data_df.copy(), config, AS_OF) == pytest.approx(expected)
+    assert bits(calculate_user_score('u', data_df.copy(), config, AS_OF)) == bits(legacy)
+    assert bits(calculate_user_score('u', decode_user_frame(data_df, config), config, AS_OF)) == bits(legacy)
+
+
+def test_junk_text_is_blank_outside_goal_columns():
+    config_df = config_frame(('steps', 'int', 'daily', 8000, 'at_least'))
+    config_df['weight'] = ['Weight', '', 'lb', 'float', 'FALSE', '', '', '', '']
+    data_df = week_rows('steps', [9000, 'n/a'])
+    data_df['weight'] = [150.5, 'n/a']
+    typed = decode_user_frame(data_df, compile_column_config(config_df))
+    assert list(typed['steps']) == [9000, 0]
+    assert typed['weight'].iloc[0] == 150.5 and np.isnan(typed['weight'].iloc[1])
+
+
+def test_score_timeline_matches_per_date_scores():
+    rng = random.Random(7)
+    days_checked = 0
+    for case in range(300):
+        config_df, data_df, as_of = random_case(rng, sheet_values=True)
+        config = compile_column_config(config_df)
+        typed = decode_user_frame(data_df, config)
+        timeline = score_timeline(typed, config, as_of + timedelta(days=3))
+        for day, score in timeline.items():
+            expected = calculate_user_score('u', typed, config, day.date())
+            assert bits(score) == bits(expected), f"case {case}, {day.date()}:\n{config_df}\n{data_df}"
+            days_checked += 1
+    assert days_checked > 1000
@@ -0,0 +1,57 @@
+"""SheetsStorage reads against the fake Sheets backend"""
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import scheduler
+from column_config import compile_column_config, goal_rules
+from fake_sheets import SPREADSHEET_URL, FakeClient, FakeSheetsBackend
+from sheets import SheetRowIndex, config_rows, split_tab
+from storage import DATA_ROWS_ATTR, SheetsStorage, project_frame
+from synthetic_data import make_spreadsheet
+
+END = date(2026, 3, 1)
+USER = "user1"
+
+
+@pytest.fixture(autouse=True)
+def unlimited_quota(monkeypatch):
+    monkeypatch.setattr(scheduler, "READ_QUOTA_PER_MINUTE", 10**9)
+    monkeypatch.setattr(scheduler, "WRITE_QUOTA_PER_MINUTE", 10**9)
+
+
+def goal_columns(head):
+    """The leaderboard's column pick: the date and every goal column"""
+    return ['date'] + [rule.column for rule in goal_rules(compile_column_config(config_rows(head)))]
+
+
+def test_blank_rows_dont_shift_config_and_data_rows():
+    backend = FakeSheetsBackend(make_spreadsheet(1, 0.2, end=END))
+    rows = backend.tabs[USER]
+    expected_goals = goal_columns(pd.DataFrame(rows[1:10], columns=rows[0]))
+    # The units row (row 4) cleared by hand, and a blank row among older data rows
+    rows[3] = []
+    rows[15] = []
+    storage = SheetsStorage(FakeClient(backend), SPREADSHEET_URL, sync_mode="full")
+    full = storage.read_tab(USER)
+    since = date.fromisoformat(rows[40][1])
+
+    projected = storage.read_projected([USER], goal_columns, since)[USER]
+
+    pd.testing.assert_frame_equal(projected, project_frame(full, goal_columns, since), check_index_type=False)
+    assert list(projected.columns) == expected_goals
+    assert projected.attrs[DATA_ROWS_ATTR] == len(rows) - 11 - 1
+    # Row 11 is in the head; the first recent day is the first data row
+    head, data = split_tab(projected)
+    assert list(head.index) == [index for index in range(10) if index != 2]
+    assert data['date'].iloc[0] == rows[40][1]
+    assert data.index[0] == 40 - 1
+    config = compile_column_config(config_rows(projected))
+    assert all(config[column].units == '' for column in expected_goals[1:])
+    assert all(config[column].goal is not None for column in expected_goals[1:])
+
+    index = SheetRowIndex.from_sheet(full)
+    assert index.row_for_date(rows[40][1]) == 41
+    assert index.row_for_date(rows[11][1]) == 12
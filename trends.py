@@ -0,0 +1,163 @@
+"""
+Trend charts and weekly summary statistics for the My Progress tab.
+
+Every numeric column goes into one multi-panel figure (one panel per column,
+sharing the date axis) instead of a px.line chart per column, at one of
+three resolutions:
+
+  - daily: the logged values, downsampled to at most MAX_DAILY_POINTS per
+    panel with Largest-Triangle-Three-Buckets, which keeps the peaks and dips
+    a plain every-nth-point sample would drop
+  - weekly / monthly: the mean of each week (Monday to Sunday) or month
+
+Building the figure is the slow part, so the app keeps its JSON in a
+VersionedLRU (data_store.py) of FIGURE_CACHE_SIZE entries, keyed by (user,
+data version, config version, resolution): a rerun with unchanged data only
+sends the cached figure.
+
+The Summary Statistics grid reads weekly_summary(), a table of every
+column's stats for the last week and the week before, computed in one
+vectorized pass over the 14-day window rather than column by column.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+# Resolutions offered, and the pandas resample rule of each (None: daily values)
+RESOLUTIONS = {"Daily": None, "Weekly": "W-MON", "Monthly": "MS"}
+
+# Most points per panel in the daily view
+MAX_DAILY_POINTS = 365
+
+# Height of each panel, in pixels
+PANEL_HEIGHT = 220
+
+# Columns of the weekly_summary() table
+SUMMARY_COLUMNS = ("mean", "count", "total", "min", "max", "days_logged", "prior_mean", "prior_total", "delta")
+
+# Figures kept (each is the JSON of one user's chart at one resolution)
+FIGURE_CACHE_SIZE = 64
+
+
+def lttb(x, y, threshold):
+    """Indexes of the `threshold` points of (x, y) that Largest-Triangle-
+    Three-Buckets keeps (all of them if there are no more than that). x must
+    be sorted; the first and last points are always kept."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # Points 1..n-2 split into threshold - 2 buckets; one point is kept per bucket
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(int) + 1
+    edges[-1] = n - 1
+    kept = np.empty(threshold, dtype=int)
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # The third corner is the average of the next bucket (the last point for the last bucket)
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(areas.argmax())
+        kept[bucket + 1] = previous
+    return kept
+
+
+def trend_series(df, column, resolution, max_points=MAX_DAILY_POINTS):
+    """The (dates, values) plotted for a column at a resolution, blanks left out"""
+    series = pd.Series(df[column].to_numpy(dtype=float, na_value=np.nan), index=pd.DatetimeIndex(df['date']))
+    series = series[series.notna() & series.index.notna()].sort_index()
+    rule = RESOLUTIONS[resolution]
+    if rule is None:
+        kept = lttb(series.index.asi8, series.to_numpy(), max_points)
+        series = series.iloc[kept]
+    else:
+        # Weeks and months are labelled by their first day
+        series = series.resample(rule, label='left', closed='left').mean().dropna()
+    return series.index, series.to_numpy()
+
+
+def trend_figure(df, columns, resolution, max_points=MAX_DAILY_POINTS):
+    """One figure with a panel per column; columns is a list of
+    (column, title, units) and df has a 'date' column"""
+    # Plotly is imported on first use, so a cold start that never draws a chart doesn't pay for it
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(rows=len(columns), cols=1, shared_xaxes=True,
+                        subplot_titles=[title for _, title, _ in columns],
+                        vertical_spacing=min(0.08, 0.3 / len(columns)))
+    for row, (column, title, units) in enumerate(columns, start=1):
+        dates, values = trend_series(df, column, resolution, max_points)
+        fig.add_trace(go.Scatter(x=dates, y=values, mode='lines+markers' if len(values) < 60 else 'lines',
+                                 name=title, hovertemplate=f"%{{x|%b %d, %Y}}: %{{y:.1f}} {units}<extra></extra>"),
+                      row=row, col=1)
+        if units:
+            fig.update_yaxes(title_text=units, row=row, col=1)
+    fig.update_layout(height=PANEL_HEIGHT * len(columns), showlegend=False, margin=dict(t=40, b=20, l=20, r=20))
+    return fig
+
+
+def weekly_summary(df, columns, week_end):
+    """Stats of each column (a list of (column, type)) over the 7 days ending
+    on week_end and the 7 days before, as a DataFrame indexed by column:
+
+      - mean, count, total, min, max: over the week's non-blank values
+        (booleans count as 1/0, so total is the days checked)
+      - days_logged: days in the week with a row (the same for every column)
+      - prior_mean, prior_total: mean and total of the week before
+      - delta: change since the week before, in total for booleans and in
+        mean otherwise (NaN if either week has no values)
+
+    df has a DatetimeIndex of the row dates and typed columns (see
+    column_config.decode_user_frame); missing columns are all blank."""
+    names = [column for column, _ in columns]
+    week_start = pd.Timestamp(week_end - timedelta(days=6))
+    prior_start = week_start - pd.Timedelta(days=7)
+    days = df.index.normalize()
+    window = (days >= prior_start) & (days <= pd.Timestamp(week_end))
+    days = days[window]
+    present = [name for name in names if name in df.columns]
+    values = df.loc[window, present].to_numpy(dtype=float, na_value=np.nan)
+    values = pd.DataFrame(values, columns=present).reindex(columns=names).to_numpy()
+
+    # Row 0 is the week, row 1 the week before
+    stats = {name: np.full((2, len(names)), np.nan) for name in ("mean", "count", "total", "min", "max")}
+    days_logged = [0, 0]
+    for week, in_week in enumerate((days >= week_start, days < week_start)):
+        week_values = values[in_week]
+        logged = ~np.isnan(week_values)
+        count = logged.sum(axis=0)
+        total = np.where(logged, week_values, 0.0).sum(axis=0)
+        stats["count"][week] = count
+        stats["total"][week] = total
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats["mean"][week] = np.where(count > 0, total / count, np.nan)
+        stats["min"][week] = np.where(count > 0, np.fmin.reduce(week_values, axis=0, initial=np.inf), np.nan)
+        stats["max"][week] = np.where(count > 0, np.fmax.reduce(week_values, axis=0, initial=-np.inf), np.nan)
+        days_logged[week] = len(np.unique(days[in_week]))
+
+    is_boolean = np.array([col_type == 'boolean' for _, col_type in columns], dtype=bool)
+    delta_of = np.where(is_boolean, stats["total"][0] - stats["total"][1], stats["mean"][0] - stats["mean"][1])
+    both_logged = (stats["count"][0] > 0) & (stats["count"][1] > 0)
+    summary = pd.DataFrame({
+        "mean": stats["mean"][0],
+        "count": stats["count"][0].astype(int),
+        "total": stats["total"][0],
+        "min": stats["min"][0],
+        "max": stats["max"][0],
+        "days_logged": days_logged[0],
+        "prior_mean": stats["mean"][1],
+        "prior_total": stats["total"][1],
+        "delta": np.where(both_logged, delta_of, np.nan),
+    }, index=pd.Index(names, name="column"))
+    return summary[list(SUMMARY_COLUMNS)]
+